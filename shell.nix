@@ -6,6 +6,11 @@ pkgs.mkShell {
     python311Packages.sqlalchemy
     python311Packages.flask
     python311Packages.faker
+    python311Packages.numpy
+    python311Packages.aiosqlite
+    python311Packages.greenlet
+    python311Packages.asgiref
+    python311Packages.uvicorn
     python311Packages.pytest
   ];
 
@@ -1,24 +1,61 @@
+import os
 from flask import Flask, render_template, request, redirect, url_for
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import scoped_session, sessionmaker
 
 from src.models import Base
-from src.dal import UserRepository, PlaylistRepository, SongRepository
+from src.dal import UserRepository, PlaylistRepository, SongRepository, SearchRepository, StatsRepository, DEFAULT_PAGE_SIZE, DEFAULT_TOP_SIZE
 from src.bll import SpotifyService
+from src.database import serving_engine, DEFAULT_POOL_SIZE
+from src.schema import upgrade_schema
+from src.write_queue import WriteQueue
+from src.cache import InProcessCache, DEFAULT_MAX_SIZE, DEFAULT_TTL, DEFAULT_NEGATIVE_TTL
+from src.orphans import OrphanCollector
 
 app = Flask(__name__, static_folder='../static')
 
 # Налаштування БД
-engine = create_engine('sqlite:///data/spotify_data.db')
+DATABASE_URL = os.environ.get('SPOTIFY_DATABASE_URL', 'sqlite:///data/spotify_data.db')
+POOL_SIZE = int(os.environ.get('SPOTIFY_POOL_SIZE', DEFAULT_POOL_SIZE))
+CACHE_SIZE = int(os.environ.get('SPOTIFY_CACHE_SIZE', DEFAULT_MAX_SIZE))
+CACHE_TTL = float(os.environ.get('SPOTIFY_CACHE_TTL', DEFAULT_TTL))
+GC_INTERVAL = float(os.environ.get('SPOTIFY_GC_INTERVAL', 0))
+engine = serving_engine(DATABASE_URL, POOL_SIZE)
+upgrade_schema(engine)
 Base.metadata.create_all(engine)
-Session = sessionmaker(bind=engine)
-session = Session()
 
-# Репозиторії та сервіс
-user_repo = UserRepository(session)
-playlist_repo = PlaylistRepository(session)
-song_repo = SongRepository(session)
-spotify_service = SpotifyService(user_repo, playlist_repo, song_repo)
+# Кожен потік запитів отримує власну сесію; після запиту вона закривається
+# і повертає з'єднання в пул, тож помилка одного запиту не зачіпає інші
+Session = scoped_session(sessionmaker(bind=engine))
+
+# Репозиторії та сервіс працюють через проксі Session, що вказує на сесію поточного запиту
+user_repo = UserRepository(Session)
+playlist_repo = PlaylistRepository(Session)
+song_repo = SongRepository(Session)
+search_repo = SearchRepository(Session)
+stats_repo = StatsRepository(Session)
+
+# Користувачі й плейлисти для перевірок існування і заголовків сторінок читаються
+# через кеш; записувач інвалідує його після коміту. SPOTIFY_CACHE_SIZE=0 вимикає кеш
+cache = InProcessCache(CACHE_SIZE, CACHE_TTL, min(DEFAULT_NEGATIVE_TTL, CACHE_TTL)) if CACHE_SIZE > 0 else None
+spotify_service = SpotifyService(user_repo, playlist_repo, song_repo, cache=cache, search_repo=search_repo, stats_repo=stats_repo)
+
+# Зміни виконує один потік-записувач з груповим комітом; запити чекають на свій результат
+write_queue = WriteQueue(sessionmaker(bind=engine), cache=cache)
+
+# Пісні, що лишилися без плейлистів, прибирає фоновий потік; SPOTIFY_GC_INTERVAL=0 (типово) його не запускає
+orphan_collector = OrphanCollector(engine, GC_INTERVAL) if GC_INTERVAL > 0 else None
+if orphan_collector:
+    orphan_collector.start()
+
+
+@app.teardown_appcontext
+def remove_session(exception=None):
+    Session.remove()
+
+
+def page_args():
+    # Курсор і розмір сторінки з ?after=<id>&limit=<n>
+    return request.args.get('after'), request.args.get('limit', DEFAULT_PAGE_SIZE, type=int)
 
 
 # Головна сторінка
@@ -30,31 +67,54 @@ def index():
 def favicon():
     return app.send_static_file('favicon.ico')
 
+# Пошук; без kind показує перші результати кожного розділу
+SEARCH_SECTIONS = (('songs', 'Пісні'), ('playlists', 'Плейлисти'), ('users', 'Користувачі'))
+SEARCH_PREVIEW_SIZE = 10
+
+@app.route('/search')
+def search():
+    query = request.args.get('q', '').strip()
+    kind = request.args.get('kind')
+    after, limit = page_args()
+    sections = [(name, title) for name, title in SEARCH_SECTIONS if name == kind] or SEARCH_SECTIONS
+    if len(sections) > 1:
+        after, limit = None, request.args.get('limit', SEARCH_PREVIEW_SIZE, type=int)
+
+    results = [(name, title, spotify_service.search(name, query, after, limit)) for name, title in sections] if query else []
+    return render_template('search.html', query=query, sections=results, limit=limit)
+
+# Статистика з лічильників, без агрегації по таблицях
+@app.route('/stats')
+def stats():
+    limit = request.args.get('limit', DEFAULT_TOP_SIZE, type=int)
+    return render_template('stats.html', counts=spotify_service.get_table_counts(), artists=spotify_service.get_top_artists(limit))
+
 # Список користувачів
 @app.route('/users')
 def list_users():
-    users = spotify_service.get_all_users()
-    return render_template('users.html', users=users)
+    after, limit = page_args()
+    page = spotify_service.get_users_page(after, limit)
+    return render_template('users.html', users=page.items, next_cursor=page.next_cursor, limit=limit)
 
 # Додати користувача
 @app.route('/users/add', methods=['GET', 'POST'])
 def add_user():
     if request.method == 'POST':
         username = request.form['username']
-        spotify_service.add_user(username)
+        write_queue.execute(lambda service: service.add_user(username))
         return redirect(url_for('list_users'))
     return render_template('edit_user.html', user=None)
 
 # Редагувати користувача
 @app.route('/users/edit/<user_id>', methods=['GET', 'POST'])
 def edit_user(user_id):
-    user = spotify_service.get_user_by_id(user_id)
+    user = spotify_service.get_user_record(user_id)
     if not user:
         return "User not found", 404
 
     if request.method == 'POST':
         new_username = request.form['username']
-        spotify_service.update_user(user_id, new_username)
+        write_queue.execute(lambda service: service.update_user(user_id, new_username))
         return redirect(url_for('list_users'))
 
     return render_template('edit_user.html', user=user)
@@ -62,29 +122,30 @@ def edit_user(user_id):
 # Видалити користувача
 @app.route('/users/delete/<user_id>', methods=['POST'])
 def delete_user(user_id):
-    spotify_service.delete_user(user_id)
+    write_queue.execute(lambda service: service.delete_user(user_id))
     return redirect(url_for('list_users'))
 
 # Список плейлистів користувача
 @app.route('/users/<user_id>/playlists')
 def list_playlists(user_id):
-    user = spotify_service.get_user_by_id(user_id)
+    user = spotify_service.get_user_record(user_id)
     if not user:
         return "User not found", 404
 
-    playlists = spotify_service.get_all_playlists_by_user_id(user_id)
-    return render_template('playlists.html', user=user, playlists=playlists)
+    after, limit = page_args()
+    page = spotify_service.get_playlists_page_by_user_id(user_id, after, limit)
+    return render_template('playlists.html', user=user, playlists=page.items, next_cursor=page.next_cursor, limit=limit)
 
 # Додати плейлист
 @app.route('/users/<user_id>/playlists/add', methods=['GET', 'POST'])
 def add_playlist(user_id):
-    user = spotify_service.get_user_by_id(user_id)
+    user = spotify_service.get_user_record(user_id)
     if not user:
         return "User not found", 404
 
     if request.method == 'POST':
         playlist_name = request.form['name']
-        spotify_service.add_playlist(user_id, playlist_name)
+        write_queue.execute(lambda service: service.add_playlist(user_id, playlist_name))
         return redirect(url_for('list_playlists', user_id=user_id))
 
     return render_template('edit_playlist.html', user=user, playlist=None)
@@ -92,13 +153,13 @@ def add_playlist(user_id):
 # Редагувати плейлист
 @app.route('/playlists/edit/<playlist_id>', methods=['GET', 'POST'])
 def edit_playlist(playlist_id):
-    playlist = spotify_service.get_playlist_by_id(playlist_id)
+    playlist = spotify_service.get_playlist_record(playlist_id)
     if not playlist:
         return "Playlist not found", 404
 
     if request.method == 'POST':
         new_name = request.form['name']
-        spotify_service.update_playlist(playlist_id, new_name)
+        write_queue.execute(lambda service: service.update_playlist(playlist_id, new_name))
         return redirect(url_for('list_playlists', user_id=playlist.user_id))
 
     return render_template('edit_playlist.html', user=playlist.user, playlist=playlist)
@@ -106,38 +167,45 @@ def edit_playlist(playlist_id):
 # Видалити плейлист
 @app.route('/playlists/delete/<playlist_id>', methods=['POST'])
 def delete_playlist(playlist_id):
-    playlist = spotify_service.get_playlist_by_id(playlist_id)
+    playlist = spotify_service.get_playlist_record(playlist_id)
     if not playlist:
         return "Playlist not found", 404
 
     user_id = playlist.user_id
-    spotify_service.delete_playlist(playlist_id)
+    write_queue.execute(lambda service: service.delete_playlist(playlist_id))
     return redirect(url_for('list_playlists', user_id=user_id))
 
 # Список пісень у плейлисті
 @app.route('/playlists/<playlist_id>/songs')
 def list_songs(playlist_id):
-    playlist = spotify_service.get_playlist_by_id(playlist_id)
+    playlist = spotify_service.get_playlist_record(playlist_id)
     if not playlist:
         return "Playlist not found", 404
 
-    songs = spotify_service.get_all_songs_by_playlist_id(playlist_id)
-    return render_template('songs.html', playlist=playlist, songs=songs)
+    after, limit = page_args()
+    page = spotify_service.get_songs_page_by_playlist_id(playlist_id, after, limit)
+    return render_template('songs.html', playlist=playlist, songs=page.items, next_cursor=page.next_cursor, limit=limit)
 
 # Додати пісню
 @app.route('/playlists/<playlist_id>/songs/add', methods=['GET', 'POST'])
 def add_song(playlist_id):
-    playlist = spotify_service.get_playlist_by_id(playlist_id)
+    playlist = spotify_service.get_playlist_record(playlist_id)
     if not playlist:
         return "Playlist not found", 404
 
     if request.method == 'POST':
         title = request.form['title']
         artist = request.form['artist']
-        spotify_service.add_song_to_playlist(playlist_id, title, artist)
+        write_queue.execute(lambda service: service.add_song_to_playlist(playlist_id, title, artist))
         return redirect(url_for('list_songs', playlist_id=playlist_id))
 
-    return render_template('edit_song.html', playlist=playlist, song=None)
+    return render_template('edit_song.html', playlist_id=playlist_id, song=None)
+
+def song_back_url(playlist_id):
+    # Пісня без плейлистів (ще не прибрана збирачем) повертає на головну
+    if playlist_id is None:
+        return url_for('index')
+    return url_for('list_songs', playlist_id=playlist_id)
 
 # Редагувати пісню
 @app.route('/songs/edit/<song_id>', methods=['GET', 'POST'])
@@ -146,24 +214,25 @@ def edit_song(song_id):
     if not song:
         return "Song not found", 404
 
+    # Для посилання «Назад» достатньо одного плейлиста пісні
+    playlist_id = spotify_service.get_first_playlist_id(song_id)
     if request.method == 'POST':
         new_title = request.form['title']
         new_artist = request.form['artist']
-        spotify_service.update_song(song_id, new_title, new_artist)
-        return redirect(url_for('list_songs', playlist_id=song.playlists[0].id))
+        write_queue.execute(lambda service: service.update_song(song_id, new_title, new_artist))
+        return redirect(song_back_url(playlist_id))
 
-    return render_template('edit_song.html', playlist=song.playlists[0], song=song)
+    return render_template('edit_song.html', playlist_id=playlist_id, song=song)
 
 # Видалити пісню
 @app.route('/songs/delete/<song_id>', methods=['POST'])
 def delete_song(song_id):
-    song = spotify_service.get_song_by_id(song_id)
-    if not song:
+    if not spotify_service.get_song_by_id(song_id):
         return "Song not found", 404
 
-    playlist_id = song.playlists[0].id
-    spotify_service.delete_song(song_id)
-    return redirect(url_for('list_songs', playlist_id=playlist_id))
+    back_url = song_back_url(spotify_service.get_first_playlist_id(song_id))
+    write_queue.execute(lambda service: service.delete_song(song_id))
+    return redirect(back_url)
 
 if __name__ == '__main__':
     app.run()
@@ -0,0 +1,116 @@
+"""
+ASGI-вхід застосунку: сторінки списків (користувачі, плейлисти, пісні)
+обробляються асинхронно через AsyncSpotifyService, тож один процес
+обслуговує багато одночасних з'єднань без окремого потоку на кожне.
+Решта маршрутів (форми і зміни) передається Flask-застосунку через WsgiToAsgi.
+
+    uvicorn src.asgi:application
+"""
+from urllib.parse import parse_qs
+from asgiref.wsgi import WsgiToAsgi
+from jinja2 import Environment, select_autoescape
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from werkzeug.exceptions import HTTPException
+
+from src.app import app as flask_app, DATABASE_URL, POOL_SIZE
+from src.async_dal import AsyncUserRepository, AsyncPlaylistRepository, AsyncSongRepository
+from src.async_bll import AsyncSpotifyService
+from src.dal import DEFAULT_PAGE_SIZE
+from src.database import async_serving_engine
+
+engine = async_serving_engine(DATABASE_URL, POOL_SIZE)
+AsyncSession = async_sessionmaker(engine, expire_on_commit=False)
+
+urls = flask_app.url_map.bind('')
+templates = Environment(loader=flask_app.jinja_loader, autoescape=select_autoescape())
+templates.globals['url_for'] = lambda endpoint, **values: urls.build(endpoint, values)
+
+wsgi_application = WsgiToAsgi(flask_app)
+
+
+def page_args(query):
+    after = query.get('after', [None])[0]
+    try:
+        limit = int(query.get('limit', [DEFAULT_PAGE_SIZE])[0])
+    except ValueError:
+        limit = DEFAULT_PAGE_SIZE
+    return after, limit
+
+
+async def list_users(service, query):
+    after, limit = page_args(query)
+    page = await service.get_users_page(after, limit)
+    return 200, templates.get_template('users.html').render(users=page.items, next_cursor=page.next_cursor, limit=limit)
+
+
+async def list_playlists(service, query, user_id):
+    user = await service.get_user_by_id(user_id)
+    if not user:
+        return 404, "User not found"
+
+    after, limit = page_args(query)
+    page = await service.get_playlists_page_by_user_id(user_id, after, limit)
+    return 200, templates.get_template('playlists.html').render(user=user, playlists=page.items, next_cursor=page.next_cursor, limit=limit)
+
+
+async def list_songs(service, query, playlist_id):
+    playlist = await service.get_playlist_with_user(playlist_id)
+    if not playlist:
+        return 404, "Playlist not found"
+
+    after, limit = page_args(query)
+    page = await service.get_songs_page_by_playlist_id(playlist_id, after, limit)
+    return 200, templates.get_template('songs.html').render(playlist=playlist, songs=page.items, next_cursor=page.next_cursor, limit=limit)
+
+
+# Ендпоінти Flask, які обслуговуються асинхронно
+ASYNC_PAGES = {
+    'list_users': list_users,
+    'list_playlists': list_playlists,
+    'list_songs': list_songs,
+}
+
+
+def match_async_page(scope):
+    if scope['method'] != 'GET':
+        return None
+    try:
+        endpoint, values = urls.match(scope['path'], method='GET')
+    except HTTPException:
+        return None
+    if endpoint not in ASYNC_PAGES:
+        return None
+    return ASYNC_PAGES[endpoint], values
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await engine.dispose()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+
+    page = match_async_page(scope) if scope['type'] == 'http' else None
+    if page is None:
+        return await wsgi_application(scope, receive, send)
+
+    handler, values = page
+    query = parse_qs(scope.get('query_string', b'').decode())
+    async with AsyncSession() as session:
+        service = AsyncSpotifyService(AsyncUserRepository(session), AsyncPlaylistRepository(session), AsyncSongRepository(session))
+        status, body = await handler(service, query, **values)
+
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'text/html; charset=utf-8')],
+    })
+    await send({'type': 'http.response.body', 'body': body.encode('utf-8')})
@@ -0,0 +1,99 @@
+from src.models import Playlist, Song
+from src.dal import DEFAULT_PAGE_SIZE
+from src.async_dal import AsyncUserRepository, AsyncPlaylistRepository, AsyncSongRepository, transaction
+
+
+class AsyncSpotifyService:
+    """
+    Асинхронний аналог SpotifyService для веб-запитів (без імпорту даних,
+    який залишається синхронним і пакетним).
+    """
+    def __init__(self, user_repo: AsyncUserRepository, playlist_repo: AsyncPlaylistRepository, song_repo: AsyncSongRepository):
+        self.user_repo = user_repo
+        self.playlist_repo = playlist_repo
+        self.song_repo = song_repo
+
+    def transaction(self):
+        """
+        Кілька операцій як одна транзакція:
+
+            async with service.transaction():
+                await service.add_user('listener')
+        """
+        return transaction(self.user_repo.session)
+
+    async def get_all_users(self):
+        return await self.user_repo.get_all_users()
+
+    async def get_user_by_id(self, user_id):
+        return await self.user_repo.get_user_by_id(user_id)
+
+    async def get_user_with_playlists(self, user_id):
+        return await self.user_repo.get_user_with_playlists(user_id)
+
+    async def get_users_page(self, after=None, limit=DEFAULT_PAGE_SIZE):
+        return await self.user_repo.get_users_page(after, limit)
+
+    async def add_user(self, username):
+        await self.user_repo.add_user(username)
+
+    async def update_user(self, user_id, new_username):
+        return await self.user_repo.update_user(user_id, new_username)
+
+    async def delete_user(self, user_id):
+        return await self.user_repo.delete_user(user_id)
+
+    async def get_all_playlists_by_user_id(self, user_id):
+        return await self.playlist_repo.get_all_playlists_by_user_id(user_id)
+
+    async def add_playlist(self, user_id, playlist_name):
+        new_playlist = Playlist(name=playlist_name, user=await self.get_user_by_id(user_id), user_id=user_id)
+        await self.playlist_repo.add_playlist(new_playlist, user_id)
+
+    async def get_playlist_by_id(self, playlist_id):
+        return await self.playlist_repo.get_playlist_by_id(playlist_id)
+
+    async def get_playlist_with_songs(self, playlist_id):
+        return await self.playlist_repo.get_playlist_with_songs(playlist_id)
+
+    async def get_playlist_with_user(self, playlist_id):
+        return await self.playlist_repo.get_playlist_with_user(playlist_id)
+
+    async def get_playlists_page_by_user_id(self, user_id, after=None, limit=DEFAULT_PAGE_SIZE):
+        return await self.playlist_repo.get_playlists_page_by_user_id(user_id, after, limit)
+
+    async def update_playlist(self, playlist_id, new_name):
+        return await self.playlist_repo.update_playlist(playlist_id, new_name)
+
+    async def delete_playlist(self, playlist_id):
+        return await self.playlist_repo.delete_playlist(playlist_id)
+
+    async def get_all_songs_by_playlist_id(self, playlist_id):
+        return await self.song_repo.get_all_songs_by_playlist_id(playlist_id)
+
+    async def get_songs_page_by_playlist_id(self, playlist_id, after=None, limit=DEFAULT_PAGE_SIZE):
+        return await self.song_repo.get_songs_page_by_playlist_id(playlist_id, after, limit)
+
+    async def add_song_to_playlist(self, playlist_id, song_title, song_artist):
+        playlist = await self.get_playlist_by_id(playlist_id)
+        if not playlist:
+            return None
+
+        song = Song(title=song_title, artist=song_artist)
+        await self.playlist_repo.add_song_to_playlist(playlist, song)
+        return song
+
+    async def get_song_by_id(self, song_id):
+        return await self.song_repo.get_song_by_id(song_id)
+
+    async def get_song_with_playlists(self, song_id):
+        return await self.song_repo.get_song_with_playlists(song_id)
+
+    async def get_first_playlist_id(self, song_id):
+        return await self.song_repo.get_first_playlist_id(song_id)
+
+    async def update_song(self, song_id, new_title, new_artist):
+        return await self.song_repo.update_song(song_id, new_title, new_artist)
+
+    async def delete_song(self, song_id):
+        return await self.song_repo.delete_song(song_id)
@@ -0,0 +1,184 @@
+"""
+Асинхронна реалізація репозиторіїв на SQLAlchemy asyncio (AsyncSession + aiosqlite).
+
+Ледаче завантаження зв'язків в asyncio неможливе, тому кожен метод одразу
+підвантажує (selectinload/joinedload) ті зв'язки, які потрібні йому самому;
+залежні рядки при видаленні прибирає база (ON DELETE CASCADE). Сесії мають створюватися з expire_on_commit=False,
+щоб після коміту атрибути не перечитувалися неявно.
+"""
+from contextlib import asynccontextmanager
+from typing import Union
+from sqlalchemy import select, update, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, selectinload
+from src.models import User, Playlist, Song, playlist_song
+from src.dal import IUserRepository, IPlaylistRepository, ISongRepository, Page, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, TRANSACTION_DEPTH, in_transaction
+
+
+async def keyset_page(session: AsyncSession, statement, key, after: str = None, limit: int = DEFAULT_PAGE_SIZE):
+    """
+    Асинхронний аналог src.dal.keyset_page для select().
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    if after is not None:
+        statement = statement.where(key > after)
+    items = list(await session.scalars(statement.order_by(key).limit(limit + 1)))
+    if len(items) > limit:
+        items = items[:limit]
+        return Page(items, items[-1].id)
+    return Page(items, None)
+
+
+@asynccontextmanager
+async def transaction(session: AsyncSession):
+    """
+    Асинхронний аналог src.dal.transaction: репозиторії лише скидають зміни,
+    а блок комітиться один раз.
+    """
+    depth = session.info.get(TRANSACTION_DEPTH, 0)
+    session.info[TRANSACTION_DEPTH] = depth + 1
+    try:
+        yield session
+        if depth == 0:
+            await session.commit()
+    except BaseException:
+        if depth == 0:
+            await session.rollback()
+        raise
+    finally:
+        session.info[TRANSACTION_DEPTH] = depth
+
+
+class AsyncSessionRepository:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def _commit(self):
+        if in_transaction(self.session):
+            await self.session.flush()
+        else:
+            await self.session.commit()
+
+    async def _update(self, model, entity_id: str, **values):
+        result = await self.session.execute(update(model).where(model.id == entity_id).values(**values))
+        await self._commit()
+        return result.rowcount > 0
+
+    async def _delete(self, model, entity_id: str):
+        result = await self.session.execute(delete(model).where(model.id == entity_id))
+        await self._commit()
+        return result.rowcount > 0
+
+
+class AsyncUserRepository(AsyncSessionRepository, IUserRepository):
+    async def add_user(self, user_or_username: Union[User, str]):
+        if isinstance(user_or_username, User):
+            user = user_or_username
+        elif isinstance(user_or_username, str):
+            user = User(username=user_or_username)
+        else:
+            raise ValueError('Invalid type for add_user: expected User or str')
+
+        self.session.add(user)
+        await self._commit()
+
+    async def get_all_users(self):
+        return list(await self.session.scalars(select(User)))
+
+    async def get_user_by_id(self, user_id: str):
+        return await self.session.scalar(select(User).filter_by(id=user_id))
+
+    async def get_user_with_playlists(self, user_id: str):
+        return await self.session.scalar(select(User).options(selectinload(User.playlists)).filter_by(id=user_id))
+
+    async def get_users_page(self, after: str = None, limit: int = DEFAULT_PAGE_SIZE):
+        return await keyset_page(self.session, select(User), User.id, after, limit)
+
+    async def update_user(self, user_id: str, new_username: str):
+        return await self._update(User, user_id, username=new_username)
+
+    async def delete_user(self, user_id: str):
+        return await self._delete(User, user_id)
+
+
+class AsyncPlaylistRepository(AsyncSessionRepository, IPlaylistRepository):
+    async def add_playlist(self, playlist_or_playlistname: Union[Playlist, str], user_id: str):
+        if isinstance(playlist_or_playlistname, Playlist):
+            playlist = playlist_or_playlistname
+        elif isinstance(playlist_or_playlistname, str):
+            playlist = Playlist(name=playlist_or_playlistname, user=None, user_id=user_id)
+        else:
+            raise ValueError('Invalid type for add_playlist: expected Playlist or str')
+
+        self.session.add(playlist)
+        await self._commit()
+
+    async def add_song_to_playlist(self, playlist: Playlist, song: Song):
+        # Зв'язок вставляється напряму, як у пакетному імпорті: пісні плейлиста
+        # не завантажуються, тож додавання не залежить від розміру плейлиста
+        self.session.add(song)
+        await self.session.flush()
+        await self.session.execute(playlist_song.insert().values(playlist_id=playlist.id, song_id=song.id))
+        await self._commit()
+
+    async def get_all_playlists_by_user_id(self, user_id: str):
+        return list(await self.session.scalars(select(Playlist).filter_by(user_id=user_id)))
+
+    async def get_playlist_ids_by_user_id(self, user_id: str):
+        return list(await self.session.scalars(select(Playlist.id).where(Playlist.user_id == user_id)))
+
+    async def get_playlist_by_id(self, playlist_id: str):
+        return await self.session.scalar(select(Playlist).filter_by(id=playlist_id))
+
+    async def get_playlist_with_songs(self, playlist_id: str):
+        return await self.session.scalar(
+            select(Playlist).options(joinedload(Playlist.user), selectinload(Playlist.songs)).filter_by(id=playlist_id))
+
+    async def get_playlist_with_user(self, playlist_id: str):
+        return await self.session.scalar(select(Playlist).options(joinedload(Playlist.user)).filter_by(id=playlist_id))
+
+    async def get_playlists_page_by_user_id(self, user_id: str, after: str = None, limit: int = DEFAULT_PAGE_SIZE):
+        return await keyset_page(self.session, select(Playlist).filter_by(user_id=user_id), Playlist.id, after, limit)
+
+    async def update_playlist(self, playlist_id: str, new_name: str):
+        return await self._update(Playlist, playlist_id, name=new_name)
+
+    async def delete_playlist(self, playlist_id: str):
+        return await self._delete(Playlist, playlist_id)
+
+
+class AsyncSongRepository(AsyncSessionRepository, ISongRepository):
+    async def add_song(self, song: Song):
+        self.session.add(song)
+        await self._commit()
+
+    async def get_song_by_id(self, song_id: str):
+        return await self.session.scalar(select(Song).filter_by(id=song_id))
+
+    async def get_song_with_playlists(self, song_id: str):
+        return await self.session.scalar(select(Song).options(selectinload(Song.playlists)).filter_by(id=song_id))
+
+    async def get_first_playlist_id(self, song_id: str):
+        return await self.session.scalar(
+            select(playlist_song.c.playlist_id).where(playlist_song.c.song_id == song_id).limit(1))
+
+    async def get_all_songs_by_playlist_id(self, playlist_id: str):
+        statement = (select(Song)
+                     .join(playlist_song, playlist_song.c.song_id == Song.id)
+                     .where(playlist_song.c.playlist_id == playlist_id))
+        return list(await self.session.scalars(statement))
+
+    async def get_songs_page_by_playlist_id(self, playlist_id: str, after: str = None, limit: int = DEFAULT_PAGE_SIZE):
+        statement = (select(Song)
+                     .join(playlist_song, playlist_song.c.song_id == Song.id)
+                     .where(playlist_song.c.playlist_id == playlist_id))
+        return await keyset_page(self.session, statement, playlist_song.c.song_id, after, limit)
+
+    async def get_all_songs(self):
+        return list(await self.session.scalars(select(Song)))
+
+    async def update_song(self, song_id: str, new_title: str, new_artist: str):
+        return await self._update(Song, song_id, title=new_title, artist=new_artist)
+
+    async def delete_song(self, song_id: str):
+        return await self._delete(Song, song_id)
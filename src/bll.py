@@ -1,10 +1,18 @@
-import csv
+import os
 import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from operator import itemgetter
 from src.models import User, Playlist, Song
-from src.dal import IUserRepository, IPlaylistRepository, ISongRepository
+from src.dal import IUserRepository, IPlaylistRepository, ISongRepository, IBulkRepository, ISearchRepository, IStatsRepository, DEFAULT_PAGE_SIZE, DEFAULT_TOP_SIZE, Page, transaction
 from abc import ABC, abstractmethod
+from src.file_size import file_size, file_fingerprint
+from src.csv_stream import CsvStream
+from src.compression import compression_of
+from src.cache import ICache, MISS, user_key, playlist_key, user_record, playlist_record, invalidate
+from src.csv_shards import read_header, shard_ranges, parse_shard, has_multiline_records
 from src.progress_bar import print_progress_bar
-from src.file_size import lines_in_csv, file_size
 
 class ISpotifyService(ABC):
     @abstractmethod
@@ -19,6 +27,14 @@ class ISpotifyService(ABC):
     def get_user_by_id(self, user_id):
         pass
 
+    @abstractmethod
+    def get_user_with_playlists(self, user_id):
+        pass
+
+    @abstractmethod
+    def get_users_page(self, after=None, limit=DEFAULT_PAGE_SIZE):
+        pass
+
     @abstractmethod
     def add_user(self, username):
         pass
@@ -43,6 +59,14 @@ class ISpotifyService(ABC):
     def get_playlist_by_id(self, playlist_id):
         pass
 
+    @abstractmethod
+    def get_playlist_with_songs(self, playlist_id):
+        pass
+
+    @abstractmethod
+    def get_playlists_page_by_user_id(self, user_id, after=None, limit=DEFAULT_PAGE_SIZE):
+        pass
+
     @abstractmethod
     def update_playlist(self, playlist_id, new_name):
         pass
@@ -51,24 +75,125 @@ class ISpotifyService(ABC):
     def delete_playlist(self, playlist_id):
         pass
 
+    @abstractmethod
+    def search(self, kind, query, after=None, limit=DEFAULT_PAGE_SIZE):
+        pass
+
+    @abstractmethod
+    def get_table_counts(self):
+        pass
+
+    @abstractmethod
+    def get_top_artists(self, limit=DEFAULT_TOP_SIZE):
+        pass
+
+
+PROGRESS_EVERY_ROWS = 1000
+DEFAULT_BATCH_SIZE = 10000
+
+CSV_COLUMNS = ('UserId', 'Username', 'PlaylistId', 'PlaylistName', 'SongId', 'SongTitle', 'Artist')
+
+
+class ImportBatch:
+    """
+    Накопичує рядки імпорту і записує їх пачками через IBulkRepository.
+    Один коміт на batch_size рядків замість коміту на кожну сутність.
+    """
+    def __init__(self, bulk_repo: IBulkRepository, batch_size: int, on_flush=None, upsert=False):
+        self.bulk_repo = bulk_repo
+        self.batch_size = batch_size
+        # В режимі upsert змінені імена та назви оновлюються, а не пропускаються
+        self.upsert = upsert
+        # Викликається перед комітом, щоб записати контрольну точку в ту ж транзакцію
+        self.on_flush = on_flush
+        self.user_ids = set()
+        self.playlist_ids = set()
+        self.song_ids = set()
+        self._clear()
+
+    def _clear(self):
+        self.users = []
+        self.playlists = []
+        self.songs = []
+        self.links = []
+
+    def add_row(self, user_id, username, playlist_id, playlist_name, song_id, song_title, song_artist):
+        if user_id not in self.user_ids:
+            self.user_ids.add(user_id)
+            self.users.append({'id': user_id, 'username': username})
+
+        if playlist_id not in self.playlist_ids:
+            self.playlist_ids.add(playlist_id)
+            self.playlists.append({'id': playlist_id, 'name': playlist_name, 'user_id': user_id})
+
+        if song_id not in self.song_ids:
+            self.song_ids.add(song_id)
+            self.songs.append({'id': song_id, 'title': song_title, 'artist': song_artist})
+
+        self.links.append({'playlist_id': playlist_id, 'song_id': song_id})
+
+        if len(self.links) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        # Порядок важливий: батьківські рядки пишемо раніше за зв'язки
+        if self.upsert:
+            self.bulk_repo.upsert_users(self.users)
+            self.bulk_repo.upsert_playlists(self.playlists)
+            self.bulk_repo.upsert_songs(self.songs)
+        else:
+            self.bulk_repo.insert_users(self.users)
+            self.bulk_repo.insert_playlists(self.playlists)
+            self.bulk_repo.insert_songs(self.songs)
+        self.bulk_repo.insert_playlist_songs(self.links)
+        if self.on_flush:
+            self.on_flush()
+        self.bulk_repo.commit()
+        self._clear()
+
 
 class SpotifyService(ISpotifyService):
-    def __init__(self, user_repo: IUserRepository, playlist_repo: IPlaylistRepository, song_repo: ISongRepository):
+    def __init__(self, user_repo: IUserRepository, playlist_repo: IPlaylistRepository, song_repo: ISongRepository, bulk_repo: IBulkRepository = None, cache: ICache = None, search_repo: ISearchRepository = None, stats_repo: IStatsRepository = None):
         self.user_repo = user_repo
         self.playlist_repo = playlist_repo
         self.song_repo = song_repo
+        self.bulk_repo = bulk_repo
+        self.cache = cache
+        self.search_repo = search_repo
+        self.stats_repo = stats_repo
+
+    def transaction(self):
+        """
+        Виконує кілька операцій сервісу як одну транзакцію з одним комітом:
+
+            with service.transaction():
+                service.add_user('listener')
+                service.add_playlist(user_id, 'Mix')
+        """
+        return transaction(self.user_repo.session)
+
+    def import_from_csv(self, csv_path: str = 'data/spotify_data.csv', db_path: str = 'data/spoty_data.csv', verbose=False, batch_size=None, workers=None, resume=False, upsert=False):
+        if workers and compression_of(csv_path):
+            # Стиснений потік не можна розрізати по байтах, тож читаємо його послідовно
+            if verbose: print(f"Compressed CSV is imported by a single process.")
+            workers = None
+        if workers and has_multiline_records(csv_path):
+            # Шматки ріжуться по переносах рядків і розірвали б поле в лапках
+            if verbose: print(f"CSV with line breaks inside quoted fields is imported by a single process.")
+            workers = None
+        if workers:
+            return self._parallel_import_from_csv(csv_path, db_path, verbose, batch_size or DEFAULT_BATCH_SIZE, workers, resume, upsert)
+        if batch_size or resume or upsert:
+            return self._bulk_import_from_csv(csv_path, db_path, verbose, batch_size or DEFAULT_BATCH_SIZE, resume, upsert)
 
-    def import_from_csv(self, csv_path: str = 'data/spotify_data.csv', db_path: str = 'data/spoty_data.csv', verbose=False):
         progress_now = 0
-        total_progress = lines_in_csv(csv_path) - 1
-        update_progress = max(1, total_progress // 1000)
         start_time = time.time()
 
-        # Initial call to print 0% progress
-        if verbose : print_progress_bar(0, total_progress, prefix = '- Progress', suffix = 'Complere', length = 50)
+        with CsvStream(csv_path) as stream:
+            # Initial call to print 0% progress
+            if verbose: stream.print_progress()
 
-        with open(csv_path, newline='', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
+            reader = stream.dict_reader()
             user_ids = {}
             playlist_ids = {}
             song_ids = {}
@@ -108,17 +233,11 @@ class SpotifyService(ISpotifyService):
                 playlist.songs.append(song)
 
                 # Update Progress Bar
-                if verbose and (progress_now % update_progress == 0):
-                    print_progress_bar(
-                            progress_now, 
-                            total_progress, 
-                            prefix = '- Progress', 
-                            suffix = 'Complere', 
-                            length = 50
-                        )
+                if verbose and (progress_now % PROGRESS_EVERY_ROWS == 0):
+                    stream.print_progress()
 
             if verbose: 
-                print_progress_bar(progress_now, total_progress, prefix = '- Progress', suffix = 'Complere', length = 50)
+                stream.print_progress()
 
             end_time = time.time()
             str_time = time.strftime("%H:%M:%S",time.gmtime(end_time - start_time))
@@ -128,22 +247,256 @@ class SpotifyService(ISpotifyService):
                 print(f"- Users:          {len(user_ids)}")
                 print(f"- Playlists:      {len(playlist_ids)}")
                 print(f"- Songs:          {len(song_ids)}")
+                print(f"- Rows:           {progress_now}")
                 print(f"- DB size:        {file_size(db_path)}")
                 print(f"- Importing time: {str_time}")
 
+    def _start_offset(self, checkpoint_key, fingerprint, resume):
+        if not resume:
+            return 0
+
+        checkpoint = self.bulk_repo.get_checkpoint(checkpoint_key)
+        if checkpoint is None:
+            return 0
+        if checkpoint.fingerprint != fingerprint:
+            raise ValueError(f'CSV file {checkpoint_key} changed since the last checkpoint')
+        return checkpoint.offset
+
+    def _bulk_import_from_csv(self, csv_path, db_path, verbose, batch_size, resume=False, upsert=False):
+        if self.bulk_repo is None:
+            raise ValueError('Bulk import requires a bulk repository')
+
+        progress_now = 0
+        start_time = time.time()
+
+        checkpoint_key = os.path.abspath(csv_path)
+        fingerprint = file_fingerprint(csv_path)
+        start_offset = self._start_offset(checkpoint_key, fingerprint, resume)
+
+        with CsvStream(csv_path) as stream:
+            reader = stream.reader()
+            header = next(reader, [])
+            if start_offset > stream.offset:
+                stream.seek(start_offset)
+                if verbose: print(f"Resuming import from byte {start_offset}")
+
+            if verbose: stream.print_progress()
+
+            batch = ImportBatch(
+                    self.bulk_repo,
+                    batch_size,
+                    on_flush = lambda: self.bulk_repo.save_checkpoint(checkpoint_key, fingerprint, stream.offset),
+                    upsert = upsert
+                )
+
+            if header:
+                # Порядок колонок беремо із заголовка, як це робить DictReader
+                columns = itemgetter(*(header.index(name) for name in CSV_COLUMNS))
+            for row in reader:
+                progress_now += 1
+                batch.add_row(*columns(row))
+
+                if verbose and (progress_now % PROGRESS_EVERY_ROWS == 0):
+                    stream.print_progress()
+
+            batch.flush()
+
+            if verbose: stream.print_progress()
+
+        end_time = time.time()
+        str_time = time.strftime("%H:%M:%S",time.gmtime(end_time - start_time))
+
+        if verbose:
+            print(f"Result CSV file import:")
+            print(f"- Users:          {len(batch.user_ids)}")
+            print(f"- Playlists:      {len(batch.playlist_ids)}")
+            print(f"- Songs:          {len(batch.song_ids)}")
+            print(f"- Rows:           {progress_now}")
+            print(f"- Rows per sec:   {progress_now / max(end_time - start_time, 1e-9):.0f}")
+            print(f"- DB size:        {file_size(db_path)}")
+            print(f"- Importing time: {str_time}")
+
+    def _parallel_import_from_csv(self, csv_path, db_path, verbose, batch_size, workers, resume=False, upsert=False):
+        """
+        Процеси пулу розбирають шматки файлу в кортежі, а поточний процес
+        є єдиним записувачем. Шматки записуються в порядку файлу, тому
+        дедуплікація в ImportBatch дає той самий результат, що й послідовний імпорт.
+        """
+        if self.bulk_repo is None:
+            raise ValueError('Bulk import requires a bulk repository')
+
+        progress_now = 0
+        start_time = time.time()
+        total_bytes = os.path.getsize(csv_path)
+
+        checkpoint_key = os.path.abspath(csv_path)
+        fingerprint = file_fingerprint(csv_path)
+        start_offset = self._start_offset(checkpoint_key, fingerprint, resume)
+        if verbose and start_offset: print(f"Resuming import from byte {start_offset}")
+
+        header = read_header(csv_path)
+        ranges = shard_ranges(csv_path, workers, start=start_offset)
+        # Контрольна точка посувається лише по повністю записаних шматках
+        committed_offset = start_offset
+        batch = ImportBatch(
+                self.bulk_repo,
+                batch_size,
+                on_flush = lambda: self.bulk_repo.save_checkpoint(checkpoint_key, fingerprint, committed_offset),
+                upsert = upsert
+            )
+
+        if verbose: print_progress_bar(start_offset, max(1, total_bytes), prefix = '- Progress', suffix = 'Complete', length = 50)
+
+        if ranges:
+            columns = tuple(header.index(name) for name in CSV_COLUMNS)
+            tasks = iter([(csv_path, start, end, columns) for start, end in ranges])
+
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                # Обмежуємо кількість розібраних шматків, що чекають на запис
+                pending = deque((executor.submit(parse_shard, task), task[2]) for task in islice(tasks, workers * 2))
+
+                while pending:
+                    future, shard_end = pending.popleft()
+                    task = next(tasks, None)
+                    if task:
+                        pending.append((executor.submit(parse_shard, task), task[2]))
+
+                    rows = future.result()
+                    for row in rows:
+                        batch.add_row(*row)
+                    progress_now += len(rows)
+
+                    committed_offset = shard_end
+                    batch.flush()
+
+                    if verbose: print_progress_bar(shard_end, total_bytes, prefix = '- Progress', suffix = 'Complete', length = 50)
+
+        batch.flush()
+
+        end_time = time.time()
+        str_time = time.strftime("%H:%M:%S",time.gmtime(end_time - start_time))
+
+        if verbose:
+            print(f"Result CSV file import:")
+            print(f"- Workers:        {workers}")
+            print(f"- Users:          {len(batch.user_ids)}")
+            print(f"- Playlists:      {len(batch.playlist_ids)}")
+            print(f"- Songs:          {len(batch.song_ids)}")
+            print(f"- Rows:           {progress_now}")
+            print(f"- Rows per sec:   {progress_now / max(end_time - start_time, 1e-9):.0f}")
+            print(f"- DB size:        {file_size(db_path)}")
+            print(f"- Importing time: {str_time}")
+
+    def import_rows(self, rows, db_path: str = 'data/spotify_data.db', verbose=False, batch_size=DEFAULT_BATCH_SIZE):
+        """
+        Записує готовий потік кортежів (як рядки CSV, але без файлу) через пакетні вставки.
+        """
+        if self.bulk_repo is None:
+            raise ValueError('Bulk import requires a bulk repository')
+
+        progress_now = 0
+        start_time = time.time()
+        batch = ImportBatch(self.bulk_repo, batch_size)
+
+        for row in rows:
+            progress_now += 1
+            batch.add_row(*row)
+        batch.flush()
+
+        end_time = time.time()
+        str_time = time.strftime("%H:%M:%S",time.gmtime(end_time - start_time))
+
+        if verbose:
+            print(f"Result rows import:")
+            print(f"- Users:          {len(batch.user_ids)}")
+            print(f"- Playlists:      {len(batch.playlist_ids)}")
+            print(f"- Songs:          {len(batch.song_ids)}")
+            print(f"- Rows:           {progress_now}")
+            print(f"- Rows per sec:   {progress_now / max(end_time - start_time, 1e-9):.0f}")
+            print(f"- DB size:        {file_size(db_path)}")
+            print(f"- Importing time: {str_time}")
+
+        return progress_now
+
+    def import_snapshot(self, snapshot, db_path: str = 'data/spotify_data.db', verbose=False, batch_size=DEFAULT_BATCH_SIZE):
+        """
+        Переносить таблиці знімка в базу пачками: знімок уже нормалізований,
+        тому дедуплікація рядків не потрібна.
+        """
+        if self.bulk_repo is None:
+            raise ValueError('Bulk import requires a bulk repository')
+
+        start_time = time.time()
+        tables = (
+            (snapshot.users(), self.bulk_repo.insert_users),
+            (snapshot.playlists(), self.bulk_repo.insert_playlists),
+            (snapshot.songs(), self.bulk_repo.insert_songs),
+            (snapshot.links(), self.bulk_repo.insert_playlist_songs),
+        )
+        for rows, insert in tables:
+            while chunk := list(islice(rows, batch_size)):
+                insert(chunk)
+                self.bulk_repo.commit()
+
+        end_time = time.time()
+        str_time = time.strftime("%H:%M:%S",time.gmtime(end_time - start_time))
+
+        if verbose:
+            print(f"Result snapshot import:")
+            print(f"- Users:          {snapshot.users_count}")
+            print(f"- Playlists:      {snapshot.playlists_count}")
+            print(f"- Songs:          {snapshot.songs_count}")
+            print(f"- Links:          {snapshot.links_count}")
+            print(f"- DB size:        {file_size(db_path)}")
+            print(f"- Importing time: {str_time}")
+
     def get_all_users(self):
         return self.user_repo.get_all_users()
 
+    def _cached(self, key, load):
+        if self.cache is None:
+            return load()
+        generation = self.cache.generation
+        value = self.cache.get(key)
+        if value is MISS:
+            value = load()
+            self.cache.set(key, value, generation)
+        return value
+
+    def _invalidate(self, *keys):
+        if self.cache is not None:
+            invalidate(self.user_repo.session, self.cache, *keys)
+
     def get_user_by_id(self, user_id):
         return self.user_repo.get_user_by_id(user_id)
 
-    def add_user(self, username):
-        return self.user_repo.add_user(username)
+    def get_user_record(self, user_id):
+        """
+        Користувач як UserRecord (або None) з кешу, якщо його передано сервісу.
+        """
+        return self._cached(user_key(user_id), lambda: user_record(self.user_repo.get_user_by_id(user_id)))
+
+    def get_user_with_playlists(self, user_id):
+        return self.user_repo.get_user_with_playlists(user_id)
+
+    def get_users_page(self, after=None, limit=DEFAULT_PAGE_SIZE):
+        return self.user_repo.get_users_page(after, limit)
+
+    def add_user(self, user_or_username):
+        user = user_or_username if isinstance(user_or_username, User) else User(username=user_or_username)
+        self.user_repo.add_user(user)
+        # Id міг бути в негативному кеші
+        self._invalidate(user_key(user.id))
 
     def update_user(self, user_id, username):
+        self._invalidate(user_key(user_id))
         return self.user_repo.update_user(user_id, username)
 
     def delete_user(self, user_id):
+        if self.cache is not None:
+            # Плейлисти користувача видаляє каскад разом з ним
+            playlist_ids = self.playlist_repo.get_playlist_ids_by_user_id(user_id)
+            self._invalidate(user_key(user_id), *(playlist_key(playlist_id) for playlist_id in playlist_ids))
         return self.user_repo.delete_user(user_id)
 
     def get_all_playlists_by_user_id(self, user_id):
@@ -152,19 +505,59 @@ class SpotifyService(ISpotifyService):
     def add_playlist(self, user_id, playlist_name):
         new_playlist = Playlist(name=playlist_name, user=self.get_user_by_id(user_id), user_id=user_id)
         self.playlist_repo.add_playlist(new_playlist, user_id)
+        self._invalidate(playlist_key(new_playlist.id))
 
     def get_playlist_by_id(self, playlist_id):
         return self.playlist_repo.get_playlist_by_id(playlist_id)
 
+    def get_playlist_record(self, playlist_id):
+        """
+        Плейлист як PlaylistRecord (або None) з кешу; власник підставляється
+        з кешу користувачів, тож перейменування користувача видно одразу.
+        Промах читає плейлист разом з власником одним запитом і кешує обох.
+        """
+        if self.cache is None:
+            playlist = self.playlist_repo.get_playlist_with_user(playlist_id)
+            if playlist is None:
+                return None
+            return playlist_record(playlist)._replace(user=user_record(playlist.user))
+
+        generation = self.cache.generation
+        record = self.cache.get(playlist_key(playlist_id))
+        if record is MISS:
+            playlist = self.playlist_repo.get_playlist_with_user(playlist_id)
+            record = playlist_record(playlist)
+            self.cache.set(playlist_key(playlist_id), record, generation)
+            if playlist is not None and playlist.user is not None:
+                self.cache.set(user_key(playlist.user_id), user_record(playlist.user), generation)
+
+        if record is None or record.user_id is None:
+            return record
+        return record._replace(user=self.get_user_record(record.user_id))
+
+    def get_playlist_with_songs(self, playlist_id):
+        return self.playlist_repo.get_playlist_with_songs(playlist_id)
+
+    def get_playlist_with_user(self, playlist_id):
+        return self.playlist_repo.get_playlist_with_user(playlist_id)
+
+    def get_playlists_page_by_user_id(self, user_id, after=None, limit=DEFAULT_PAGE_SIZE):
+        return self.playlist_repo.get_playlists_page_by_user_id(user_id, after, limit)
+
     def update_playlist(self, playlist_id, new_name):
+        self._invalidate(playlist_key(playlist_id))
         return self.playlist_repo.update_playlist(playlist_id, new_name)
 
     def delete_playlist(self, playlist_id):
+        self._invalidate(playlist_key(playlist_id))
         return self.playlist_repo.delete_playlist(playlist_id)
 
     def get_all_songs_by_playlist_id(self, playlist_id):
         return self.song_repo.get_all_songs_by_playlist_id(playlist_id)
 
+    def get_songs_page_by_playlist_id(self, playlist_id, after=None, limit=DEFAULT_PAGE_SIZE):
+        return self.song_repo.get_songs_page_by_playlist_id(playlist_id, after, limit)
+
     def add_song_to_playlist(self, playlist_id, song_title, song_artist):
         playlist = self.get_playlist_by_id(playlist_id)
         if not playlist:
@@ -177,9 +570,39 @@ class SpotifyService(ISpotifyService):
     def get_song_by_id(self, song_id):
         return self.song_repo.get_song_by_id(song_id)
 
+    def get_song_with_playlists(self, song_id):
+        return self.song_repo.get_song_with_playlists(song_id)
+
+    def get_first_playlist_id(self, song_id):
+        return self.song_repo.get_first_playlist_id(song_id)
+
     def update_song(self, song_id, new_title, new_artist):
         return self.song_repo.update_song(song_id, new_title, new_artist)
 
     def delete_song(self, song_id):
         return self.song_repo.delete_song(song_id)
 
+    def search(self, kind, query, after=None, limit=DEFAULT_PAGE_SIZE):
+        """
+        Сторінка результатів пошуку в розділі kind ('songs', 'playlists', 'users').
+        """
+        if self.search_repo is None:
+            return Page([], None)
+        return self.search_repo.search(kind, query, after, limit)
+
+    def get_table_counts(self):
+        """
+        Кількість рядків за таблицями: {'users': ..., 'playlists': ..., 'songs': ..., 'playlist_song': ...}.
+        """
+        if self.stats_repo is None:
+            return {}
+        return self.stats_repo.get_table_counts()
+
+    def get_top_artists(self, limit=DEFAULT_TOP_SIZE):
+        """
+        Виконавці з найбільшою кількістю появ у плейлистах.
+        """
+        if self.stats_repo is None:
+            return []
+        return self.stats_repo.get_top_artists(limit)
+
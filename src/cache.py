@@ -0,0 +1,231 @@
+"""
+Кеш сутностей перед репозиторіями.
+
+У кеші лежать незмінні записи (UserRecord, PlaylistRecord), а не об'єкти ORM:
+сесії живуть один запит, а кеш спільний для всіх потоків. Відсутня сутність
+теж кешується (негативний кеш, значення None) з коротшим TTL, щоб
+повторні запити до неіснуючих id не йшли в базу.
+
+Бекенди:
+- InProcessCache — LRU обмеженого розміру з TTL у пам'яті процесу;
+- SharedCache — спільний кеш для кількох процесів поверх клієнта з
+  інтерфейсом redis-py (get/set(px=...)/delete); LocalSharedClient — його
+  локальна заміна для розробки і тестів.
+"""
+import pickle
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+DEFAULT_MAX_SIZE = 10_000
+DEFAULT_TTL = 60.0
+DEFAULT_NEGATIVE_TTL = 5.0
+
+# Результат get(), коли ключа немає в кеші (None — це закешована відсутність)
+MISS = object()
+
+# Ключі, які треба ще раз видалити з кешу після завершення транзакції сесії
+PENDING_INVALIDATIONS = 'cache_invalidations'
+
+
+class UserRecord(NamedTuple):
+    id: str
+    username: str
+
+
+class PlaylistRecord(NamedTuple):
+    id: str
+    name: str
+    user_id: Optional[str]
+    # Заповнюється під час читання з кешу користувачів, у кеші плейлистів завжди None
+    user: Optional[UserRecord] = None
+
+
+def user_key(user_id: str):
+    return f'user:{user_id}'
+
+
+def playlist_key(playlist_id: str):
+    return f'playlist:{playlist_id}'
+
+
+def user_record(user):
+    return None if user is None else UserRecord(user.id, user.username)
+
+
+def playlist_record(playlist):
+    return None if playlist is None else PlaylistRecord(playlist.id, playlist.name, playlist.user_id)
+
+
+def invalidate(session, cache, *keys: str):
+    """
+    Видаляє ключі одразу і ще раз після завершення зовнішньої транзакції сесії.
+    Інакше паралельне читання до коміту могло б знову покласти в кеш старий рядок.
+    """
+    cache.delete(*keys)
+    session.info.setdefault(PENDING_INVALIDATIONS, []).append((cache, keys))
+
+
+@event.listens_for(Session, 'after_transaction_end')
+def _invalidate_pending(session, transaction):
+    # Вкладені транзакції (SAVEPOINT) пропускаємо: зміни видно іншим лише після зовнішньої
+    if transaction.parent is None and PENDING_INVALIDATIONS in session.info:
+        for cache, keys in session.info.pop(PENDING_INVALIDATIONS):
+            cache.delete(*keys)
+
+
+class ICache(ABC):
+    def __init__(self, ttl: float = DEFAULT_TTL, negative_ttl: float = DEFAULT_NEGATIVE_TTL):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        # Лічильник інвалідацій: значення, прочитане з бази до інвалідації, не кешується
+        self.generation = 0
+
+    @abstractmethod
+    def get(self, key: str):
+        """
+        Повертає значення або MISS.
+        """
+        pass
+
+    @abstractmethod
+    def set(self, key: str, value, generation: int = None):
+        """
+        Якщо передано generation і відтоді була інвалідація, значення не зберігається.
+        """
+        pass
+
+    @abstractmethod
+    def delete(self, *keys: str):
+        pass
+
+    def _expiry(self, value):
+        return self.negative_ttl if value is None else self.ttl
+
+    def _count(self, value):
+        if value is MISS:
+            self.misses += 1
+        else:
+            self.hits += 1
+            if value is None:
+                self.negative_hits += 1
+        return value
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'negative_hits': self.negative_hits,
+            'misses': self.misses,
+            'invalidations': self.invalidations,
+        }
+
+
+class InProcessCache(ICache):
+    def __init__(self, max_size: int = DEFAULT_MAX_SIZE, ttl: float = DEFAULT_TTL, negative_ttl: float = DEFAULT_NEGATIVE_TTL):
+        super().__init__(ttl, negative_ttl)
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key: str):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return self._count(MISS)
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self.entries[key]
+                return self._count(MISS)
+            self.entries.move_to_end(key)
+            return self._count(value)
+
+    def set(self, key: str, value, generation: int = None):
+        with self.lock:
+            if generation is not None and generation != self.generation:
+                return
+            self.entries[key] = (value, time.monotonic() + self._expiry(value))
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, *keys: str):
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
+            self.invalidations += len(keys)
+            self.generation += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.generation += 1
+
+    def stats(self):
+        return {**super().stats(), 'evictions': self.evictions, 'size': len(self.entries)}
+
+
+class SharedCache(ICache):
+    """
+    Кеш у зовнішньому сховищі, спільному для процесів (наприклад, redis.Redis()).
+    Розмір і витіснення LRU налаштовуються в самому сховищі (maxmemory-policy).
+    Лічильник generation локальний для процесу, тож від гонки з записом
+    в іншому процесі захищає лише TTL.
+    """
+    def __init__(self, client, prefix: str = 'spotify:', ttl: float = DEFAULT_TTL, negative_ttl: float = DEFAULT_NEGATIVE_TTL):
+        super().__init__(ttl, negative_ttl)
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key: str):
+        data = self.client.get(self.prefix + key)
+        return self._count(MISS if data is None else pickle.loads(data))
+
+    def set(self, key: str, value, generation: int = None):
+        if generation is not None and generation != self.generation:
+            return
+        self.client.set(self.prefix + key, pickle.dumps(value), px=int(self._expiry(value) * 1000))
+
+    def delete(self, *keys: str):
+        if keys:
+            self.client.delete(*(self.prefix + key for key in keys))
+        self.invalidations += len(keys)
+        self.generation += 1
+
+
+class LocalSharedClient:
+    """
+    Локальна заміна клієнта redis для SharedCache: ті самі get/set/delete
+    над словником у пам'яті.
+    """
+    def __init__(self):
+        self.data = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.data.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self.data[key]
+                return None
+            return value
+
+    def set(self, key, value, px=None):
+        with self.lock:
+            self.data[key] = (value, None if px is None else time.monotonic() + px / 1000)
+
+    def delete(self, *keys):
+        with self.lock:
+            return sum(self.data.pop(key, None) is not None for key in keys)
@@ -1,58 +1,149 @@
 import argparse
 import os
+import time
 
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from src.models import Base, User, Playlist, Song
-from src.dal import UserRepository, PlaylistRepository, SongRepository
+from src.dal import UserRepository, PlaylistRepository, SongRepository, BulkRepository
 from src.bll import SpotifyService
-from src.generator import generate_spotify_csv
+from src.generator import generate_spotify_csv, generate_spotify_rows, Popularity
+from src.database import import_profile
+from src.schema import upgrade_schema, outdated_tables
+from src.snapshot import Snapshot, write_snapshot
+from src.query_plans import check_query_plans
+from src.file_size import file_size, parse_size, convert_bytes
+from src.orphans import collect_orphan_songs, missing_triggers
+from src.presets import PRESETS, DEFAULTS
 
-def create_database(db_path: str):
+def create_database(db_path: str, reset: bool = True):
     engine = create_engine(f'sqlite:///{db_path}')
-    Base.metadata.drop_all(engine)  # Якщо існує — видаляємо всі таблиці
-    Base.metadata.create_all(engine)  # Створюємо нові таблиці
+    if reset:
+        Base.metadata.drop_all(engine)  # Якщо існує — видаляємо всі таблиці
+    else:
+        upgrade_schema(engine)  # Стара база отримує каскадні зовнішні ключі
+    Base.metadata.create_all(engine)  # Створюємо нові таблиці (існуючі не чіпаємо)
     return engine
 
+def resolve_dataset(args):
+    """
+    Збирає параметри генерації: типові значення, потім -s/-m/-l або --preset,
+    потім явно задані опції командного рядка.
+    """
+    dataset = dict(DEFAULTS)
+    selected = [name for name in ('s', 'm', 'l') if getattr(args, name)]
+    if len(selected) == 1:
+        dataset.update(PRESETS[selected[0]])
+    if args.preset:
+        dataset.update(PRESETS[args.preset])
+
+    for option in ('users', 'playlists', 'songs', 'engine', 'seed', 'rows', 'target_size', 'catalog', 'song_skew', 'count_skew'):
+        if getattr(args, option, None) is not None:
+            dataset[option] = getattr(args, option)
+
+    if dataset.get('target_size') is not None:
+        dataset['target_size'] = parse_size(dataset['target_size'])
+
+    # Параметри каталогу пісень збираються в один об'єкт для рушія 'zipf'
+    shape = {field: dataset.pop(field) for field in Popularity._fields if field in dataset}
+    if shape:
+        dataset['popularity'] = Popularity(**shape)
+    return dataset
+
 def generate_csv_command(args):
     print(f"CSV file generation started.")
-    if args.s and not (args.m or args.l):
-        generate_spotify_csv(
-                filename = args.path, 
-                users = 10 if not args.users else args.users, 
-                playlists = 10 if not args.playlists else args.playlists, 
-                songs = 10 if not args.songs else args.songs, 
-                verbose = args.verbose
-            )
-    elif args.m and not (args.s or args.l):
-        generate_spotify_csv(
-                filename = args.path, 
-                users = 100 if not args.users else args.users, 
-                playlists = 100 if not args.playlists else args.playlists, 
-                songs = 100 if not args.songs else args.songs, 
-                verbose = args.verbose
-            )
-    elif args.l and not (args.s or args.m):
-        generate_spotify_csv(
-                filename = args.path, 
-                users = 1000 if not args.users else args.users, 
-                playlists = 1000 if not args.playlists else args.playlists, 
-                songs = 1000 if not args.songs else args.songs, 
-                verbose = args.verbose
-            )
-    else:
-        generate_spotify_csv(
-                filename = args.path, 
-                users = 10 if not args.users else args.users, 
-                playlists = 20 if not args.playlists else args.playlists, 
-                songs = 20 if not args.songs else args.songs, 
-                verbose = args.verbose
-            )
+    generate_spotify_csv(filename = args.path, verbose = args.verbose, workers = args.workers, **resolve_dataset(args))
     print(f"CSV file generated successfully.")
 
+def generate_db_command(args):
+    dataset = resolve_dataset(args)
+    if dataset.pop('target_size', None) is not None:
+        raise ValueError('Target size applies only to CSV generation, use --rows for gen_db')
+
+    print(f"Database generation started: {args.path_db}")
+
+    if os.path.exists(args.path_db):
+        os.remove(args.path_db)
+        if args.verbose:
+            print(f"Existing database {args.path_db} removed.")
+
+    engine = create_database(args.path_db)
+    Session = sessionmaker(bind=engine)
+
+    with import_profile(engine):
+        session = Session()
+        service = SpotifyService(UserRepository(session), PlaylistRepository(session), SongRepository(session), BulkRepository(session))
+
+        # Рядки генератора йдуть одразу в пакетні вставки, без проміжного CSV
+        try:
+            rows = generate_spotify_rows(verbose = args.verbose, **dataset)
+            service.import_rows(rows, args.path_db, args.verbose, batch_size=args.batch_size)
+        finally:
+            session.close()
+
+    print(f"Database generated successfully: {args.path_db}")
+
 def import_csv_command(args):
     print(f"Starting import from CSV: {args.path_csv}")
 
+    keep_database = args.resume or args.upsert
+    if keep_database:
+        if args.verbose:
+            print(f"Importing into existing database {args.path_db}.")
+    elif os.path.exists(args.path_db):
+        os.remove(args.path_db)
+        if args.verbose:
+            print(f"Existing database {args.path_db} removed.")
+
+    engine = create_database(args.path_db, reset=not keep_database)
+    Session = sessionmaker(bind=engine)
+
+    with import_profile(engine):
+        session = Session()
+
+        # Створюємо репозиторії
+        user_repo = UserRepository(session)
+        playlist_repo = PlaylistRepository(session)
+        song_repo = SongRepository(session)
+        bulk_repo = BulkRepository(session)
+
+        # Створюємо сервіс
+        service = SpotifyService(user_repo, playlist_repo, song_repo, bulk_repo)
+
+        # Імпортуємо CSV
+        try:
+            service.import_from_csv(args.path_csv, args.path_db, args.verbose, batch_size=args.batch_size, workers=args.workers, resume=args.resume, upsert=args.upsert)
+        finally:
+            session.close()
+
+    print(f"Import completed successfully into database: {args.path_db}")
+
+def export_snapshot_command(args):
+    print(f"Exporting snapshot from database: {args.path_db}")
+
+    if not os.path.exists(args.path_db):
+        raise FileNotFoundError(args.path_db)
+
+    start_time = time.time()
+    engine = create_engine(f'sqlite:///{args.path_db}')
+    with engine.connect() as connection:
+        users, playlists, songs, links = write_snapshot(connection, args.path)
+    str_time = time.strftime("%H:%M:%S",time.gmtime(time.time() - start_time))
+
+    if args.verbose:
+        print(f"Result snapshot export:")
+        print(f"- Users:          {users}")
+        print(f"- Playlists:      {playlists}")
+        print(f"- Songs:          {songs}")
+        print(f"- Links:          {links}")
+        print(f"- Snapshot size:  {file_size(args.path)}")
+        print(f"- Export time:    {str_time}")
+
+    print(f"Snapshot written successfully: {args.path}")
+
+def import_snapshot_command(args):
+    print(f"Starting import from snapshot: {args.path}")
+
     if os.path.exists(args.path_db):
         os.remove(args.path_db)
         if args.verbose:
@@ -60,17 +151,69 @@ def import_csv_command(args):
 
     engine = create_database(args.path_db)
     Session = sessionmaker(bind=engine)
-    session = Session()
 
-    # Створюємо репозиторії
-    user_repo = UserRepository(session)
-    playlist_repo = PlaylistRepository(session)
-    song_repo = SongRepository(session)
+    with import_profile(engine), Snapshot(args.path) as snapshot:
+        session = Session()
+        service = SpotifyService(UserRepository(session), PlaylistRepository(session), SongRepository(session), BulkRepository(session))
+        try:
+            service.import_snapshot(snapshot, args.path_db, args.verbose, batch_size=args.batch_size)
+        finally:
+            session.close()
+
+    print(f"Import completed successfully into database: {args.path_db}")
 
-    # Створюємо сервіс
-    service = SpotifyService(user_repo, playlist_repo, song_repo)
+def check_plans_command(args):
+    target = args.path_db or 'schema from src/models.py'
+    print(f"Checking repository query plans against: {target}")
 
-    # Імпортуємо CSV
-    service.import_from_csv(args.path_csv, args.path_db, args.verbose)
+    if args.path_db and not os.path.exists(args.path_db):
+        raise FileNotFoundError(args.path_db)
 
-    print(f"Import completed successfully into database: {args.path_db}")
+    db_url = f'sqlite:///{args.path_db}' if args.path_db else None
+    failures = 0
+    for name, statement, plan, scans in check_query_plans(db_url):
+        if scans:
+            failures += 1
+            print(f"FULL SCAN in {name}: {', '.join(scans)}")
+            print(f"  {statement}")
+        elif args.verbose:
+            print(f"ok {name}: {'; '.join(detail for _, _, _, detail in plan)}")
+
+    if failures:
+        raise SystemExit(f"{failures} repository queries do full table scans")
+    print(f"All repository queries use indexes.")
+
+def gc_command(args):
+    print(f"Removing orphaned songs from database: {args.path_db}")
+
+    if not os.path.exists(args.path_db):
+        raise FileNotFoundError(args.path_db)
+
+    # Збирач працює поруч із застосунком короткими транзакціями, тож схему
+    # не оновлює: перебудова таблиць тримала б запис на весь час міграції
+    start_time = time.time()
+    engine = create_engine(f'sqlite:///{args.path_db}')
+    try:
+        missing = missing_triggers(engine)
+        if missing:
+            raise SystemExit(f"Database schema is out of date (missing triggers: {', '.join(missing)}). "
+                             f"Upgrade it first by starting the web app or running import_csv --append.")
+        outdated = outdated_tables(engine)
+        if outdated:
+            print(f"Warning: tables {', '.join(outdated)} have no ON DELETE CASCADE yet; the web app upgrades them on start.")
+        collected = collect_orphan_songs(engine, args.after, args.batch_size, args.max_batches, args.pause)
+    finally:
+        engine.dispose()
+    str_time = time.strftime("%H:%M:%S",time.gmtime(time.time() - start_time))
+
+    if args.verbose:
+        print(f"Result garbage collection:")
+        print(f"- Batches:        {collected.batches}")
+        print(f"- Songs removed:  {collected.rows}")
+        print(f"- Row data:       {convert_bytes(collected.bytes)}")
+        print(f"- Freed pages:    {convert_bytes(collected.free_bytes)}")
+        print(f"- GC time:        {str_time}")
+
+    print(f"Removed {collected.rows} orphaned songs ({convert_bytes(collected.bytes)}).")
+    if collected.next_cursor is not None:
+        print(f"Stopped after {collected.batches} batches, continue with --after {collected.next_cursor}")
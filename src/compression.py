@@ -0,0 +1,109 @@
+"""
+Потокове стиснення CSV за розширенням файлу: .gz, .bz2, .xz і .zst
+(останнє — якщо встановлено пакет zstandard). Файли читаються і пишуться
+шарами поверх звичайного бінарного файлу, тож позиція у стисненому файлі
+(raw.tell()) завжди доступна для прогресу, а тимчасова розпакована копія не потрібна.
+"""
+import bz2
+import gzip
+import io
+import lzma
+import os
+
+COMPRESSED_SUFFIXES = ('.gz', '.bz2', '.xz', '.zst')
+
+
+def compression_of(path: str):
+    suffix = os.path.splitext(path)[1].lower()
+    return suffix if suffix in COMPRESSED_SUFFIXES else None
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        raise ValueError('Reading and writing .zst files requires the zstandard package') from None
+    return zstandard
+
+
+def open_reader(raw, compression):
+    """
+    Обгортає бінарний файл розпаковувальним потоком; без стиснення повертає його ж.
+    Склеєні потоки (кілька gzip-членів, zstd-фреймів тощо) читаються як один.
+    """
+    if compression is None:
+        return raw
+    if compression == '.gz':
+        return gzip.GzipFile(fileobj=raw, mode='rb')
+    if compression == '.bz2':
+        return bz2.BZ2File(raw, mode='rb')
+    if compression == '.xz':
+        return lzma.LZMAFile(raw, mode='rb')
+    reader = _zstandard().ZstdDecompressor().stream_reader(raw, read_across_frames=True, closefd=False)
+    return io.BufferedReader(reader)
+
+
+def open_writer(raw, compression):
+    if compression is None:
+        return raw
+    if compression == '.gz':
+        return gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=6)
+    if compression == '.bz2':
+        return bz2.BZ2File(raw, mode='wb')
+    if compression == '.xz':
+        return lzma.LZMAFile(raw, mode='wb')
+    writer = _zstandard().ZstdCompressor().stream_writer(raw, closefd=False)
+    return io.BufferedWriter(writer)
+
+
+class InputFile:
+    """
+    Бінарний потік розпакованих даних і лічильник прочитаних стиснених байтів.
+    """
+    def __init__(self, path: str):
+        self.raw = open(path, 'rb')
+        self.compression = compression_of(path)
+        self.file = open_reader(self.raw, self.compression)
+        self.total_bytes = os.fstat(self.raw.fileno()).st_size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def bytes_read(self):
+        return self.raw.tell()
+
+    def close(self):
+        if self.file is not self.raw:
+            self.file.close()
+        self.raw.close()
+
+
+class OutputFile:
+    """
+    Текстовий потік для csv.writer, що стискається на льоту.
+    compression за замовчуванням визначається з розширення path.
+    """
+    def __init__(self, path: str, compression='auto', mode='wb'):
+        if compression == 'auto':
+            compression = compression_of(path)
+        self.raw = open(path, mode)
+        self.binary = open_writer(self.raw, compression)
+        self.text = io.TextIOWrapper(self.binary, encoding='utf-8', newline='')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def bytes_written(self):
+        return self.raw.tell()
+
+    def close(self):
+        self.text.close()
+        self.raw.close()
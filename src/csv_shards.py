@@ -0,0 +1,70 @@
+import csv
+import io
+import mmap
+import os
+import re
+from operator import itemgetter
+
+SHARD_BYTES = 8 * 1024 * 1024
+
+# Лапки в CSV йдуть парами від початку файлу (екрановані "" — теж пара), тож
+# вираз пропускає пари без переносу рядка і шукає першу, всередині якої він є.
+# Присвійні квантифікатори проходять файл один раз, без повернень
+_QUOTED_LINE_BREAK = re.compile(rb'\A(?:[^"]*+"[^"\n]*+")*+[^"]*+"[^"\n]*+\n')
+
+
+def read_header(csv_path: str):
+    with open(csv_path, newline='', encoding='utf-8') as file:
+        return next(csv.reader(file), [])
+
+
+def has_multiline_records(csv_path: str):
+    """
+    Чи є у файлі записи, розірвані переносом рядка всередині поля в лапках.
+    Межі шматків shard_ranges ставить по символу нового рядка, тож такий файл
+    можна імпортувати лише послідовно. Файл без лапок перевіряється одним find.
+    """
+    if os.path.getsize(csv_path) == 0:
+        return False
+
+    with open(csv_path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        if mm.find(b'"') == -1:
+            return False
+        return _QUOTED_LINE_BREAK.match(mm) is not None
+
+
+def shard_ranges(csv_path: str, workers: int, shard_bytes: int = SHARD_BYTES, start: int = 0):
+    """
+    Ділить файл (без заголовка) на діапазони байтів, вирівняні по кінцю запису.
+    start дозволяє почати з уже відомої межі запису, наприклад з контрольної точки.
+    Межею запису вважається символ нового рядка, тож файл з полями з переносами
+    рядків (has_multiline_records) ділити не можна.
+    """
+    if os.path.getsize(csv_path) == 0:
+        return []
+
+    with open(csv_path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        size = len(mm)
+        start = max(start, mm.find(b'\n') + 1 or size)
+        count = max(workers, (size - start) // shard_bytes)
+        step = max(1, (size - start) // count)
+
+        ranges = []
+        while start < size:
+            end = mm.find(b'\n', min(start + step, size) - 1) + 1 or size
+            ranges.append((start, end))
+            start = end
+        return ranges
+
+
+def parse_shard(task):
+    """
+    Розбирає один діапазон байтів у компактні кортежі рядків.
+    Виконується у процесі пулу, тому приймає один аргумент-кортеж.
+    """
+    csv_path, start, end, columns = task
+    with open(csv_path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        text = mm[start:end].decode('utf-8')
+
+    getter = itemgetter(*columns)
+    return [getter(row) for row in csv.reader(io.StringIO(text, newline='')) if row]
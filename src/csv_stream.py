@@ -0,0 +1,53 @@
+import csv
+from src.progress_bar import print_progress_bar
+from src.compression import InputFile
+
+
+class CsvStream:
+    """
+    Читає CSV за один прохід і рахує прогрес за прочитаними байтами,
+    тож файл не треба попередньо перелічувати по рядках.
+    Стиснені файли (.gz, .bz2, .xz, .zst) розпаковуються на льоту,
+    а прогрес рахується за прочитаними стисненими байтами.
+    """
+    def __init__(self, csv_path: str, encoding: str = 'utf-8'):
+        self.encoding = encoding
+        self.input = InputFile(csv_path)
+        self.file = self.input.file
+        self.total_bytes = self.input.total_bytes
+        # Кінець останнього повністю прочитаного запису (у розпакованих байтах)
+        self.offset = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.input.close()
+
+    def lines(self):
+        for line in self.file:
+            self.offset += len(line)
+            yield line.decode(self.encoding)
+
+    def seek(self, offset: int):
+        self.file.seek(offset)
+        self.offset = offset
+
+    def reader(self):
+        return csv.reader(self.lines())
+
+    def dict_reader(self):
+        return csv.DictReader(self.lines())
+
+    @property
+    def bytes_read(self):
+        return self.input.bytes_read
+
+    def print_progress(self):
+        print_progress_bar(
+                self.bytes_read,
+                max(1, self.total_bytes),
+                prefix = '- Progress',
+                suffix = 'Complete',
+                length = 50
+            )
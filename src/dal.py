@@ -1,7 +1,41 @@
-from typing import Union
+from contextlib import contextmanager
+from typing import Union, NamedTuple, Optional
 from abc import ABC, abstractmethod
-from sqlalchemy.orm import Session
-from src.models import User, Playlist, Song
+from sqlalchemy import or_, text, select, update, delete
+from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy.dialects.sqlite import insert
+from src.models import User, Playlist, Song, ImportCheckpoint, ArtistStats, TableCount, playlist_song
+from src.search import SEARCH_INDEXES, MAX_SEARCH_RESULTS, match_query
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+DEFAULT_TOP_SIZE = 10
+
+
+class Page(NamedTuple):
+    """
+    Сторінка keyset-пагінації: елементи, впорядковані за id, і курсор
+    наступної сторінки (id останнього елемента або None, якщо сторінка остання).
+    """
+    items: list
+    next_cursor: Optional[str]
+
+
+def keyset_page(query, key, after: str = None, limit: int = DEFAULT_PAGE_SIZE):
+    """
+    Повертає сторінку query після курсора after, впорядковану за key.
+    Замість OFFSET використовується умова key > after, тож глибока сторінка
+    читається індексом так само швидко, як перша. Вибирається limit + 1 рядок,
+    щоб дізнатися, чи є наступна сторінка, без окремого COUNT.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    if after is not None:
+        query = query.filter(key > after)
+    items = query.order_by(key).limit(limit + 1).all()
+    if len(items) > limit:
+        items = items[:limit]
+        return Page(items, items[-1].id)
+    return Page(items, None)
 
 # Абстрактні інтерфейси
 class IUserRepository(ABC):
@@ -17,6 +51,14 @@ class IUserRepository(ABC):
     def get_user_by_id(self, user_id: str):
         pass
 
+    @abstractmethod
+    def get_user_with_playlists(self, user_id: str):
+        pass
+
+    @abstractmethod
+    def get_users_page(self, after: str = None, limit: int = DEFAULT_PAGE_SIZE):
+        pass
+
     @abstractmethod
     def update_user(self, user_id: str):
         pass
@@ -39,10 +81,26 @@ class IPlaylistRepository(ABC):
     def get_all_playlists_by_user_id(self, user_id: str):
         pass
 
+    @abstractmethod
+    def get_playlist_ids_by_user_id(self, user_id: str):
+        pass
+
     @abstractmethod
     def get_playlist_by_id(self, playlist_id: str):
         pass
 
+    @abstractmethod
+    def get_playlist_with_songs(self, playlist_id: str):
+        pass
+
+    @abstractmethod
+    def get_playlist_with_user(self, playlist_id: str):
+        pass
+
+    @abstractmethod
+    def get_playlists_page_by_user_id(self, user_id: str, after: str = None, limit: int = DEFAULT_PAGE_SIZE):
+        pass
+
     @abstractmethod
     def update_playlist(self, playlist_id: str):
         pass
@@ -62,6 +120,18 @@ class ISongRepository(ABC):
     def get_song_by_id(self, song_id: str):
         pass
 
+    @abstractmethod
+    def get_song_with_playlists(self, song_id: str):
+        pass
+
+    @abstractmethod
+    def get_first_playlist_id(self, song_id: str):
+        pass
+
+    @abstractmethod
+    def get_songs_page_by_playlist_id(self, playlist_id: str, after: str = None, limit: int = DEFAULT_PAGE_SIZE):
+        pass
+
     @abstractmethod
     def get_all_songs_by_playlist_id(self, playlist_id: str):
         pass
@@ -78,11 +148,127 @@ class ISongRepository(ABC):
     def delete_song(self, song_id: str):
         pass
 
+
+class IBulkRepository(ABC):
+    @abstractmethod
+    def insert_users(self, rows: list):
+        pass
+
+    @abstractmethod
+    def insert_playlists(self, rows: list):
+        pass
+
+    @abstractmethod
+    def insert_songs(self, rows: list):
+        pass
+
+    @abstractmethod
+    def insert_playlist_songs(self, rows: list):
+        pass
+
+    @abstractmethod
+    def upsert_users(self, rows: list):
+        pass
+
+    @abstractmethod
+    def upsert_playlists(self, rows: list):
+        pass
+
+    @abstractmethod
+    def upsert_songs(self, rows: list):
+        pass
+
+    @abstractmethod
+    def get_checkpoint(self, csv_path: str):
+        pass
+
+    @abstractmethod
+    def save_checkpoint(self, csv_path: str, fingerprint: str, offset: int):
+        pass
+
+    @abstractmethod
+    def commit(self):
+        pass
+
+
+class IStatsRepository(ABC):
+    @abstractmethod
+    def get_table_counts(self):
+        pass
+
+    @abstractmethod
+    def get_top_artists(self, limit: int = DEFAULT_TOP_SIZE):
+        pass
+
+
+class ISearchRepository(ABC):
+    @abstractmethod
+    def search(self, kind: str, query: str, after: str = None, limit: int = DEFAULT_PAGE_SIZE):
+        pass
+
+# Глибина вкладених transaction() у session.info
+TRANSACTION_DEPTH = 'transaction_depth'
+
+
+def in_transaction(session: Session):
+    return session.info.get(TRANSACTION_DEPTH, 0) > 0
+
+
+@contextmanager
+def transaction(session: Session):
+    """
+    Одиниця роботи: всередині блоку репозиторії лише скидають зміни (flush),
+    а весь блок комітиться один раз на виході або відкочується при помилці.
+    Вкладені блоки приєднуються до зовнішнього.
+    """
+    depth = session.info.get(TRANSACTION_DEPTH, 0)
+    session.info[TRANSACTION_DEPTH] = depth + 1
+    try:
+        yield session
+        if depth == 0:
+            session.commit()
+    except BaseException:
+        if depth == 0:
+            session.rollback()
+        raise
+    finally:
+        session.info[TRANSACTION_DEPTH] = depth
+
+
 # Реалізація DAL через SQLAlchemy
-class UserRepository(IUserRepository):
+class SessionRepository:
+    """
+    Основа репозиторіїв: поза transaction() кожна зміна комітиться одразу,
+    всередині — лише flush, а коміт робить transaction().
+    """
     def __init__(self, session: Session):
         self.session = session
 
+    def _commit(self):
+        if in_transaction(self.session):
+            self.session.flush()
+        else:
+            self.session.commit()
+
+    def _update(self, model, entity_id: str, **values):
+        """
+        Одна інструкція UPDATE ... WHERE id = ?; повертає, чи знайшовся рядок.
+        """
+        matched = self.session.execute(update(model).where(model.id == entity_id).values(**values)).rowcount > 0
+        self._commit()
+        return matched
+
+    def _delete(self, model, entity_id: str):
+        """
+        Одна інструкція DELETE ... WHERE id = ?; залежні рядки видаляє ON DELETE CASCADE.
+        Повертає, чи знайшовся рядок.
+        """
+        matched = self.session.execute(delete(model).where(model.id == entity_id)).rowcount > 0
+        self._commit()
+        return matched
+
+
+class UserRepository(SessionRepository, IUserRepository):
     def add_user(self, user_or_username: Union[User, str]):
         if isinstance(user_or_username, User):
             user = user_or_username
@@ -92,7 +278,7 @@ class UserRepository(IUserRepository):
             raise ValueError('Invalid type for add_user: expected User or str')
 
         self.session.add(user)
-        self.session.commit()
+        self._commit()
 
     def get_all_users(self):
         return self.session.query(User).all()
@@ -100,24 +286,23 @@ class UserRepository(IUserRepository):
     def get_user_by_id(self, user_id: str):
         return self.session.query(User).filter_by(id=user_id).first()
 
+    def get_user_with_playlists(self, user_id: str):
+        # Користувач і всі його плейлисти за два запити
+        return (self.session.query(User)
+                .options(selectinload(User.playlists))
+                .filter_by(id=user_id)
+                .first())
+
+    def get_users_page(self, after: str = None, limit: int = DEFAULT_PAGE_SIZE):
+        return keyset_page(self.session.query(User), User.id, after, limit)
+
     def update_user(self, user_id: str, new_username: str):
-        user = self.get_user_by_id(user_id)
-        if user:
-            user.username = new_username
-            self.session.commit()
-        return user
+        return self._update(User, user_id, username=new_username)
 
     def delete_user(self, user_id: str):
-        user = self.get_user_by_id(user_id)
-        if user:
-            self.session.delete(user)
-            self.session.commit()
-        return user
-
-class PlaylistRepository(IPlaylistRepository):
-    def __init__(self, session: Session):
-        self.session = session
+        return self._delete(User, user_id)
 
+class PlaylistRepository(SessionRepository, IPlaylistRepository):
     def add_playlist(self, playlist_or_playlistname: Union[Playlist, str], user_id: str):
         if isinstance(playlist_or_playlistname, Playlist):
             playlist = playlist_or_playlistname
@@ -127,65 +312,207 @@ class PlaylistRepository(IPlaylistRepository):
             raise ValueError('Invalid type for add_playlist: expected Playlist or str')
 
         self.session.add(playlist)
-        self.session.commit()
+        self._commit()
 
     def add_song_to_playlist(self, playlist: Playlist, song: Song):
         playlist.songs.append(song)
-        self.session.commit()
+        self._commit()
 
     def get_all_playlists_by_user_id(self, user_id: str):
         return self.session.query(Playlist).filter_by(user_id=user_id).all()
 
+    def get_playlist_ids_by_user_id(self, user_id: str):
+        # Лише id з індексу (user_id, id), без завантаження об'єктів
+        return list(self.session.scalars(select(Playlist.id).where(Playlist.user_id == user_id)))
+
     def get_playlist_by_id(self, playlist_id: str):
         return self.session.query(Playlist).filter_by(id=playlist_id).first()
 
+    def get_playlist_with_songs(self, playlist_id: str):
+        # Плейлист разом з власником (JOIN) і пісні окремим запитом IN (...)
+        return (self.session.query(Playlist)
+                .options(joinedload(Playlist.user), selectinload(Playlist.songs))
+                .filter_by(id=playlist_id)
+                .first())
+
+    def get_playlist_with_user(self, playlist_id: str):
+        return (self.session.query(Playlist)
+                .options(joinedload(Playlist.user))
+                .filter_by(id=playlist_id)
+                .first())
+
+    def get_playlists_page_by_user_id(self, user_id: str, after: str = None, limit: int = DEFAULT_PAGE_SIZE):
+        query = self.session.query(Playlist).filter_by(user_id=user_id)
+        return keyset_page(query, Playlist.id, after, limit)
+
     def update_playlist(self, playlist_id: str, new_name: str):
-        playlist = self.get_playlist_by_id(playlist_id)
-        if playlist:
-            playlist.name = new_name
-            self.session.commit()
-        return playlist
+        return self._update(Playlist, playlist_id, name=new_name)
 
     def delete_playlist(self, playlist_id: str):
-        playlist = self.get_playlist_by_id(playlist_id)
-        if playlist:
-            self.session.delete(playlist)
-            self.session.commit()
-        return playlist
-
+        return self._delete(Playlist, playlist_id)
 
-class SongRepository(ISongRepository):
-    def __init__(self, session: Session):
-        self.session = session
 
+class SongRepository(SessionRepository, ISongRepository):
     def add_song(self, song: Song):
         self.session.add(song)
-        self.session.commit()
+        self._commit()
 
     def get_song_by_id(self, song_id: str):
         return self.session.query(Song).filter_by(id=song_id).first()
 
+    def get_song_with_playlists(self, song_id: str):
+        return (self.session.query(Song)
+                .options(selectinload(Song.playlists))
+                .filter_by(id=song_id)
+                .first())
+
+    def get_first_playlist_id(self, song_id: str):
+        # Один рядок через ix_playlist_song_song_id замість завантаження всіх плейлистів пісні
+        return (self.session.query(playlist_song.c.playlist_id)
+                .filter(playlist_song.c.song_id == song_id)
+                .limit(1)
+                .scalar())
+
     def get_all_songs_by_playlist_id(self, playlist_id: str):
-        playlist = self.session.query(Playlist).filter_by(id=playlist_id).first()
-        if playlist:
-            return playlist.songs
-        return []
+        # Один запит з JOIN замість завантаження плейлиста і ледачого playlist.songs
+        return (self.session.query(Song)
+                .join(playlist_song, playlist_song.c.song_id == Song.id)
+                .filter(playlist_song.c.playlist_id == playlist_id)
+                .all())
+
+    def get_songs_page_by_playlist_id(self, playlist_id: str, after: str = None, limit: int = DEFAULT_PAGE_SIZE):
+        # Курсор — song_id з первинного ключа playlist_song (playlist_id, song_id)
+        query = (self.session.query(Song)
+                 .join(playlist_song, playlist_song.c.song_id == Song.id)
+                 .filter(playlist_song.c.playlist_id == playlist_id))
+        return keyset_page(query, playlist_song.c.song_id, after, limit)
 
     def get_all_songs(self):
         return self.session.query(Song).all()
 
     def update_song(self, song_id: str, new_title: str, new_artist: str):
-        song = self.get_song_by_id(song_id)
-        if song:
-            song.title = new_title
-            song.artist = new_artist
-            self.session.commit()
-        return song
+        return self._update(Song, song_id, title=new_title, artist=new_artist)
 
     def delete_song(self, song_id: str):
-        song = self.get_song_by_id(song_id)
-        if song:
-            self.session.delete(song)
-            self.session.commit()
-        return song
-
+        return self._delete(Song, song_id)
+
+
+class BulkRepository(SessionRepository, IBulkRepository):
+    """
+    Багаторядкові вставки через SQLAlchemy Core (executemany) без ORM.
+    Рядки, що вже є в базі, пропускаються (INSERT OR IGNORE).
+    Коміт робить лише commit(), тому транзакцію контролює викликач;
+    всередині transaction() commit() лише скидає зміни.
+    """
+
+    def _insert(self, table, rows: list):
+        if rows:
+            self.session.execute(insert(table).on_conflict_do_nothing(), rows)
+
+    def insert_users(self, rows: list):
+        self._insert(User.__table__, rows)
+
+    def insert_playlists(self, rows: list):
+        self._insert(Playlist.__table__, rows)
+
+    def insert_songs(self, rows: list):
+        self._insert(Song.__table__, rows)
+
+    def insert_playlist_songs(self, rows: list):
+        self._insert(playlist_song, rows)
+
+    def _upsert(self, table, rows: list, columns: tuple):
+        # Конфлікти по id розв'язує сама SQLite для всієї пачки,
+        # а незмінені рядки не переписуються завдяки умові WHERE
+        if rows:
+            statement = insert(table)
+            statement = statement.on_conflict_do_update(
+                index_elements=[table.c.id],
+                set_={column: statement.excluded[column] for column in columns},
+                where=or_(*(table.c[column] != statement.excluded[column] for column in columns))
+            )
+            self.session.execute(statement, rows)
+
+    def upsert_users(self, rows: list):
+        self._upsert(User.__table__, rows, ('username',))
+
+    def upsert_playlists(self, rows: list):
+        self._upsert(Playlist.__table__, rows, ('name', 'user_id'))
+
+    def upsert_songs(self, rows: list):
+        self._upsert(Song.__table__, rows, ('title', 'artist'))
+
+    def get_checkpoint(self, csv_path: str):
+        return self.session.query(ImportCheckpoint).filter_by(csv_path=csv_path).first()
+
+    def save_checkpoint(self, csv_path: str, fingerprint: str, offset: int):
+        # Пишеться в тій самій транзакції, що й пачка рядків
+        statement = insert(ImportCheckpoint.__table__).on_conflict_do_update(
+            index_elements=['csv_path'],
+            set_={'fingerprint': fingerprint, 'offset': offset}
+        )
+        self.session.execute(statement, {'csv_path': csv_path, 'fingerprint': fingerprint, 'offset': offset})
+
+    def commit(self):
+        self._commit()
+
+
+class StatsRepository(SessionRepository, IStatsRepository):
+    """
+    Читає лічильники, які підтримують тригери src.stats: час відповіді
+    не залежить від розміру бази.
+    """
+
+    def get_table_counts(self):
+        return {row.name: row.count for row in self.session.query(TableCount).all()}
+
+    def get_top_artists(self, limit: int = DEFAULT_TOP_SIZE):
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        return (self.session.query(ArtistStats)
+                .order_by(ArtistStats.link_count.desc(), ArtistStats.artist)
+                .limit(limit)
+                .all())
+
+
+class SearchRepository(SessionRepository, ISearchRepository):
+    """
+    Пошук в індексах FTS5 (src.search). Результати впорядковані за релевантністю
+    (bm25, менше — краще) серед усіх збігів.
+
+    FTS5 рахує bm25 для кожного збігу, але з ORDER BY rank і LIMIT сортує сам
+    і тримає лише limit + offset найкращих, а вміст рядків читається тільки
+    для сторінки. Гортати можна до MAX_SEARCH_RESULTS результатів; курсор —
+    зміщення. Зміни між сторінками (нові збіги, зміна статистики bm25) можуть
+    зсунути результати на кілька позицій: рядок повториться або випаде.
+    """
+
+    def search(self, kind: str, query: str, after: str = None, limit: int = DEFAULT_PAGE_SIZE):
+        index = SEARCH_INDEXES[kind]
+        expression = match_query(query)
+        if expression is None:
+            return Page([], None)
+
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        offset = self._parse_cursor(after)
+        page_size = min(limit, MAX_SEARCH_RESULTS - offset)
+
+        columns = ', '.join(f'content.{column}' for column in index.columns)
+        statement = (f"SELECT content.id, {columns}, ranked.rank AS rank FROM ("
+                     f"SELECT rowid, rank FROM {index.table} WHERE {index.table} MATCH :expression "
+                     f"ORDER BY rank LIMIT :limit OFFSET :offset) AS ranked "
+                     f"JOIN {index.content} AS content ON content.rowid = ranked.rowid ORDER BY ranked.rank")
+        parameters = {'expression': expression, 'limit': page_size + 1, 'offset': offset}
+
+        items = self.session.execute(text(statement), parameters).all()
+        if len(items) > page_size and offset + page_size < MAX_SEARCH_RESULTS:
+            return Page(items[:page_size], str(offset + page_size))
+        return Page(items[:page_size], None)
+
+    @staticmethod
+    def _parse_cursor(after: str):
+        # Пошкоджений курсор або курсор за межею результатів повертає першу сторінку
+        try:
+            offset = int(after)
+        except (TypeError, ValueError):
+            return 0
+        return offset if 0 <= offset < MAX_SEARCH_RESULTS else 0
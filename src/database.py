@@ -0,0 +1,151 @@
+from contextlib import contextmanager
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from src.models import Base
+from src.search import drop_search_triggers, rebuild_search_indexes
+from src.stats import drop_stats_triggers, rebuild_stats
+
+# Налаштування з'єднання на час масового завантаження
+IMPORT_PRAGMAS = (
+    'PRAGMA journal_mode=WAL',
+    # У WAL не синхронізує диск на кожен коміт, але закомічена пачка разом з її
+    # контрольною точкою (--resume) переживає і збій ОС, а не лише вбитий процес
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA cache_size=-262144',  # 256 MB
+    'PRAGMA temp_store=MEMORY',
+)
+
+# Режим журналу, у якому база віддається веб-застосунку: у WAL читачі
+# не блокують один одного і не чекають на запис
+SERVING_JOURNAL_MODE = 'WAL'
+
+# Налаштування кожного з'єднання веб-застосунку
+SERVING_PRAGMAS = (
+    f'PRAGMA journal_mode={SERVING_JOURNAL_MODE}',
+    'PRAGMA synchronous=NORMAL',  # У WAL безпечно і не синхронізує диск на кожен коміт
+    'PRAGMA busy_timeout=5000',   # Чекати на блокування запису замість помилки "database is locked"
+)
+
+DEFAULT_POOL_SIZE = 10
+
+# Таблиці, які заповнює імпорт
+LOADED_TABLES = ('users', 'playlists', 'songs', 'playlist_song')
+
+
+def secondary_indexes():
+    return [index for table in Base.metadata.sorted_tables for index in table.indexes]
+
+
+def _existing_names(connection, kind: str):
+    return {name for name, in connection.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = ?", (kind,))}
+
+
+def is_bulk_load(connection):
+    """
+    Чи відкладати індекси до кінця імпорту: так для порожньої бази і для бази,
+    з якої їх уже прибрав перерваний масовий імпорт. Дельта в заповнену базу
+    (--append, --resume після такого ж імпорту) пише з діючими індексами,
+    тож її час залежить від розміру дельти, а не бази.
+    """
+    if any(index.name not in _existing_names(connection, 'index') for index in secondary_indexes()):
+        return True
+    return all(connection.exec_driver_sql(f"SELECT 1 FROM {table} LIMIT 1").first() is None for table in LOADED_TABLES)
+
+
+def _apply_pragmas(dbapi_connection, pragmas):
+    cursor = dbapi_connection.cursor()
+    for pragma in pragmas:
+        cursor.execute(pragma)
+    cursor.close()
+
+
+def _apply_import_pragmas(dbapi_connection, connection_record):
+    _apply_pragmas(dbapi_connection, IMPORT_PRAGMAS)
+
+
+def _apply_serving_pragmas(dbapi_connection, connection_record):
+    # Транзакціями керує SQLAlchemy (_begin_transaction), а не драйвер pysqlite,
+    # інакше SAVEPOINT відкривається поза BEGIN і його RELEASE комітить усе
+    dbapi_connection.isolation_level = None
+    _apply_pragmas(dbapi_connection, SERVING_PRAGMAS)
+
+
+def _begin_transaction(connection):
+    connection.exec_driver_sql('BEGIN')
+
+
+def serving_engine(url: str, pool_size: int = DEFAULT_POOL_SIZE):
+    """
+    Рушій для веб-застосунку: пул з'єднань, з якого кожен потік запитів
+    бере власне з'єднання, і pragma для паралельного читання у WAL.
+    Явний BEGIN на початку транзакції робить SAVEPOINT вкладеними, як очікує
+    SQLAlchemy. База в пам'яті у кожного потоку своя, тому для неї пул не налаштовується.
+    """
+    if make_url(url).database in (None, '', ':memory:'):
+        engine = create_engine(url)
+    else:
+        engine = create_engine(url, pool_size=pool_size, max_overflow=pool_size, pool_pre_ping=True)
+    event.listen(engine, 'connect', _apply_serving_pragmas)
+    event.listen(engine, 'begin', _begin_transaction)
+    return engine
+
+
+def async_serving_engine(url: str, pool_size: int = DEFAULT_POOL_SIZE):
+    """
+    Асинхронний рушій (aiosqlite) з тими ж pragma і керуванням транзакціями,
+    що й serving_engine. Синхронна адреса sqlite:/// перетворюється на sqlite+aiosqlite:///.
+    """
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    url = make_url(url).set(drivername='sqlite+aiosqlite')
+    if url.database in (None, '', ':memory:'):
+        engine = create_async_engine(url)
+    else:
+        engine = create_async_engine(url, pool_size=pool_size, max_overflow=pool_size, pool_pre_ping=True)
+    event.listen(engine.sync_engine, 'connect', _apply_serving_pragmas)
+    event.listen(engine.sync_engine, 'begin', _begin_transaction)
+    return engine
+
+
+@contextmanager
+def import_profile(engine: Engine):
+    """
+    Профіль масового імпорту: швидкі pragma на кожному з'єднанні. При
+    завантаженні в порожню базу (is_bulk_load) вторинні індекси, індекси
+    пошуку і лічильники будуються один раз після завантаження, а не рядок за
+    рядком, і збирається статистика (ANALYZE); дельта в заповнену базу отримує
+    лише pragma, а індекси пошуку і лічильники оновлюють їхні тригери.
+    На виході повертає безпечний режим журналу.
+    Сесії, відкриті всередині профілю, треба закрити до виходу з нього.
+    """
+    engine.dispose()  # З'єднання з пулу мають отримати нові pragma
+    event.listen(engine, 'connect', _apply_import_pragmas)
+
+    with engine.begin() as connection:
+        bulk_load = is_bulk_load(connection)
+        if bulk_load:
+            for index in secondary_indexes():
+                index.drop(connection, checkfirst=True)
+            drop_search_triggers(connection)
+            drop_stats_triggers(connection)
+
+    try:
+        yield engine
+    finally:
+        event.remove(engine, 'connect', _apply_import_pragmas)
+        engine.dispose()
+
+        with engine.begin() as connection:
+            if bulk_load:
+                for index in secondary_indexes():
+                    index.create(connection, checkfirst=True)
+                rebuild_search_indexes(connection)
+                rebuild_stats(connection)
+
+        # Контрольна точка і зміна режиму журналу — поза транзакцією перебудови
+        with engine.begin() as connection:
+            connection.exec_driver_sql('PRAGMA wal_checkpoint(TRUNCATE)')
+            connection.exec_driver_sql(f'PRAGMA journal_mode={SERVING_JOURNAL_MODE}')
+            if bulk_load:
+                connection.exec_driver_sql('ANALYZE')
+        engine.dispose()
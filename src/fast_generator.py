@@ -0,0 +1,80 @@
+"""
+Швидкий рушій генерації: значення вибираються з наперед побудованих словників,
+UUID карбуються пачками з випадкових байтів, а рядки збираються блоками
+векторними операціями NumPy замість виклику Faker на кожен рядок.
+"""
+import numpy as np
+from faker import Faker
+
+POOL_SIZE = 4096
+BLOCK_USERS = 1000
+
+HEX_DIGITS = np.frombuffer(b'0123456789abcdef', dtype=np.uint8)
+UUID_DASHES = (8, 13, 18, 23)
+UUID_DIGITS = np.array([i for i in range(36) if i not in UUID_DASHES])
+
+
+class Vocabulary:
+    """
+    Словники значень, згенеровані Faker один раз на запуск.
+    """
+    def __init__(self, seed=None, size=POOL_SIZE):
+        fake = Faker()
+        fake.seed_instance(seed)
+        self.usernames = np.array([fake.user_name() for _ in range(size)], dtype=object)
+        self.playlist_names = np.array([fake.word() + "_playlist" for _ in range(size)], dtype=object)
+        self.song_titles = np.array([fake.sentence(nb_words=3)[:-1] for _ in range(size)], dtype=object)
+        self.artists = np.array([fake.name() for _ in range(size)], dtype=object)
+
+
+def uuid4_strings(rng, count):
+    """
+    Повертає count рядків UUID версії 4, зібраних з випадкових байтів без циклу Python.
+    """
+    raw = np.frombuffer(rng.bytes(16 * count), dtype=np.uint8).reshape(count, 16).copy()
+    raw[:, 6] = (raw[:, 6] & 0x0F) | 0x40
+    raw[:, 8] = (raw[:, 8] & 0x3F) | 0x80
+
+    nibbles = np.empty((count, 32), dtype=np.uint8)
+    nibbles[:, 0::2] = raw >> 4
+    nibbles[:, 1::2] = raw & 0x0F
+
+    chars = np.full((count, 36), ord('-'), dtype=np.uint8)
+    chars[:, UUID_DIGITS] = HEX_DIGITS[nibbles]
+    return chars.view('S36').ravel().astype('U36').astype(object)
+
+
+def generate_blocks(users=10, playlists=20, songs=20, seed=None, block_users=BLOCK_USERS):
+    """
+    Генерує дані блоками по block_users користувачів.
+    Кожен елемент — (users, playlists, rows) з тими ж колонками і розподілами
+    кількостей, що й рушій Faker.
+    """
+    rng = np.random.default_rng(seed)
+    vocabulary = Vocabulary(seed)
+
+    for first_user in range(0, users, block_users):
+        block_size = min(block_users, users - first_user)
+
+        playlist_counts = rng.integers(1, playlists + 1, size=block_size)
+        playlist_owner = np.repeat(np.arange(block_size), playlist_counts)
+        song_counts = rng.integers(1, songs + 1, size=len(playlist_owner))
+        row_playlist = np.repeat(np.arange(len(playlist_owner)), song_counts)
+        row_user = playlist_owner[row_playlist]
+        row_count = len(row_playlist)
+
+        user_ids = uuid4_strings(rng, block_size)
+        usernames = vocabulary.usernames[rng.integers(0, len(vocabulary.usernames), size=block_size)]
+        playlist_ids = uuid4_strings(rng, len(playlist_owner))
+        playlist_names = vocabulary.playlist_names[rng.integers(0, len(vocabulary.playlist_names), size=len(playlist_owner))]
+
+        rows = zip(
+            user_ids[row_user].tolist(),
+            usernames[row_user].tolist(),
+            playlist_ids[row_playlist].tolist(),
+            playlist_names[row_playlist].tolist(),
+            uuid4_strings(rng, row_count).tolist(),
+            vocabulary.song_titles[rng.integers(0, len(vocabulary.song_titles), size=row_count)].tolist(),
+            vocabulary.artists[rng.integers(0, len(vocabulary.artists), size=row_count)].tolist(),
+        )
+        yield block_size, len(playlist_owner), list(rows)
@@ -1,5 +1,6 @@
 import os
-import csv
+import hashlib
+from src.compression import InputFile
 
 
 def convert_bytes(num):
@@ -12,6 +13,19 @@ def convert_bytes(num):
         num /= 1024.0
 
 
+def parse_size(size):
+    """
+    this function will convert a size like '2GB', '512 MB' or '1000' to bytes
+    (units are powers of 1024, as in convert_bytes)
+    """
+    units = {'TB': 1024 ** 4, 'GB': 1024 ** 3, 'MB': 1024 ** 2, 'KB': 1024, 'B': 1}
+    text = str(size).strip().upper()
+    for unit, factor in units.items():
+        if text.endswith(unit):
+            return int(float(text[:-len(unit)]) * factor)
+    return int(text)
+
+
 def file_size(file_path):
     """
     this function will return the file size
@@ -21,9 +35,32 @@ def file_size(file_path):
         return convert_bytes(file_info.st_size)
     return 'File Error'
 
-def lines_in_csv(csv_file_path):
-    with open(csv_file_path, newline='') as file:
-        reader = csv.reader(file)
-        lines_in_csv = list(reader)
-    return len(lines_in_csv)
+def file_fingerprint(file_path, sample_size=1024 * 1024):
+    """
+    this function will return a fingerprint of the file built from its size
+    and the first and last sample_size bytes
+    """
+    size = os.path.getsize(file_path)
+    digest = hashlib.sha256(str(size).encode())
+    with open(file_path, 'rb') as file:
+        digest.update(file.read(sample_size))
+        file.seek(max(0, size - sample_size))
+        digest.update(file.read(sample_size))
+    return digest.hexdigest()
 
+def lines_in_csv(csv_file_path, block_size=1024 * 1024):
+    """
+    this function will return the number of lines in the CSV file,
+    counting newlines block by block in constant memory
+    (fields with embedded newlines are counted as several lines;
+    compressed files are counted after decompression)
+    """
+    lines = 0
+    last_byte = b'\n'
+    with InputFile(csv_file_path) as source:
+        while block := source.file.read(block_size):
+            lines += block.count(b'\n')
+            last_byte = block[-1:]
+    if last_byte != b'\n':
+        lines += 1
+    return lines
@@ -1,70 +1,293 @@
 from faker import Faker
 from src.progress_bar import print_progress_bar
 from src.file_size import file_size, lines_in_csv
+from src.compression import OutputFile, compression_of
 import csv
 import uuid
 import random
 import time
 import os
+import shutil
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple
 
 fake = Faker()
 
-def generate_spotify_csv(filename='data/spotify_data.csv', users=10, playlists=20, songs=20, verbose=False):
-    os.makedirs(os.path.dirname(filename), exist_ok=True)
+SHARD_COPY_BYTES = 1024 * 1024
+LIMIT_CHUNK_ROWS = 1024
 
-    start_time = time.time()
+# Кількість користувачів, коли обсяг задано рядками або розміром файлу
+UNLIMITED_USERS = sys.maxsize
+
+class Popularity(NamedTuple):
+    """
+    Параметри рушія 'zipf': розмір спільного каталогу пісень, показник Ципфа
+    для популярності пісень і показник степеневого розподілу кількостей
+    плейлистів на користувача та пісень на плейлист. catalog_seed фіксує
+    каталог (None — береться seed генерації).
+    """
+    catalog: int = 100_000
+    song_skew: float = 1.0
+    count_skew: float = 1.2
+    catalog_seed: int = None
+
+def generate_user_rows(users=10, playlists=20, songs=20, seed=None):
+    """
+    Генерує дані користувач за користувачем: кожен елемент — список рядків
+    [UserId, Username, PlaylistId, PlaylistName, SongId, SongTitle, Artist]
+    одного користувача. З однаковим seed результат повністю повторюється,
+    включно з UUID.
+    """
+    if seed is None:
+        rng, faker = random, fake
+        new_id = uuid.uuid4
+    else:
+        rng, faker = random.Random(seed), Faker()
+        faker.seed_instance(seed)
+        new_id = lambda: uuid.UUID(int=rng.getrandbits(128), version=4)
+
+    for user_num in range(1, users + 1):
+        user_id = str(new_id())
+        username = faker.user_name()
+        rows = []
+        for playlist_num in range(1, rng.randint(2, playlists + 1)):
+            playlist_id = str(new_id())
+            playlist_name = faker.word() + "_playlist"
+            for song_num in range(1, rng.randint(2, songs + 1)):
+                song_id = str(new_id())
+                song_sentence = faker.sentence(nb_words=3)
+                song_title = song_sentence[:-1]
+                artist = faker.name()
+                rows.append([user_id, username, playlist_id, playlist_name, song_id, song_title, artist])
+        yield rows
+
+def generate_blocks(users=10, playlists=20, songs=20, engine='faker', seed=None, popularity=None):
+    """
+    Генерує дані блоками (users, playlists, rows) обраним рушієм:
+    'faker' — реалістичні значення, по одному користувачу на блок;
+    'fast' — векторний рушій NumPy зі словниками значень (src.fast_generator);
+    'zipf' — спільний каталог пісень з популярністю за Ципфом (src.zipf_generator).
+    """
+    if engine == 'fast':
+        from src.fast_generator import generate_blocks as generate_fast_blocks
+        yield from generate_fast_blocks(users, playlists, songs, seed)
+    elif engine == 'zipf':
+        from src.zipf_generator import generate_blocks as generate_zipf_blocks
+        yield from generate_zipf_blocks(users, playlists, songs, seed, popularity or Popularity())
+    elif engine == 'faker':
+        for rows in generate_user_rows(users, playlists, songs, seed):
+            yield 1, len({row[2] for row in rows}), rows
+    else:
+        raise ValueError(f'Unknown generator engine: {engine}')
+
+def limit_blocks(blocks, rows=None, size=None, tell=None):
+    """
+    Обрізає потік блоків точно на rows рядках даних або приблизно на size байтах,
+    які повертає tell(). Блоки діляться на шматки по LIMIT_CHUNK_ROWS рядків,
+    а користувачі та плейлисти перелічуються за зміною id, бо рядки згруповані.
+    """
+    written = 0
+    last_user = last_playlist = None
+
+    for _, _, block_rows in blocks:
+        for start in range(0, len(block_rows), LIMIT_CHUNK_ROWS):
+            chunk = block_rows[start:start + LIMIT_CHUNK_ROWS]
+            if rows is not None:
+                chunk = chunk[:rows - written]
+
+            chunk_users = chunk_playlists = 0
+            for row in chunk:
+                if row[0] != last_user:
+                    last_user = row[0]
+                    chunk_users += 1
+                if row[2] != last_playlist:
+                    last_playlist = row[2]
+                    chunk_playlists += 1
+
+            yield chunk_users, chunk_playlists, chunk
+            written += len(chunk)
+
+            if rows is not None and written >= rows:
+                return
+            if size is not None and tell() >= size:
+                return
+
+def generate_spotify_rows(users=10, playlists=20, songs=20, verbose=False, engine='faker', seed=None, rows=None, popularity=None):
+    """
+    Плоский потік рядків для запису напряму в базу, з прогресом по користувачах
+    (або по рядках, якщо задано їх кількість).
+    """
+    if rows is not None:
+        blocks = limit_blocks(generate_blocks(UNLIMITED_USERS, playlists, songs, engine, seed, popularity), rows=rows)
+        total = rows
+    else:
+        blocks = generate_blocks(users, playlists, songs, engine, seed, popularity)
+        total = users
+    done = 0
+    update_progress = max(1, total // 1000)
+
+    if verbose : print_progress_bar(0, max(1, total), prefix = '- Progress:', suffix = 'Complete', length = 50)
+
+    for block_users, _, block_rows in blocks:
+        yield from block_rows
+        step = len(block_rows) if rows is not None else block_users
+        done += step
+        if verbose and (done % update_progress < step or done == total):
+            print_progress_bar(done, total, prefix = '- Progress:', suffix = 'Complete', length = 50)
+
+CSV_HEADER = ['UserId', 'Username', 'PlaylistId', 'PlaylistName', 'SongId', 'SongTitle', 'Artist']
+
+def _write_csv(output, users, playlists, songs, engine, seed, rows=None, target_size=None, verbose=False, popularity=None):
+    """
+    Пише рядки даних (без заголовка) у відкритий OutputFile і повертає лічильники
+    (users, playlists, songs). Прогрес рахується по користувачах,
+    рядках або байтах — залежно від того, чим задано обсяг.
+    Для стисненого файлу target_size і прогрес рахуються у стиснених байтах.
+    """
+    writer = csv.writer(output.text)
+    tell = lambda: output.bytes_written
+    if rows is not None or target_size is not None:
+        blocks = limit_blocks(generate_blocks(UNLIMITED_USERS, playlists, songs, engine, seed, popularity), rows, target_size, tell)
+    else:
+        blocks = generate_blocks(users, playlists, songs, engine, seed, popularity)
+
+    if rows is not None:
+        total, measure = rows, lambda: total_songs_written
+    elif target_size is not None:
+        total, measure = target_size, lambda: min(tell(), target_size)
+    else:
+        total, measure = users, lambda: total_users_written
 
     total_users_written = 0
     total_playlists_written = 0
     total_songs_written = 0
-    total_rows_written = 0
-
-    update_progress = max(1, users // 1000)
-
-    with open(filename, mode='w', newline='') as file:
-        writer = csv.writer(file)
-        writer.writerow(['UserId', 'Username', 'PlaylistId', 'PlaylistName', 'SongId', 'SongTitle', 'Artist'])
-        total_rows_written += 1
-
-        # Initial call to print 0% progress
-        if verbose : print_progress_bar(0, users, prefix = '- Progress:', suffix = 'Complete', length = 50)
-
-        for user_num in range(1, users + 1):
-            user_id = str(uuid.uuid4())
-            username = fake.user_name()
-            total_users_written += 1
-            for playlist_num in range(1, random.randint(2, playlists + 1)):
-                playlist_id = str(uuid.uuid4())
-                playlist_name = fake.word() + "_playlist"
-                total_playlists_written += 1
-                for song_num in range(1, random.randint(2, songs + 1)):
-                    song_id = str(uuid.uuid4())
-                    song_sentence = fake.sentence(nb_words=3)
-                    song_title = song_sentence[:-1]
-                    artist = fake.name()
-                    total_songs_written += 1
-                    writer.writerow([user_id, username, playlist_id, playlist_name, song_id, song_title, artist])
-                    total_rows_written += 1
-            # Update Progress Bar
-            if verbose and (user_num % update_progress == 0):
-                print_progress_bar(
-                        user_num, 
-                        users, 
-                        prefix = '- Progress:', 
-                        suffix = 'Complete', 
-                        length = 50
-                    )
-        
-        end_time = time.time()
-        str_time = time.strftime("%H:%M:%S",time.gmtime(end_time - start_time))
-
-        if verbose: 
-            print(f"Result CSV file generate:")
-            print(f"- Users written:     {total_users_written}")
-            print(f"- Playlists written: {total_playlists_written}")
-            print(f"- Songs written:     {total_songs_written}")
-            print(f"- Lines in CSV file: {lines_in_csv(filename)}")
-            print(f"- CSV file size:     {file_size(filename)}")
-            print(f"- Generation time:   {str_time}")
+
+    update_progress = max(1, total // 1000)
+    next_update = update_progress
+    printed = 0
+
+    # Initial call to print 0% progress
+    if verbose : print_progress_bar(0, max(1, total), prefix = '- Progress:', suffix = 'Complete', length = 50)
+
+    for block_users, block_playlists, block_rows in blocks:
+        writer.writerows(block_rows)
+        total_users_written += block_users
+        total_playlists_written += block_playlists
+        total_songs_written += len(block_rows)
+        # Update Progress Bar
+        if verbose and measure() >= next_update:
+            printed = done = measure()
+            next_update = done + update_progress
+            print_progress_bar(
+                    done, 
+                    total, 
+                    prefix = '- Progress:', 
+                    suffix = 'Complete', 
+                    length = 50
+                )
+
+    # Завершуємо рядок прогресу, якщо останнє оновлення не дійшло до 100%
+    if verbose:
+        done = measure()
+        if done != printed:
+            print_progress_bar(done, max(1, total), prefix = '- Progress:', suffix = 'Complete', length = 50)
+        if done < max(1, total):
+            print()
+
+    return total_users_written, total_playlists_written, total_songs_written
+
+def _generate_shard(task):
+    """
+    Генерує шматок CSV без заголовка в окремому процесі.
+    Власний seed потрібен, щоб процеси не повторювали стан random, успадкований від батька.
+    """
+    shard_path, compression, users, playlists, songs, engine, seed, rows, target_size, popularity = task
+
+    with OutputFile(shard_path, compression) as output:
+        return _write_csv(output, users, playlists, songs, engine, seed, rows, target_size, popularity=popularity)
+
+def _split(total, workers):
+    if total is None:
+        return [None] * workers
+    return [total // workers + (1 if worker < total % workers else 0) for worker in range(workers)]
+
+def _generate_shards(filename, users, playlists, songs, engine, workers, seed, rows, target_size, verbose, popularity=None):
+    seeds = random.Random(seed).sample(range(2 ** 32), workers)
+    # Каталог пісень спільний для всіх шматків, тож він залежить від загального seed
+    popularity = (popularity or Popularity())
+    if popularity.catalog_seed is None:
+        popularity = popularity._replace(catalog_seed=seed)
+    shards = zip(_split(users, workers), seeds, _split(rows, workers), _split(target_size, workers))
+    tasks = [
+        (f'{filename}.part{worker}', compression_of(filename), shard_users, playlists, songs, engine, shard_seed, shard_rows, shard_size, popularity)
+        for worker, (shard_users, shard_seed, shard_rows, shard_size) in enumerate(shards)
+        if shard_users and shard_rows != 0 and shard_size != 0
+    ]
+    shard_paths = [task[0] for task in tasks]
+
+    totals = [0, 0, 0]
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            if verbose : print_progress_bar(0, len(tasks), prefix = '- Shards:', suffix = 'Complete', length = 50)
+            for done, counts in enumerate(executor.map(_generate_shard, tasks), 1):
+                totals = [total + count for total, count in zip(totals, counts)]
+                if verbose : print_progress_bar(done, len(tasks), prefix = '- Shards:', suffix = 'Complete', length = 50)
+
+        # Зливаємо шматки по порядку під одним заголовком. Шматки вже стиснені,
+        # тож копіюємо їхні байти як є: склеєні gzip/bz2/xz/zstd-потоки
+        # читаються як один файл.
+        with OutputFile(filename) as output:
+            csv.writer(output.text).writerow(CSV_HEADER)
+        with open(filename, mode='ab') as file:
+            for shard_path in shard_paths:
+                with open(shard_path, mode='rb') as shard:
+                    shutil.copyfileobj(shard, file, SHARD_COPY_BYTES)
+    finally:
+        for shard_path in shard_paths:
+            if os.path.exists(shard_path):
+                os.remove(shard_path)
+
+    return tuple(totals)
+
+def generate_spotify_csv(filename='data/spotify_data.csv', users=10, playlists=20, songs=20, verbose=False, workers=None, seed=None, engine='faker', rows=None, target_size=None, popularity=None):
+    """
+    Генерує CSV. seed робить вихід побайтово однаковим між запусками
+    (за тієї ж кількості workers), rows задає точну кількість рядків даних,
+    а target_size — приблизний розмір файлу в байтах; з rows або target_size
+    кількість користувачів не обмежується. Розширення .gz, .bz2, .xz або .zst
+    вмикає потокове стиснення. popularity налаштовує рушій 'zipf'.
+    """
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+
+    start_time = time.time()
+
+    if rows is not None or target_size is not None:
+        users = UNLIMITED_USERS
+
+    if workers and workers > 1:
+        if seed is None:
+            seed = random.SystemRandom().randrange(2 ** 32)
+        totals = _generate_shards(filename, users, playlists, songs, engine, workers, seed, rows, target_size, verbose, popularity)
+    else:
+        with OutputFile(filename) as output:
+            csv.writer(output.text).writerow(CSV_HEADER)
+            totals = _write_csv(output, users, playlists, songs, engine, seed, rows, target_size, verbose, popularity)
+
+    total_users_written, total_playlists_written, total_songs_written = totals
+    total_rows_written = total_songs_written + 1
+
+    end_time = time.time()
+    str_time = time.strftime("%H:%M:%S",time.gmtime(end_time - start_time))
+
+    # Підсумок друкуємо після закриття файлу, щоб усі рядки вже були на диску
+    if verbose: 
+        print(f"Result CSV file generate:")
+        print(f"- Users written:     {total_users_written}")
+        print(f"- Playlists written: {total_playlists_written}")
+        print(f"- Songs written:     {total_songs_written}")
+        print(f"- Lines in CSV file: {lines_in_csv(filename)}")
+        print(f"- CSV file size:     {file_size(filename)}")
+        print(f"- Generation time:   {str_time}")
         
     return total_rows_written
@@ -1,5 +1,24 @@
 import argparse
-from src.command import generate_csv_command, import_csv_command
+from src.command import generate_csv_command, generate_db_command, import_csv_command, export_snapshot_command, import_snapshot_command, check_plans_command, gc_command
+from src.bll import DEFAULT_BATCH_SIZE
+from src.presets import PRESETS
+from src.orphans import DEFAULT_GC_BATCH, DEFAULT_GC_PAUSE
+
+
+def add_size_arguments(parser):
+    parser.add_argument('-s', action='store_true', help='Generate small dataset')
+    parser.add_argument('-m', action='store_true', help='Generate medium dataset')
+    parser.add_argument('-l', action='store_true', help='Generate large dataset')
+    parser.add_argument('--users', type=int, default=None, help='Number of Users generate')
+    parser.add_argument('--playlists', type=int, default=None, help='Max number of Playlist for one User generate')
+    parser.add_argument('--songs', type=int, default=None, help='Max number of Songs for one Playlist generate')
+    parser.add_argument('--preset', choices=sorted(PRESETS), default=None, help='Named dataset from the preset catalogue')
+    parser.add_argument('--engine', choices=['faker', 'fast', 'zipf'], default=None, help='Value generator: realistic Faker (default), vectorised NumPy pools or a shared Zipf-popular song catalogue')
+    parser.add_argument('--catalog', type=int, default=None, help='Song catalogue size for --engine zipf')
+    parser.add_argument('--song-skew', type=float, default=None, help='Zipf exponent of song popularity for --engine zipf')
+    parser.add_argument('--count-skew', type=float, default=None, help='Power-law exponent of playlist and song counts for --engine zipf')
+    parser.add_argument('--seed', type=int, default=None, help='Seed for reproducible output')
+    parser.add_argument('--rows', type=int, default=None, help='Exact number of data rows to generate')
 
 
 def main():
@@ -9,22 +28,56 @@ def main():
 
     gen_csv_parser = subparsers.add_parser('gen_csv', help='Generation Spotify CSV')
     gen_csv_parser.add_argument('--path', type=str, default='data/spotify_data.csv', help='Path to CSV file')
-    gen_csv_parser.add_argument('-s', action='store_true', help='Generate small CSV file')
-    gen_csv_parser.add_argument('-m', action='store_true', help='Generate medium CSV file')
-    gen_csv_parser.add_argument('-l', action='store_true', help='Generate large CSV file')
-    gen_csv_parser.add_argument('--users', type=int, default=None, help='Number of Users generate')
-    gen_csv_parser.add_argument('--playlists', type=int, default=None, help='Max number of Playlist for one User generate')
-    gen_csv_parser.add_argument('--songs', type=int, default=None, help='Max number of Songs for one Playlist generate')
+    add_size_arguments(gen_csv_parser)
+    gen_csv_parser.add_argument('--target-size', type=str, default=None, help='Approximate CSV file size, e.g. 2GB')
+    gen_csv_parser.add_argument('--workers', type=int, default=None, help='Number of processes generating CSV shards in parallel')
     gen_csv_parser.add_argument('--verbose', action='store_true', help='Enable verbose output mode')
     gen_csv_parser.set_defaults(func=generate_csv_command)
 
+    gen_db_parser = subparsers.add_parser('gen_db', help='Generation Spotify data straight into DB')
+    gen_db_parser.add_argument('--path_db', type=str, default='data/spotify_data.db', help='Path to DB file')
+    add_size_arguments(gen_db_parser)
+    gen_db_parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Rows per bulk insert transaction')
+    gen_db_parser.add_argument('--verbose', action='store_true', help='Enable verbose output mode')
+    gen_db_parser.set_defaults(func=generate_db_command)
+
     import_csv_parser = subparsers.add_parser('import_csv', help='Import Spotify CSV to DB')
     import_csv_parser.add_argument('--path_csv', type=str, default='data/spotify_data.csv', help='Path to CSV file')
     import_csv_parser.add_argument('--path_db', type=str, default='data/spotify_data.db', help='Path to CSV file')
+    import_csv_parser.add_argument('--batch-size', type=int, default=None, help='Rows per bulk insert transaction (per-entity commits if omitted)')
+    import_csv_parser.add_argument('--resume', action='store_true', help='Continue an interrupted import from its last checkpoint')
+    import_csv_parser.add_argument('--append', '--upsert', dest='upsert', action='store_true', help='Merge the CSV into an existing database instead of rebuilding it')
+    import_csv_parser.add_argument('--workers', type=int, default=None, help='Number of processes parsing the CSV in parallel')
     import_csv_parser.add_argument('--verbose', action='store_true', help='Enable verbose output mode')
     import_csv_parser.set_defaults(func=import_csv_command)
 
-    
+    export_snapshot_parser = subparsers.add_parser('export_snapshot', help='Export DB to binary snapshot')
+    export_snapshot_parser.add_argument('--path_db', type=str, default='data/spotify_data.db', help='Path to DB file')
+    export_snapshot_parser.add_argument('--path', type=str, default='data/spotify_data.snap', help='Path to snapshot file')
+    export_snapshot_parser.add_argument('--verbose', action='store_true', help='Enable verbose output mode')
+    export_snapshot_parser.set_defaults(func=export_snapshot_command)
+
+    import_snapshot_parser = subparsers.add_parser('import_snapshot', help='Import binary snapshot to DB')
+    import_snapshot_parser.add_argument('--path', type=str, default='data/spotify_data.snap', help='Path to snapshot file')
+    import_snapshot_parser.add_argument('--path_db', type=str, default='data/spotify_data.db', help='Path to DB file')
+    import_snapshot_parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Rows per bulk insert transaction')
+    import_snapshot_parser.add_argument('--verbose', action='store_true', help='Enable verbose output mode')
+    import_snapshot_parser.set_defaults(func=import_snapshot_command)
+
+    check_plans_parser = subparsers.add_parser('check_plans', help='Fail if a repository query does a full table scan')
+    check_plans_parser.add_argument('--path_db', type=str, default=None, help='Path to DB file (empty schema from models if omitted)')
+    check_plans_parser.add_argument('--verbose', action='store_true', help='Print the plan of every query')
+    check_plans_parser.set_defaults(func=check_plans_command)
+
+    gc_parser = subparsers.add_parser('gc', help='Delete songs that no playlist references')
+    gc_parser.add_argument('--path_db', type=str, default='data/spotify_data.db', help='Path to DB file')
+    gc_parser.add_argument('--batch-size', type=int, default=DEFAULT_GC_BATCH, help='Songs checked per delete transaction')
+    gc_parser.add_argument('--max-batches', type=int, default=None, help='Stop after this many batches (whole table if omitted)')
+    gc_parser.add_argument('--after', type=str, default=None, help='Resume from the song id printed by a previous run')
+    gc_parser.add_argument('--pause', type=float, default=DEFAULT_GC_PAUSE, help='Seconds to sleep between batches')
+    gc_parser.add_argument('--verbose', action='store_true', help='Enable verbose output mode')
+    gc_parser.set_defaults(func=gc_command)
+
     args = parser.parse_args()
     args.func(args)
 
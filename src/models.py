@@ -1,5 +1,5 @@
 import uuid
-from sqlalchemy import Column, String, ForeignKey, Table
+from sqlalchemy import Column, String, Integer, ForeignKey, Table, Index
 from sqlalchemy.orm import declarative_base, relationship
 
 Base = declarative_base()
@@ -7,8 +7,10 @@ Base = declarative_base()
 playlist_song = Table(
     'playlist_song',
     Base.metadata,
-    Column('playlist_id', String, ForeignKey('playlists.id'), primary_key=True),
-    Column('song_id', String, ForeignKey('songs.id'), primary_key=True)
+    Column('playlist_id', String, ForeignKey('playlists.id', ondelete='CASCADE'), primary_key=True),
+    Column('song_id', String, ForeignKey('songs.id', ondelete='CASCADE'), primary_key=True),
+    # Зворотний пошук плейлистів пісні; прямий покриває первинний ключ (playlist_id, song_id)
+    Index('ix_playlist_song_song_id', 'song_id'),
 )
 
 class User(Base):
@@ -16,8 +18,11 @@ class User(Base):
 
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     username = Column(String, nullable=False)
+    # Підтримується тригерами (src.stats)
+    playlist_count = Column(Integer, nullable=False, default=0, server_default='0')
 
-    playlists = relationship('Playlist', back_populates='user', cascade="all, delete-orphan")
+    # Залежні рядки видаляє сама база (ON DELETE CASCADE), ORM їх не завантажує
+    playlists = relationship('Playlist', back_populates='user', cascade="all, delete-orphan", passive_deletes=True)
 
     def __init__(self, username, id=None):
         self.username = username
@@ -29,14 +34,18 @@ class User(Base):
 
 class Playlist(Base):
     __tablename__ = 'playlists'
+    # Плейлисти користувача, впорядковані за id (пошук і keyset-пагінація)
+    __table_args__ = (Index('ix_playlists_user_id_id', 'user_id', 'id'),)
 
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     name = Column(String, nullable=False)
-    user_id = Column(String, ForeignKey('users.id'))
+    user_id = Column(String, ForeignKey('users.id', ondelete='CASCADE'))
+    # Підтримується тригерами (src.stats)
+    song_count = Column(Integer, nullable=False, default=0, server_default='0')
 
     user = relationship('User', back_populates='playlists')
     
-    songs = relationship('Song', secondary=playlist_song, back_populates='playlists')
+    songs = relationship('Song', secondary=playlist_song, back_populates='playlists', passive_deletes=True)
 
     def __init__(self, name: str, user: User, user_id: str, id=None):
         self.name = name
@@ -55,7 +64,7 @@ class Song(Base):
     title = Column(String, nullable=False)
     artist = Column(String, nullable=False)
 
-    playlists = relationship('Playlist', secondary=playlist_song, back_populates='songs')
+    playlists = relationship('Playlist', secondary=playlist_song, back_populates='songs', passive_deletes=True)
 
     def __init__(self, title, artist, playlists=None, id=None):
         self.title = title
@@ -68,3 +77,46 @@ class Song(Base):
     def __repr__(self):
         return f"Song(id={self.id}, title='{self.title}', artist='{self.artist}')"
 
+class ImportCheckpoint(Base):
+    __tablename__ = 'import_checkpoints'
+
+    csv_path = Column(String, primary_key=True)
+    fingerprint = Column(String, nullable=False)
+    offset = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"ImportCheckpoint(csv_path='{self.csv_path}', offset={self.offset})"
+
+class ArtistStats(Base):
+    """
+    Кількість пісень виконавця і їх появ у плейлистах; підтримується тригерами (src.stats).
+    """
+    __tablename__ = 'artist_stats'
+
+    artist = Column(String, primary_key=True)
+    song_count = Column(Integer, nullable=False, default=0)
+    link_count = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"ArtistStats(artist='{self.artist}', song_count={self.song_count}, link_count={self.link_count})"
+
+# Топ виконавців читається з початку індексу
+Index('ix_artist_stats_link_count', ArtistStats.link_count.desc(), ArtistStats.artist)
+
+class TableCount(Base):
+    """
+    Кількість рядків у users, playlists, songs і playlist_song без COUNT(*).
+    """
+    __tablename__ = 'table_counts'
+
+    name = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"TableCount(name='{self.name}', count={self.count})"
+
+# PRAGMA foreign_keys на кожному з'єднанні; індекси повнотекстового пошуку (FTS5)
+# і тригери лічильників створюються і видаляються разом зі схемою
+import src.schema  # noqa: E402,F401
+import src.search  # noqa: E402,F401
+import src.stats  # noqa: E402,F401
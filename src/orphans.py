@@ -0,0 +1,167 @@
+"""
+Прибирання пісень-сиріт.
+
+delete_playlist і delete_user видаляють лише зв'язки playlist_song, а рядки
+songs, на які більше не посилається жоден плейлист, залишаються. Збирач
+проходить songs вікнами по первинному ключу і в кожному вікні одним DELETE
+видаляє пісні без зв'язків. Кожне вікно — окрема коротка транзакція, тож
+блокування запису тримається мілісекунди, а між вікнами встигають записати
+інші з'єднання. Лічильники та індекси пошуку оновлюють їхні тригери.
+
+Звільнені сторінки SQLite повертає у список вільних (freelist) і
+використовує для нових рядків; розмір файлу зменшує лише VACUUM.
+"""
+import logging
+import threading
+import time
+from typing import NamedTuple, Optional
+from sqlalchemy import select, delete, exists, func, cast, LargeBinary
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+from src.models import Song, playlist_song
+from src.search import search_trigger_names
+from src.stats import STATS_TRIGGERS
+
+DEFAULT_GC_BATCH = 1000
+DEFAULT_GC_PAUSE = 0.01  # секунд між вікнами, щоб не займати запис підряд
+DEFAULT_GC_INTERVAL = 300  # секунд між проходами фонового збирача
+
+logger = logging.getLogger(__name__)
+
+
+class Collected(NamedTuple):
+    rows: int = 0
+    bytes: int = 0        # розмір даних видалених рядків
+    free_bytes: int = 0   # на скільки виріс список вільних сторінок за прохід
+    batches: int = 0
+    next_cursor: Optional[str] = None  # None — прохід по таблиці завершено
+
+    def __add__(self, other: 'Collected'):
+        return Collected(self.rows + other.rows, self.bytes + other.bytes, self.free_bytes + other.free_bytes,
+                         self.batches + other.batches, other.next_cursor)
+
+
+def _row_bytes():
+    return sum((func.length(cast(column, LargeBinary)) for column in (Song.id, Song.title, Song.artist)))
+
+
+def _window_end(after: Optional[str], batch_size: int):
+    """
+    Останній id вікна з batch_size пісень після after.
+    """
+    window = select(Song.id).order_by(Song.id).limit(batch_size)
+    if after is not None:
+        window = window.where(Song.id > after)
+    return select(func.max(window.subquery().c.id))
+
+
+def _delete_orphans(after: Optional[str], end: str):
+    """
+    DELETE пісень вікна без жодного зв'язку; перевірка йде по індексу
+    ix_playlist_song_song_id у тій самій інструкції, тож пісню, щойно додану
+    до плейлиста, не буде видалено.
+    """
+    statement = delete(Song).where(Song.id <= end, ~exists().where(playlist_song.c.song_id == Song.id))
+    if after is not None:
+        statement = statement.where(Song.id > after)
+    return statement.returning(_row_bytes())
+
+
+def _free_bytes(connection):
+    page_size = connection.exec_driver_sql('PRAGMA page_size').scalar()
+    return connection.exec_driver_sql('PRAGMA freelist_count').scalar() * page_size
+
+
+def missing_triggers(engine: Engine):
+    """
+    Тригери пошуку і лічильників, яких бракує в базі (стара схема або
+    перерваний масовий імпорт). Без них видалення пісень розсинхронізує
+    індекси пошуку й лічильники, тож збирач на такій базі не запускається.
+    """
+    with engine.connect() as connection:
+        existing = {name for name, in connection.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'trigger'")}
+    return [name for name in (*search_trigger_names(), *STATS_TRIGGERS) if name not in existing]
+
+
+def collect_orphan_songs(engine: Engine, after: str = None, batch_size: int = DEFAULT_GC_BATCH,
+                         max_batches: int = None, pause: float = DEFAULT_GC_PAUSE):
+    """
+    Видаляє пісні-сироти, починаючи з id після after, не більше max_batches
+    вікон по batch_size пісень (без обмеження — до кінця таблиці).
+    Повертає Collected; next_cursor передається в наступний виклик,
+    щоб продовжити прохід з місця зупинки.
+    """
+    with engine.connect() as connection:
+        free_before = _free_bytes(connection)
+
+    total = Collected(next_cursor=after)
+    while max_batches is None or total.batches < max_batches:
+        if total.batches and pause:
+            time.sleep(pause)
+
+        # Межа вікна читається окремо: транзакція видалення починається з запису
+        # і не чекає на оновлення знімка читання
+        with engine.connect() as connection:
+            end = connection.execute(_window_end(after, batch_size)).scalar()
+        if end is None:
+            total = total._replace(next_cursor=None)
+            break
+
+        with engine.begin() as connection:
+            deleted = connection.execute(_delete_orphans(after, end)).scalars().all()
+        after = end
+        total += Collected(len(deleted), sum(deleted), 0, 1, after)
+
+    # Паралельні записи теж змінюють список вільних сторінок, тож оцінка наближена
+    with engine.connect() as connection:
+        return total._replace(free_bytes=max(_free_bytes(connection) - free_before, 0))
+
+
+class OrphanCollector:
+    """
+    Фоновий потік, що кожні interval секунд продовжує прохід
+    collect_orphan_songs ще на max_batches вікон. Підсумок усіх проходів — у total.
+    """
+    def __init__(self, engine: Engine, interval: float = DEFAULT_GC_INTERVAL, batch_size: int = DEFAULT_GC_BATCH,
+                 max_batches: int = None, pause: float = DEFAULT_GC_PAUSE):
+        self.engine = engine
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_batches = max_batches
+        self.pause = pause
+        self.total = Collected()
+        self.cursor = None
+        self.stopped = threading.Event()
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        with self.lock:
+            if self.thread is None:
+                self.stopped.clear()
+                self.thread = threading.Thread(target=self._run, name='orphan-collector', daemon=True)
+                self.thread.start()
+
+    def close(self):
+        with self.lock:
+            thread, self.thread = self.thread, None
+        if thread is not None:
+            self.stopped.set()
+            thread.join()
+
+    def run_once(self):
+        collected = collect_orphan_songs(self.engine, self.cursor, self.batch_size, self.max_batches, self.pause)
+        self.cursor = collected.next_cursor
+        self.total += collected
+        return collected
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                self.run_once()
+            except OperationalError as error:
+                # Наприклад, база зайнята довше за busy_timeout: спроба в наступному проході
+                logger.warning('Orphan collection postponed: %s', error)
+            except Exception:
+                # Помилка схеми чи коду не має тихо зупинити прибирання
+                logger.exception('Orphan collection failed')
@@ -0,0 +1,20 @@
+# Каталог стандартних наборів даних.
+# s/m/l — класичні розміри для розробки; bench-* — фіксовані набори для замірів
+# продуктивності: з seed і точною кількістю рядків (або розміром файлу) вони
+# однакові між запусками, тож результати імпорту можна порівнювати.
+# bench-zipf повторює пісні між плейлистами з популярністю за Ципфом.
+PRESETS = {
+    's': {'users': 10, 'playlists': 10, 'songs': 10},
+    'm': {'users': 100, 'playlists': 100, 'songs': 100},
+    'l': {'users': 1000, 'playlists': 1000, 'songs': 1000},
+    'bench-10k': {'playlists': 10, 'songs': 20, 'rows': 10_000, 'seed': 1},
+    'bench-100k': {'playlists': 20, 'songs': 50, 'rows': 100_000, 'seed': 1, 'engine': 'fast'},
+    'bench-1m': {'playlists': 20, 'songs': 50, 'rows': 1_000_000, 'seed': 1, 'engine': 'fast'},
+    'bench-10m': {'playlists': 20, 'songs': 50, 'rows': 10_000_000, 'seed': 1, 'engine': 'fast'},
+    'bench-wide': {'playlists': 2, 'songs': 5, 'rows': 1_000_000, 'seed': 2, 'engine': 'fast'},
+    'bench-deep': {'playlists': 200, 'songs': 1000, 'rows': 1_000_000, 'seed': 3, 'engine': 'fast'},
+    'bench-2gb': {'playlists': 20, 'songs': 50, 'target_size': '2GB', 'seed': 1, 'engine': 'fast'},
+    'bench-zipf': {'playlists': 50, 'songs': 200, 'rows': 1_000_000, 'seed': 4, 'engine': 'zipf', 'catalog': 200_000},
+}
+
+DEFAULTS = {'users': 10, 'playlists': 20, 'songs': 20, 'engine': 'faker'}
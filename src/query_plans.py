@@ -0,0 +1,135 @@
+"""
+Перевірка планів запитів репозиторіїв.
+
+Кожен метод репозиторію викликається на невеликій базі в пам'яті, а всі
+виконані ним SQL-запити записуються. Потім для кожного запиту виконується
+EXPLAIN QUERY PLAN (на тій самій або на заданій базі) і шукаються повні
+проходи таблиць (SCAN без індексу).
+"""
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from src.models import Base, User, Playlist, Song
+from src.dal import UserRepository, PlaylistRepository, SongRepository, SearchRepository, StatsRepository
+
+# Методи, які за означенням читають усю таблицю
+FULL_SCAN_METHODS = {'UserRepository.get_all_users', 'SongRepository.get_all_songs', 'StatsRepository.get_table_counts'}
+
+
+def _repository_calls(session):
+    """
+    Повертає список (назва методу, виклик) для всіх запитів репозиторіїв
+    на тестових даних. Змінюючі методи йдуть останніми.
+    """
+    user = User(username='plan_user')
+    playlist = Playlist(name='plan_playlist', user=user, user_id=user.id)
+    playlist.songs = [Song(title='plan_song', artist='plan_artist'), Song(title='plan_song_2', artist='plan_artist')]
+    session.add_all([user, playlist])
+    session.commit()
+    user_id, playlist_id = user.id, playlist.id
+    song_id, other_song_id = playlist.songs[0].id, playlist.songs[1].id
+
+    users = UserRepository(session)
+    playlists = PlaylistRepository(session)
+    songs = SongRepository(session)
+    search = SearchRepository(session)
+    stats = StatsRepository(session)
+
+    return [
+        ('UserRepository.get_all_users', lambda: users.get_all_users()),
+        ('UserRepository.get_user_by_id', lambda: users.get_user_by_id(user_id)),
+        ('UserRepository.get_user_with_playlists', lambda: users.get_user_with_playlists(user_id)),
+        ('UserRepository.get_users_page', lambda: users.get_users_page(limit=1)),
+        ('UserRepository.get_users_page', lambda: users.get_users_page(after=user_id, limit=1)),
+        ('PlaylistRepository.get_all_playlists_by_user_id', lambda: playlists.get_all_playlists_by_user_id(user_id)),
+        ('PlaylistRepository.get_playlist_by_id', lambda: playlists.get_playlist_by_id(playlist_id)),
+        ('PlaylistRepository.get_playlist_with_songs', lambda: playlists.get_playlist_with_songs(playlist_id)),
+        ('PlaylistRepository.get_playlist_with_user', lambda: playlists.get_playlist_with_user(playlist_id)),
+        ('PlaylistRepository.get_playlists_page_by_user_id', lambda: playlists.get_playlists_page_by_user_id(user_id, limit=1)),
+        ('PlaylistRepository.get_playlists_page_by_user_id', lambda: playlists.get_playlists_page_by_user_id(user_id, after=playlist_id, limit=1)),
+        ('SongRepository.get_all_songs', lambda: songs.get_all_songs()),
+        ('SongRepository.get_song_by_id', lambda: songs.get_song_by_id(song_id)),
+        ('SongRepository.get_song_with_playlists', lambda: songs.get_song_with_playlists(song_id)),
+        ('SongRepository.get_first_playlist_id', lambda: songs.get_first_playlist_id(song_id)),
+        ('SongRepository.get_all_songs_by_playlist_id', lambda: songs.get_all_songs_by_playlist_id(playlist_id)),
+        ('SongRepository.get_songs_page_by_playlist_id', lambda: songs.get_songs_page_by_playlist_id(playlist_id, limit=1)),
+        ('SongRepository.get_songs_page_by_playlist_id', lambda: songs.get_songs_page_by_playlist_id(playlist_id, after=song_id, limit=1)),
+        ('SearchRepository.search', lambda: search.search('songs', 'plan', limit=1)),
+        ('SearchRepository.search', lambda: search.search('songs', 'plan', after='1', limit=1)),
+        ('SearchRepository.search', lambda: search.search('users', 'plan', limit=1)),
+        ('StatsRepository.get_table_counts', lambda: stats.get_table_counts()),
+        ('StatsRepository.get_top_artists', lambda: stats.get_top_artists(1)),
+        ('UserRepository.update_user', lambda: users.update_user(user_id, 'plan_user_2')),
+        ('PlaylistRepository.update_playlist', lambda: playlists.update_playlist(playlist_id, 'plan_playlist_2')),
+        ('SongRepository.update_song', lambda: songs.update_song(song_id, 'plan_song_3', 'plan_artist_2')),
+        ('SongRepository.delete_song', lambda: songs.delete_song(other_song_id)),
+        ('PlaylistRepository.delete_playlist', lambda: playlists.delete_playlist(playlist_id)),
+        ('UserRepository.delete_user', lambda: users.delete_user(user_id)),
+    ]
+
+
+def capture_repository_queries():
+    """
+    Виконує всі запити репозиторіїв на базі в пам'яті.
+    Повертає список (назва методу, SQL, параметри).
+    """
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+
+    captured = []
+    current = [None]
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if current[0] is not None:
+            captured.append((current[0], statement, parameters[0] if executemany else parameters))
+
+    try:
+        calls = _repository_calls(session)
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        for name, call in calls:
+            # Кожен виклик читає з бази, а не з кешу сесії
+            session.expire_all()
+            current[0] = name
+            call()
+            current[0] = None
+    finally:
+        session.close()
+        engine.dispose()
+
+    return captured
+
+
+def full_scans(plan):
+    """
+    Рядки плану, що проходять таблицю повністю без індексу.
+    Віртуальна таблиця FTS5 з MATCH читає власний індекс (VIRTUAL TABLE INDEX),
+    а прохід по вже обмеженому підзапиту (MATERIALIZE, CO-ROUTINE) таблицю не читає.
+    """
+    subqueries = {detail.split()[-1] for _, _, _, detail in plan if detail.startswith(('MATERIALIZE ', 'CO-ROUTINE '))}
+    return [detail for _, _, _, detail in plan
+            if detail.startswith('SCAN ') and ' USING ' not in detail and ' VIRTUAL TABLE INDEX ' not in detail
+            and detail != 'SCAN CONSTANT ROW' and detail.split()[1] not in subqueries]
+
+
+def check_query_plans(db_url: str = None):
+    """
+    Повертає список (назва методу, SQL, план, повні проходи) для кожного
+    запиту репозиторіїв. Плани будуються на базі db_url (за замовчуванням —
+    порожня схема з моделей), тож з реальною базою враховується її статистика.
+    """
+    queries = capture_repository_queries()
+
+    engine = create_engine(db_url or 'sqlite://')
+    if db_url is None:
+        Base.metadata.create_all(engine)
+
+    results = []
+    try:
+        with engine.connect() as connection:
+            for name, statement, parameters in queries:
+                plan = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).fetchall()
+                scans = [] if name in FULL_SCAN_METHODS else full_scans(plan)
+                results.append((name, statement, plan, scans))
+    finally:
+        engine.dispose()
+    return results
@@ -0,0 +1,103 @@
+"""
+Зовнішні ключі SQLite.
+
+Видалення користувача, плейлиста чи пісні — одна інструкція DELETE:
+залежні рядки прибирає сама база через ON DELETE CASCADE. SQLite перевіряє
+зовнішні ключі лише з PRAGMA foreign_keys=ON, тому прагма вмикається на кожному
+новому з'єднанні будь-якого рушія SQLite.
+
+Бази, створені до появи каскадів, оновлює upgrade_schema: SQLite не вміє
+змінювати обмеження таблиці, тож таблиця перебудовується зі збереженням rowid
+(на них посилаються індекси пошуку).
+"""
+import sqlite3
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.schema import CreateTable
+from src.models import Playlist, playlist_song
+
+# Таблиці з каскадними зовнішніми ключами
+CASCADE_TABLES = (Playlist.__table__, playlist_song)
+
+
+def _is_sqlite(dbapi_connection):
+    # pysqlite або адаптер aiosqlite з SQLAlchemy
+    return isinstance(dbapi_connection, sqlite3.Connection) or type(dbapi_connection).__name__.startswith('AsyncAdapt_aiosqlite')
+
+
+@event.listens_for(Engine, 'connect')
+def _enable_foreign_keys(dbapi_connection, connection_record):
+    if _is_sqlite(dbapi_connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA foreign_keys=ON')
+        cursor.close()
+
+
+def _columns(cursor, table: str):
+    return [row[1] for row in cursor.execute(f'PRAGMA table_info({table})').fetchall()]
+
+
+def _outdated(cursor, table):
+    """
+    Таблиця існує, але хоч один її зовнішній ключ не каскадний.
+    """
+    foreign_keys = cursor.execute(f'PRAGMA foreign_key_list({table.name})').fetchall()
+    return bool(foreign_keys) and any(row[6].upper() != 'CASCADE' for row in foreign_keys)
+
+
+def outdated_tables(engine: Engine):
+    """
+    Назви таблиць, яким upgrade_schema ще має додати ON DELETE CASCADE.
+    """
+    if engine.dialect.name != 'sqlite':
+        return []
+
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        return [table.name for table in CASCADE_TABLES if _outdated(cursor, table)]
+    finally:
+        connection.close()
+
+
+def upgrade_schema(engine: Engine):
+    """
+    Перебудовує таблиці без ON DELETE CASCADE. Викликається до create_all:
+    індекси і тригери перебудованих таблиць відтворює create_all.
+    Повертає назви перебудованих таблиць.
+    """
+    if engine.dialect.name != 'sqlite':
+        return []
+
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        outdated = [table for table in CASCADE_TABLES if _outdated(cursor, table)]
+        if not outdated:
+            return []
+
+        # Вимикається лише поза транзакцією; інакше DROP TABLE запустив би каскади
+        cursor.execute('PRAGMA foreign_keys=OFF')
+        cursor.execute('BEGIN')
+        try:
+            for table in outdated:
+                staging = f'_{table.name}_upgrade'
+                create = str(CreateTable(table).compile(dialect=engine.dialect)).strip()
+                cursor.execute(create.replace(f'CREATE TABLE {table.name} ', f'CREATE TABLE {staging} ', 1))
+                columns = ', '.join(column for column in _columns(cursor, table.name) if column in table.c)
+                cursor.execute(f'INSERT INTO {staging} (rowid, {columns}) SELECT rowid, {columns} FROM {table.name}')
+                cursor.execute(f'DROP TABLE {table.name}')
+                cursor.execute(f'ALTER TABLE {staging} RENAME TO {table.name}')
+
+            violations = cursor.execute('PRAGMA foreign_key_check').fetchall()
+            if violations:
+                raise ValueError(f'Foreign key violations after schema upgrade: {violations[:10]}')
+            cursor.execute('COMMIT')
+        except BaseException:
+            cursor.execute('ROLLBACK')
+            raise
+        finally:
+            cursor.execute('PRAGMA foreign_keys=ON')
+        return [table.name for table in outdated]
+    finally:
+        connection.close()
@@ -0,0 +1,139 @@
+"""
+Повнотекстовий пошук на SQLite FTS5.
+
+Для users, playlists і songs створюються таблиці FTS5 із зовнішнім вмістом
+(content='<таблиця>'): вони зберігають лише інвертований індекс, а текст
+читається з основної таблиці за rowid. Індекс синхронізують тригери на
+вставку, зміну і видалення. Масовий імпорт у порожню базу
+(src.database.import_profile) прибирає тригери і перебудовує індекси одним
+проходом у кінці; дельта в заповнену базу йде через тригери.
+
+Таблиці й тригери створюються разом зі схемою (Base.metadata.create_all)
+і видаляються разом з нею. Первинні ключі таблиць рядкові, тож VACUUM може
+перенумерувати rowid; після нього потрібен rebuild_search_indexes.
+"""
+import re
+from typing import NamedTuple
+from src.models import Base
+from sqlalchemy import event
+
+
+class SearchIndex(NamedTuple):
+    table: str
+    content: str
+    columns: tuple
+
+
+# Розділи пошуку: назва -> індекс FTS5 над таблицею-джерелом
+SEARCH_INDEXES = {
+    'songs': SearchIndex('songs_fts', 'songs', ('title', 'artist')),
+    'playlists': SearchIndex('playlists_fts', 'playlists', ('name',)),
+    'users': SearchIndex('users_fts', 'users', ('username',)),
+}
+
+# Без урахування регістру й діакритики; префікси з 2-3 літер мають власний індекс
+FTS_OPTIONS = "tokenize='unicode61 remove_diacritics 2', prefix='2 3'"
+
+# Токени так, як їх розбиває unicode61: літери й цифри
+TOKEN = re.compile(r'[^\W_]+')
+
+# Скільки найкращих результатів можна прогорнути сторінками (див. SearchRepository)
+MAX_SEARCH_RESULTS = 1000
+
+
+def match_query(query: str):
+    """
+    Перетворює введений текст на вираз MATCH: кожне слово — префікс,
+    усі слова обов'язкові. Синтаксис FTS5 із запиту не передається.
+    Однолітерне слово шукається цілим: для префіксів з однієї літери немає
+    індексу, і FTS5 довелося б об'єднати списки майже всіх слів.
+    Повертає None, якщо слів немає.
+    """
+    tokens = TOKEN.findall(query or '')
+    if not tokens:
+        return None
+    return ' '.join(f'"{token}"*' if len(token) > 1 else f'"{token}"' for token in tokens)
+
+
+def _trigger_names(index: SearchIndex):
+    return (f'{index.table}_ai', f'{index.table}_ad', f'{index.table}_au')
+
+
+def search_trigger_names():
+    return [name for index in SEARCH_INDEXES.values() for name in _trigger_names(index)]
+
+
+def _triggers_sql(index: SearchIndex):
+    columns = ', '.join(index.columns)
+    new_values = ', '.join(f'new.{column}' for column in index.columns)
+    old_values = ', '.join(f'old.{column}' for column in index.columns)
+    insert_new = f"INSERT INTO {index.table}(rowid, {columns}) VALUES (new.rowid, {new_values});"
+    delete_old = f"INSERT INTO {index.table}({index.table}, rowid, {columns}) VALUES ('delete', old.rowid, {old_values});"
+    insert_trigger, delete_trigger, update_trigger = _trigger_names(index)
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {insert_trigger} AFTER INSERT ON {index.content} BEGIN {insert_new} END",
+        f"CREATE TRIGGER IF NOT EXISTS {delete_trigger} AFTER DELETE ON {index.content} BEGIN {delete_old} END",
+        f"CREATE TRIGGER IF NOT EXISTS {update_trigger} AFTER UPDATE OF {columns} ON {index.content} BEGIN {delete_old} {insert_new} END",
+    ]
+
+
+def _existing(connection, kind: str, names):
+    placeholders = ', '.join('?' for _ in names)
+    rows = connection.exec_driver_sql(
+        f"SELECT name FROM sqlite_master WHERE type = ? AND name IN ({placeholders})", (kind, *names)).fetchall()
+    return {name for name, in rows}
+
+
+def create_search_indexes(connection):
+    """
+    Створює відсутні таблиці FTS5 і тригери. Якщо чогось бракувало (стара база
+    або перерваний імпорт), індекс перебудовується з основної таблиці.
+    """
+    for index in SEARCH_INDEXES.values():
+        complete = (_existing(connection, 'table', [index.table])
+                    and len(_existing(connection, 'trigger', _trigger_names(index))) == len(_trigger_names(index)))
+        connection.exec_driver_sql(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {index.table} "
+            f"USING fts5({', '.join(index.columns)}, content='{index.content}', content_rowid='rowid', {FTS_OPTIONS})")
+        for statement in _triggers_sql(index):
+            connection.exec_driver_sql(statement)
+        if not complete:
+            connection.exec_driver_sql(f"INSERT INTO {index.table}({index.table}) VALUES ('rebuild')")
+
+
+def drop_search_triggers(connection):
+    """
+    Вимикає синхронізацію індексів; після масових змін потрібен create_search_indexes
+    або rebuild_search_indexes разом із поверненням тригерів.
+    """
+    for index in SEARCH_INDEXES.values():
+        for name in _trigger_names(index):
+            connection.exec_driver_sql(f"DROP TRIGGER IF EXISTS {name}")
+
+
+def rebuild_search_indexes(connection):
+    """
+    Перебудовує всі індекси з основних таблиць і повертає тригери.
+    """
+    for index in SEARCH_INDEXES.values():
+        connection.exec_driver_sql(f"INSERT INTO {index.table}({index.table}) VALUES ('rebuild')")
+        for statement in _triggers_sql(index):
+            connection.exec_driver_sql(statement)
+
+
+def drop_search_indexes(connection):
+    drop_search_triggers(connection)
+    for index in SEARCH_INDEXES.values():
+        connection.exec_driver_sql(f"DROP TABLE IF EXISTS {index.table}")
+
+
+@event.listens_for(Base.metadata, 'after_create')
+def _create_search_indexes(target, connection, **kw):
+    if connection.dialect.name == 'sqlite':
+        create_search_indexes(connection)
+
+
+@event.listens_for(Base.metadata, 'before_drop')
+def _drop_search_indexes(target, connection, **kw):
+    if connection.dialect.name == 'sqlite':
+        drop_search_indexes(connection)
@@ -0,0 +1,254 @@
+"""
+Компактний бінарний знімок бази.
+
+Файл складається із заголовка і секцій, вирівняних по 8 байтів:
+- ідентифікатори зберігаються як 16 сирих байтів UUID;
+- рядки колонки лежать одним блоком UTF-8 плюс масив зміщень uint64 (n + 1);
+- власник плейлиста і зв'язки playlist_song — це індекси uint32 у таблицях.
+Усі числа little-endian.
+"""
+import mmap
+import struct
+import sys
+import uuid
+from array import array
+from sqlalchemy import select, literal_column
+from sqlalchemy.engine import Connection
+from src.models import User, Playlist, Song, playlist_song
+
+
+MAGIC = b'SPOTSNAP'
+VERSION = 1
+
+SECTIONS = (
+    'user_ids', 'usernames', 'usernames_offsets',
+    'playlist_ids', 'playlist_users', 'playlist_names', 'playlist_names_offsets',
+    'song_ids', 'song_titles', 'song_titles_offsets', 'song_artists', 'song_artists_offsets',
+    'links',
+)
+
+# magic, version, кількість users/playlists/songs/links, позиції секцій
+HEADER = struct.Struct(f'<8sI4x4Q{len(SECTIONS)}Q')
+
+CHUNK_ROWS = 65536
+
+# Індекс для плейлиста без власника (user_id IS NULL)
+NO_INDEX = 0xFFFFFFFF
+
+
+def _little_endian(values: array):
+    if sys.byteorder == 'big':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values
+
+
+def _align(file):
+    padding = -file.tell() % 8
+    if padding:
+        file.write(b'\0' * padding)
+
+
+def _uuid_bytes(value: str):
+    try:
+        return uuid.UUID(value).bytes
+    except ValueError:
+        raise ValueError(f'Snapshot ids must be UUIDs, got {value!r}') from None
+
+
+def _column(connection: Connection, *columns):
+    # Порядок rowid однаковий для всіх проходів по таблиці
+    statement = select(*columns).order_by(literal_column('rowid'))
+    return connection.execution_options(stream_results=True).execute(statement)
+
+
+class _SnapshotWriter:
+    def __init__(self, file):
+        self.file = file
+        self.positions = {}
+
+    def _start(self, section):
+        _align(self.file)
+        self.positions[section] = self.file.tell()
+
+    def write_ids(self, section, values):
+        self._start(section)
+        index = {}
+        for value, in values:
+            index[value] = len(index)
+            self.file.write(_uuid_bytes(value))
+        return index
+
+    def write_indexes(self, section, values, *lookups):
+        self._start(section)
+        chunk = array('I')
+        for row in values:
+            chunk.extend(NO_INDEX if value is None else lookup[value] for lookup, value in zip(lookups, row))
+            if len(chunk) >= CHUNK_ROWS:
+                self.file.write(_little_endian(chunk).tobytes())
+                del chunk[:]
+        self.file.write(_little_endian(chunk).tobytes())
+
+    def write_strings(self, section, values):
+        self._start(section)
+        offsets = array('Q', [0])
+        end = 0
+        for value, in values:
+            encoded = value.encode('utf-8')
+            self.file.write(encoded)
+            end += len(encoded)
+            offsets.append(end)
+
+        self._start(section + '_offsets')
+        self.file.write(_little_endian(offsets).tobytes())
+
+
+def write_snapshot(connection: Connection, path: str):
+    """
+    Записує users, playlists, songs і playlist_song у файл знімка.
+    Повертає кількості (users, playlists, songs, links).
+    """
+    users, playlists, songs = User.__table__, Playlist.__table__, Song.__table__
+
+    with open(path, 'wb') as file:
+        file.write(b'\0' * HEADER.size)
+        writer = _SnapshotWriter(file)
+
+        user_index = writer.write_ids('user_ids', _column(connection, users.c.id))
+        writer.write_strings('usernames', _column(connection, users.c.username))
+
+        playlist_index = writer.write_ids('playlist_ids', _column(connection, playlists.c.id))
+        writer.write_indexes('playlist_users', _column(connection, playlists.c.user_id), user_index)
+        writer.write_strings('playlist_names', _column(connection, playlists.c.name))
+
+        song_index = writer.write_ids('song_ids', _column(connection, songs.c.id))
+        writer.write_strings('song_titles', _column(connection, songs.c.title))
+        writer.write_strings('song_artists', _column(connection, songs.c.artist))
+
+        links = _column(connection, playlist_song.c.playlist_id, playlist_song.c.song_id)
+        writer.write_indexes('links', links, playlist_index, song_index)
+        links_count = (file.tell() - writer.positions['links']) // 8
+
+        counts = (len(user_index), len(playlist_index), len(song_index), links_count)
+        file.seek(0)
+        file.write(HEADER.pack(MAGIC, VERSION, *counts, *(writer.positions[name] for name in SECTIONS)))
+
+    return counts
+
+
+class Snapshot:
+    """
+    Знімок, відкритий через mmap: таблиці читаються прямо з відображеної пам'яті
+    без розбору тексту. Використовується як контекстний менеджер.
+    """
+    def __init__(self, path: str):
+        self.file = open(path, 'rb')
+        self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.mm)
+        self.views = {}  # id -> подання секції, яке ще читають генератори (memoryview чисел не хешується)
+
+        if len(self.mm) < HEADER.size:
+            self.close()
+            raise ValueError(f'{path} is not a Spotify snapshot')
+        magic, version, *fields = HEADER.unpack_from(self.mm)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f'{path} is not a Spotify snapshot (version {VERSION})')
+
+        self.users_count, self.playlists_count, self.songs_count, self.links_count = fields[:4]
+        self.positions = dict(zip(SECTIONS, fields[4:]))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            self.close()
+        except BufferError:
+            # Помилка закриття не підміняє виняток, що вже виходить з блоку with
+            if exc_type is None:
+                raise
+
+    def close(self):
+        """
+        Звільняє подання секцій (зокрема ті, що тримають недочитані генератори),
+        потім mmap і файл. Генератори після цього читати вже не можна.
+        """
+        for view in list(self.views.values()):
+            self._release(view)
+        if self.view is not None:
+            self.view.release()
+            self.view = None
+        try:
+            self.mm.close()
+        finally:
+            self.file.close()
+
+    def _release(self, numbers):
+        if isinstance(numbers, memoryview):
+            numbers.release()
+            self.views.pop(id(numbers), None)
+
+    def _numbers(self, section, typecode, count):
+        """
+        Числа секції без копіювання — подання mmap, яке звільняє _release.
+        """
+        start = self.positions[section]
+        view = self.view[start:start + count * array(typecode).itemsize]
+        try:
+            if sys.byteorder == 'big':
+                return _little_endian(array(typecode, view.tobytes()))
+            numbers = view.cast(typecode)
+            self.views[id(numbers)] = numbers
+            return numbers
+        finally:
+            view.release()
+
+    def _ids(self, section, count):
+        start = self.positions[section]
+        view = self.view
+        return (str(uuid.UUID(bytes=bytes(view[position:position + 16])))
+                for position in range(start, start + count * 16, 16))
+
+    def _strings(self, section, count):
+        start = self.positions[section]
+        offsets = self._numbers(section + '_offsets', 'Q', count + 1)
+        view = self.view
+        try:
+            for i in range(count):
+                yield str(view[start + offsets[i]:start + offsets[i + 1]], 'utf-8')
+        finally:
+            self._release(offsets)
+
+    def users(self):
+        for user_id, username in zip(self._ids('user_ids', self.users_count), self._strings('usernames', self.users_count)):
+            yield {'id': user_id, 'username': username}
+
+    def playlists(self):
+        user_ids = list(self._ids('user_ids', self.users_count))
+        owners = self._numbers('playlist_users', 'I', self.playlists_count)
+        ids = self._ids('playlist_ids', self.playlists_count)
+        names = self._strings('playlist_names', self.playlists_count)
+        try:
+            for playlist_id, owner, name in zip(ids, owners, names):
+                yield {'id': playlist_id, 'name': name, 'user_id': None if owner == NO_INDEX else user_ids[owner]}
+        finally:
+            names.close()
+            self._release(owners)
+
+    def songs(self):
+        ids = self._ids('song_ids', self.songs_count)
+        titles = self._strings('song_titles', self.songs_count)
+        artists = self._strings('song_artists', self.songs_count)
+        for song_id, title, artist in zip(ids, titles, artists):
+            yield {'id': song_id, 'title': title, 'artist': artist}
+
+    def links(self):
+        playlist_ids = list(self._ids('playlist_ids', self.playlists_count))
+        song_ids = list(self._ids('song_ids', self.songs_count))
+        pairs = self._numbers('links', 'I', self.links_count * 2)
+        try:
+            for i in range(0, self.links_count * 2, 2):
+                yield {'playlist_id': playlist_ids[pairs[i]], 'song_id': song_ids[pairs[i + 1]]}
+        finally:
+            self._release(pairs)
@@ -0,0 +1,135 @@
+"""
+Лічильники, що підтримуються інкрементально.
+
+users.playlist_count, playlists.song_count, artist_stats і table_counts
+оновлюються тригерами SQLite на кожну вставку, зміну і видалення, тож будь-який
+шлях запису (ORM, пакетні вставки, каскади) тримає їх узгодженими, а читання
+не потребує GROUP BY чи COUNT(*). Масовий імпорт у порожню базу
+(src.database.import_profile) прибирає тригери і перераховує лічильники одним
+проходом у кінці; дельта в заповнену базу йде через тригери.
+
+Тригери змінюють рядки поза сесією ORM: об'єкти, вже завантажені в сесію,
+бачать нові значення лише після expire або в новій сесії.
+"""
+from src.models import Base
+from sqlalchemy import event
+
+# Таблиці, рядки яких рахуються в table_counts
+COUNTED_TABLES = ('users', 'playlists', 'songs', 'playlist_song')
+
+# Колонки лічильників, яких може не бути в базі, створеній до їх появи
+COUNT_COLUMNS = (('users', 'playlist_count'), ('playlists', 'song_count'))
+
+
+def _count(table: str, delta: str):
+    return f"UPDATE table_counts SET count = count {delta} 1 WHERE name = '{table}';"
+
+
+def _add_artist(artist: str, songs: str, links: str):
+    return (f"INSERT INTO artist_stats (artist, song_count, link_count) VALUES ({artist}, {songs}, {links}) "
+            f"ON CONFLICT (artist) DO UPDATE SET song_count = song_count + excluded.song_count, link_count = link_count + excluded.link_count;")
+
+
+def _remove_artist(artist: str, songs: str, links: str):
+    return (f"UPDATE artist_stats SET song_count = song_count - {songs}, link_count = link_count - {links} WHERE artist = {artist}; "
+            f"DELETE FROM artist_stats WHERE artist = {artist} AND song_count <= 0;")
+
+
+def _song_links(song_id: str):
+    return f"(SELECT count(*) FROM playlist_song WHERE song_id = {song_id})"
+
+
+def _link_artist(song_id: str):
+    # Порожньо, якщо пісню вже видалено (каскад ON DELETE): її зв'язки віднімає stats_songs_bd
+    return f"(SELECT artist FROM songs WHERE id = {song_id})"
+
+
+STATS_TRIGGERS = {
+    'stats_users_ai': f"AFTER INSERT ON users BEGIN {_count('users', '+')} END",
+    'stats_users_ad': f"AFTER DELETE ON users BEGIN {_count('users', '-')} END",
+
+    'stats_playlists_ai': f"AFTER INSERT ON playlists BEGIN {_count('playlists', '+')} "
+                          f"UPDATE users SET playlist_count = playlist_count + 1 WHERE id = new.user_id; END",
+    'stats_playlists_ad': f"AFTER DELETE ON playlists BEGIN {_count('playlists', '-')} "
+                          f"UPDATE users SET playlist_count = playlist_count - 1 WHERE id = old.user_id; END",
+    'stats_playlists_au': "AFTER UPDATE OF user_id ON playlists WHEN old.user_id IS NOT new.user_id BEGIN "
+                          "UPDATE users SET playlist_count = playlist_count - 1 WHERE id = old.user_id; "
+                          "UPDATE users SET playlist_count = playlist_count + 1 WHERE id = new.user_id; END",
+
+    'stats_songs_ai': f"AFTER INSERT ON songs BEGIN {_count('songs', '+')} {_add_artist('new.artist', '1', '0')} END",
+    'stats_songs_bd': f"BEFORE DELETE ON songs BEGIN {_remove_artist('old.artist', '0', _song_links('old.id'))} END",
+    'stats_songs_ad': f"AFTER DELETE ON songs BEGIN {_count('songs', '-')} {_remove_artist('old.artist', '1', '0')} END",
+    'stats_songs_au': f"AFTER UPDATE OF artist ON songs WHEN old.artist IS NOT new.artist BEGIN "
+                      f"{_remove_artist('old.artist', '1', _song_links('new.id'))} "
+                      f"{_add_artist('new.artist', '1', _song_links('new.id'))} END",
+
+    'stats_links_ai': f"AFTER INSERT ON playlist_song BEGIN {_count('playlist_song', '+')} "
+                      f"UPDATE playlists SET song_count = song_count + 1 WHERE id = new.playlist_id; "
+                      f"UPDATE artist_stats SET link_count = link_count + 1 WHERE artist = {_link_artist('new.song_id')}; END",
+    'stats_links_ad': f"AFTER DELETE ON playlist_song BEGIN {_count('playlist_song', '-')} "
+                      f"UPDATE playlists SET song_count = song_count - 1 WHERE id = old.playlist_id; "
+                      f"UPDATE artist_stats SET link_count = link_count - 1 WHERE artist = {_link_artist('old.song_id')}; END",
+}
+
+# Повний перерахунок; кожен підзапит читає індекс, а не всю дочірню таблицю
+REBUILD_STATEMENTS = (
+    "DELETE FROM table_counts",
+    "INSERT INTO table_counts (name, count) VALUES "
+    + ", ".join(f"('{table}', (SELECT count(*) FROM {table}))" for table in COUNTED_TABLES),
+    "UPDATE users SET playlist_count = (SELECT count(*) FROM playlists WHERE playlists.user_id = users.id)",
+    "UPDATE playlists SET song_count = (SELECT count(*) FROM playlist_song WHERE playlist_song.playlist_id = playlists.id)",
+    "DELETE FROM artist_stats",
+    "INSERT INTO artist_stats (artist, song_count, link_count) "
+    f"SELECT artist, count(*), sum(links) FROM (SELECT artist, {_song_links('songs.id')} AS links FROM songs) GROUP BY artist",
+)
+
+
+def _existing(connection, kind: str):
+    return {name for name, in connection.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = ?", (kind,))}
+
+
+def create_stats_triggers(connection):
+    """
+    Додає відсутні колонки лічильників і тригери. Якщо чогось бракувало (стара
+    база або перерваний імпорт), спершу створюються відсутні вторинні індекси,
+    а потім лічильники перераховуються повністю.
+    """
+    complete = set(STATS_TRIGGERS) <= _existing(connection, 'trigger')
+    for table, column in COUNT_COLUMNS:
+        columns = {row[1] for row in connection.exec_driver_sql(f"PRAGMA table_info({table})")}
+        if column not in columns:
+            connection.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {column} INTEGER NOT NULL DEFAULT 0")
+            complete = False
+
+    if complete:
+        return
+    # Перерахунок читає дочірні таблиці через вторинні індекси; перерваний масовий
+    # імпорт лишає базу без них, і кожен корельований підзапит проходив би таблицю повністю
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+    rebuild_stats(connection)
+
+
+def drop_stats_triggers(connection):
+    """
+    Вимикає інкрементальне оновлення; після масових змін потрібен rebuild_stats.
+    """
+    for name in STATS_TRIGGERS:
+        connection.exec_driver_sql(f"DROP TRIGGER IF EXISTS {name}")
+
+
+def rebuild_stats(connection):
+    """
+    Перераховує всі лічильники з даних і повертає тригери.
+    """
+    for statement in REBUILD_STATEMENTS:
+        connection.exec_driver_sql(statement)
+    for name, body in STATS_TRIGGERS.items():
+        connection.exec_driver_sql(f"CREATE TRIGGER IF NOT EXISTS {name} {body}")
+
+
+@event.listens_for(Base.metadata, 'after_create')
+def _create_stats_triggers(target, connection, **kw):
+    if connection.dialect.name == 'sqlite':
+        create_stats_triggers(connection)
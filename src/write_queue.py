@@ -0,0 +1,135 @@
+"""
+Черга записів з груповим комітом.
+
+SQLite має лише одного записувача, тож замість того, щоб кожен запит
+комітив сам і чекав на блокування, потоки запитів ставлять зміни в чергу.
+Окремий потік-записувач збирає зміни, що надійшли за кілька мілісекунд,
+виконує кожну у власному SAVEPOINT і комітить усю пачку однією транзакцією.
+Кількість комітів (і синхронізацій диска) росте з кількістю пачок,
+а не з кількістю запитів.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from sqlalchemy import inspect
+from sqlalchemy.orm import sessionmaker, InstanceState
+from src.dal import UserRepository, PlaylistRepository, SongRepository, transaction
+from src.bll import SpotifyService
+from src.cache import ICache
+
+MAX_BATCH = 100
+MAX_DELAY = 0.005  # секунд очікування на наступні зміни пачки
+
+_STOP = object()
+
+
+def plain_result(result):
+    """
+    Первинний ключ замість об'єкта ORM, щоб він не потрапив в інший потік.
+    """
+    if isinstance(result, (list, tuple)):
+        return type(result)(plain_result(item) for item in result)
+    state = inspect(result, raiseerr=False)
+    if isinstance(state, InstanceState):
+        identity = state.identity
+        return identity[0] if identity and len(identity) == 1 else identity
+    return result
+
+
+class WriteQueue:
+    """
+    Виконує зміни через SpotifyService в одному потоці-записувачі.
+    submit(job) повертає Future з результатом job(service) або з його винятком.
+    Помилка однієї зміни відкочує лише її SAVEPOINT, решта пачки комітиться.
+    Результат читається в іншому потоці, тому об'єкти ORM сесії записувача
+    (і списки чи кортежі з ними) замінюються їхніми первинними ключами ще
+    в потоці-записувачі; решта значень передається як є.
+    Кеш, переданий черзі, інвалідується після коміту пачки, ще до того,
+    як запит отримає результат.
+    """
+    def __init__(self, session_factory: sessionmaker, max_batch: int = MAX_BATCH, max_delay: float = MAX_DELAY, cache: ICache = None):
+        self.session_factory = session_factory
+        self.cache = cache
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.jobs = queue.Queue()
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name='write-queue', daemon=True)
+                self.thread.start()
+
+    def submit(self, job) -> Future:
+        self.start()
+        future = Future()
+        self.jobs.put((job, future))
+        return future
+
+    def execute(self, job):
+        return self.submit(job).result()
+
+    def close(self):
+        with self.lock:
+            thread, self.thread = self.thread, None
+        if thread is not None:
+            self.jobs.put(_STOP)
+            thread.join()
+
+    def _next_batch(self):
+        first = self.jobs.get()
+        if first is _STOP:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self.jobs.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                self.jobs.put(_STOP)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        session = self.session_factory()
+        service = SpotifyService(UserRepository(session), PlaylistRepository(session), SongRepository(session), cache=self.cache)
+        try:
+            while (batch := self._next_batch()) is not None:
+                self._commit_batch(session, service, batch)
+        finally:
+            session.close()
+
+    def _commit_batch(self, session, service, batch):
+        outcomes = []
+        try:
+            with transaction(session):
+                for job, future in batch:
+                    if not future.set_running_or_notify_cancel():
+                        continue
+                    try:
+                        with session.begin_nested():
+                            result = job(service)
+                        # Після SAVEPOINT об'єкт уже має ключ і ще не прострочений комітом
+                        outcomes.append((future, plain_result(result), None))
+                    except Exception as error:
+                        outcomes.append((future, None, error))
+        except Exception as error:
+            # Коміт пачки не вдався: жодна зміна з неї не збережена
+            for future, _, _ in outcomes:
+                future.set_exception(error)
+            return
+
+        for future, result, error in outcomes:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
@@ -0,0 +1,93 @@
+"""
+Рушій з реалістичним розподілом популярності: пісні беруться зі спільного
+каталогу за законом Ципфа (пісня рангу r трапляється з імовірністю ~ 1 / r^song_skew),
+тож кілька хітів є у великій частці плейлистів і таблиця playlist_song
+працює як справжній зв'язок багато-до-багатьох. Кількість плейлистів
+у користувача і пісень у плейлисті теж мають степеневий розподіл
+(~ 1 / k^count_skew на 1..max): більшість маленьких, але є дуже великі.
+"""
+import numpy as np
+from src.fast_generator import Vocabulary, uuid4_strings, BLOCK_USERS
+
+# Окремий потік випадкових чисел для каталогу, щоб id пісень не збігалися
+# з id користувачів і плейлистів, згенерованих з того самого seed
+CATALOG_STREAM = 1
+
+
+def power_law_cdf(size, skew):
+    """
+    Кумулятивний розподіл P(k) ~ 1 / k^skew для k = 1..size.
+    """
+    weights = np.arange(1, size + 1, dtype=np.float64) ** -skew
+    cdf = np.cumsum(weights)
+    return cdf / cdf[-1]
+
+
+def draw(rng, cdf, count):
+    """
+    Повертає count значень 0..len(cdf)-1 з розподілу cdf (обернене перетворення).
+    """
+    return np.minimum(np.searchsorted(cdf, rng.random(count), side='right'), len(cdf) - 1)
+
+
+class Catalog:
+    """
+    Спільний каталог пісень. Однаковий catalog_seed дає однаковий каталог,
+    тож шматки, згенеровані паралельно, посилаються на ті самі пісні.
+    """
+    def __init__(self, size, vocabulary, catalog_seed=None):
+        rng = np.random.default_rng(None if catalog_seed is None else (catalog_seed, CATALOG_STREAM))
+        self.ids = uuid4_strings(rng, size)
+        self.titles = vocabulary.song_titles[rng.integers(0, len(vocabulary.song_titles), size=size)]
+        self.artists = vocabulary.artists[rng.integers(0, len(vocabulary.artists), size=size)]
+
+
+def generate_blocks(users=10, playlists=20, songs=20, seed=None, popularity=None, block_users=BLOCK_USERS):
+    """
+    Генерує блоки (users, playlists, rows) з тими ж колонками, що й інші рушії.
+    playlists і songs — максимальні кількості, popularity — src.generator.Popularity.
+    Повтори пісні в одному плейлисті відкидаються, тому плейлист може бути
+    трохи коротшим за витягнуту кількість.
+    """
+    rng = np.random.default_rng(seed)
+    vocabulary = Vocabulary(seed)
+
+    # Каталог будується зі своїм словником, якщо його seed відрізняється від seed шматка
+    catalog_seed = seed if popularity.catalog_seed is None else popularity.catalog_seed
+    catalog_vocabulary = vocabulary if catalog_seed == seed else Vocabulary(catalog_seed)
+    catalog = Catalog(popularity.catalog, catalog_vocabulary, catalog_seed)
+
+    playlist_cdf = power_law_cdf(playlists, popularity.count_skew)
+    song_count_cdf = power_law_cdf(songs, popularity.count_skew)
+    song_cdf = power_law_cdf(popularity.catalog, popularity.song_skew)
+
+    for first_user in range(0, users, block_users):
+        block_size = min(block_users, users - first_user)
+
+        playlist_counts = draw(rng, playlist_cdf, block_size) + 1
+        playlist_owner = np.repeat(np.arange(block_size), playlist_counts)
+        song_counts = draw(rng, song_count_cdf, len(playlist_owner)) + 1
+        row_playlist = np.repeat(np.arange(len(playlist_owner)), song_counts)
+        row_song = draw(rng, song_cdf, len(row_playlist))
+
+        # Лишаємо перше входження кожної пари (плейлист, пісня), зберігаючи порядок
+        _, first = np.unique(row_playlist * popularity.catalog + row_song, return_index=True)
+        first.sort()
+        row_playlist, row_song = row_playlist[first], row_song[first]
+        row_user = playlist_owner[row_playlist]
+
+        user_ids = uuid4_strings(rng, block_size)
+        usernames = vocabulary.usernames[rng.integers(0, len(vocabulary.usernames), size=block_size)]
+        playlist_ids = uuid4_strings(rng, len(playlist_owner))
+        playlist_names = vocabulary.playlist_names[rng.integers(0, len(vocabulary.playlist_names), size=len(playlist_owner))]
+
+        rows = zip(
+            user_ids[row_user].tolist(),
+            usernames[row_user].tolist(),
+            playlist_ids[row_playlist].tolist(),
+            playlist_names[row_playlist].tolist(),
+            catalog.ids[row_song].tolist(),
+            catalog.titles[row_song].tolist(),
+            catalog.artists[row_song].tolist(),
+        )
+        yield block_size, len(playlist_owner), list(rows)
@@ -0,0 +1,26 @@
+from contextlib import contextmanager
+from sqlalchemy import event
+
+# Керування транзакцією не вважається запитом
+TRANSACTION_STATEMENTS = ('BEGIN', 'COMMIT', 'ROLLBACK', 'SAVEPOINT', 'RELEASE')
+
+
+@contextmanager
+def assert_max_queries(engine, limit: int):
+    """
+    Перевіряє, що блок виконує не більше limit SQL-запитів на engine.
+    Повертає список виконаних запитів, щоб їх можна було показати в повідомленні.
+    """
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if not statement.lstrip().upper().startswith(TRANSACTION_STATEMENTS):
+            statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+    assert len(statements) <= limit, f"Expected at most {limit} queries, got {len(statements)}:\n" + "\n".join(statements)
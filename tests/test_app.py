@@ -0,0 +1,170 @@
+import os
+import tempfile
+import pytest
+
+# Застосунок під тестом працює з окремою тимчасовою базою: записи йдуть
+# через потік-записувач, тож база має бути спільною для всіх потоків
+os.environ.setdefault('SPOTIFY_DATABASE_URL', f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'app.db')}")
+
+from src import app as app_module
+from src.models import Base, User, Playlist, Song
+from tests.query_counter import assert_max_queries
+
+
+@pytest.fixture
+def client():
+    app_module.Session.remove()
+    app_module.cache.clear()
+    Base.metadata.drop_all(app_module.engine)
+    Base.metadata.create_all(app_module.engine)
+    app_module.app.config['TESTING'] = True
+    with app_module.app.test_client() as client:
+        yield client
+    app_module.Session.remove()
+
+
+@pytest.fixture
+def playlist():
+    session = app_module.Session()
+    user = User(username='listener')
+    playlist = Playlist(name='Mix', user=user, user_id=user.id)
+    playlist.songs = [Song(title=f'Song {i}', artist=f'Artist {i}') for i in range(20)]
+    session.add_all([user, playlist])
+    session.commit()
+    playlist_id, user_id, song_id = playlist.id, user.id, playlist.songs[0].id
+    # Запит має працювати з власною сесією, а не з тією, що створила дані
+    app_module.Session.remove()
+    return playlist_id, user_id, song_id
+
+
+def test_list_songs_loads_page_in_fixed_queries(client, playlist):
+    playlist_id, _, _ = playlist
+
+    with assert_max_queries(app_module.engine, 2):
+        response = client.get(f'/playlists/{playlist_id}/songs')
+
+    assert response.status_code == 200
+    body = response.get_data(as_text=True)
+    assert 'listener' in body
+    assert body.count('Редагувати') == 20
+
+
+def test_list_playlists_loads_page_in_fixed_queries(client, playlist):
+    _, user_id, _ = playlist
+
+    with assert_max_queries(app_module.engine, 2):
+        response = client.get(f'/users/{user_id}/playlists')
+
+    assert response.status_code == 200
+    assert 'Mix' in response.get_data(as_text=True)
+
+
+def test_cached_playlist_is_not_reloaded_and_rename_is_visible(client, playlist):
+    playlist_id, user_id, _ = playlist
+    client.get(f'/playlists/{playlist_id}/songs')
+
+    with assert_max_queries(app_module.engine, 1):
+        response = client.get(f'/playlists/{playlist_id}/songs')
+    assert response.status_code == 200
+
+    client.post(f'/users/edit/{user_id}', data={'username': 'renamed'})
+    assert 'renamed' in client.get(f'/playlists/{playlist_id}/songs').get_data(as_text=True)
+
+
+def test_edit_song_page_loads_in_fixed_queries(client, playlist):
+    playlist_id, _, song_id = playlist
+
+    with assert_max_queries(app_module.engine, 2):
+        response = client.get(f'/songs/edit/{song_id}')
+
+    assert response.status_code == 200
+    assert f'/playlists/{playlist_id}/songs' in response.get_data(as_text=True)
+
+
+def test_song_pages_do_not_load_song_playlists(client, playlist):
+    playlist_id, user_id, song_id = playlist
+    session = app_module.Session()
+    song = session.get(Song, song_id)
+    for i in range(5):
+        other = Playlist(name=f'Other {i}', user=session.get(User, user_id), user_id=user_id)
+        other.songs = [song]
+        session.add(other)
+    session.commit()
+    app_module.Session.remove()
+
+    with assert_max_queries(app_module.engine, 2) as statements:
+        response = client.get(f'/songs/edit/{song_id}')
+    assert response.status_code == 200
+    assert not [statement for statement in statements if 'FROM playlists' in statement]
+
+    # Пошук пісні, одного плейлиста і сам DELETE
+    with assert_max_queries(app_module.engine, 3):
+        response = client.post(f'/songs/delete/{song_id}')
+    assert response.status_code == 302
+    assert '/songs' in response.headers['Location']
+
+
+def test_assert_max_queries_fails_when_exceeded(client, playlist):
+    playlist_id, _, _ = playlist
+
+    with pytest.raises(AssertionError):
+        with assert_max_queries(app_module.engine, 1):
+            client.get(f'/playlists/{playlist_id}/songs')
+
+
+def test_list_songs_follows_cursor(client, playlist):
+    playlist_id, _, _ = playlist
+
+    first = client.get(f'/playlists/{playlist_id}/songs?limit=15').get_data(as_text=True)
+    assert first.count('Редагувати') == 15
+    assert 'Наступна сторінка' in first
+
+    cursor = first.split('after=')[1].split('&')[0]
+    with assert_max_queries(app_module.engine, 2):
+        second = client.get(f'/playlists/{playlist_id}/songs?after={cursor}&limit=15').get_data(as_text=True)
+    assert second.count('Редагувати') == 5
+    assert 'Наступна сторінка' not in second
+
+
+def test_add_song_goes_through_write_queue(client, playlist):
+    playlist_id, _, _ = playlist
+
+    response = client.post(f'/playlists/{playlist_id}/songs/add', data={'title': 'Queued', 'artist': 'Writer'})
+
+    assert response.status_code == 302
+    assert 'Queued' in client.get(f'/playlists/{playlist_id}/songs').get_data(as_text=True)
+
+
+def test_search_finds_songs_and_pages_by_kind(client, playlist):
+    response = client.get('/search?q=song 1')
+    assert response.status_code == 200
+    body = response.get_data(as_text=True)
+    assert 'Song 1 | Artist 1' in body
+    assert 'Нічого не знайдено' in body  # серед користувачів і плейлистів
+
+    first = client.get('/search?q=song&kind=songs&limit=15').get_data(as_text=True)
+    assert first.count('/songs/edit/') == 15
+    assert 'kind=songs' in first and 'after=' in first
+
+
+def test_stats_and_counts_are_read_from_counters(client, playlist):
+    _, user_id, _ = playlist
+
+    with assert_max_queries(app_module.engine, 2):
+        response = client.get('/stats')
+    body = response.get_data(as_text=True)
+    assert 'Пісень: 20' in body
+    assert 'Artist 0: 1 у плейлистах' in body
+
+    assert '(1 плейлистів)' in client.get('/users').get_data(as_text=True)
+    assert '(20 пісень)' in client.get(f'/users/{user_id}/playlists').get_data(as_text=True)
+
+
+def test_orphaned_song_pages_do_not_crash(client, playlist):
+    playlist_id, _, song_id = playlist
+    client.post(f'/playlists/delete/{playlist_id}')
+
+    assert client.get(f'/songs/edit/{song_id}').status_code == 200
+    response = client.post(f'/songs/delete/{song_id}')
+    assert response.status_code == 302
+    assert response.headers['Location'].endswith('/')
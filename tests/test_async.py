@@ -0,0 +1,173 @@
+import asyncio
+import os
+import tempfile
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+# Той самий спосіб вибору бази, що й у tests/test_app.py: src.asgi імпортує src.app
+os.environ.setdefault('SPOTIFY_DATABASE_URL', f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'app.db')}")
+
+from src import app as app_module
+from src import asgi
+from src.models import Base, User, Playlist, Song
+from src.database import async_serving_engine
+from src.async_dal import AsyncUserRepository, AsyncPlaylistRepository, AsyncSongRepository
+from src.async_bll import AsyncSpotifyService
+from tests.query_counter import assert_max_queries
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+@pytest.fixture
+def database_url(tmp_path):
+    return f"sqlite:///{tmp_path / 'async.db'}"
+
+
+async def with_service(database_url, action):
+    engine = async_serving_engine(database_url)
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+    try:
+        async with async_sessionmaker(engine, expire_on_commit=False)() as session:
+            service = AsyncSpotifyService(AsyncUserRepository(session), AsyncPlaylistRepository(session), AsyncSongRepository(session))
+            return await action(service)
+    finally:
+        await engine.dispose()
+
+
+def test_async_service_crud(database_url):
+    async def action(service):
+        await service.add_user('async listener')
+        user = (await service.get_all_users())[0]
+        await service.add_playlist(user.id, 'Async Mix')
+        playlist = (await service.get_all_playlists_by_user_id(user.id))[0]
+        song = await service.add_song_to_playlist(playlist.id, 'Await', 'Loop')
+        await service.update_song(song.id, 'Awaited', 'Loop')
+
+        songs = await service.get_all_songs_by_playlist_id(playlist.id)
+        assert [(s.title, s.artist) for s in songs] == [('Awaited', 'Loop')]
+        assert [p.id for p in (await service.get_song_with_playlists(song.id)).playlists] == [playlist.id]
+
+        await service.delete_user(user.id)
+        assert await service.get_all_users() == []
+        assert await service.get_playlist_by_id(playlist.id) is None
+
+    run(with_service(database_url, action))
+
+
+def test_async_add_song_does_not_load_playlist_songs(database_url):
+    async def action():
+        engine = async_serving_engine(database_url)
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+        try:
+            async with async_sessionmaker(engine, expire_on_commit=False)() as session:
+                service = AsyncSpotifyService(AsyncUserRepository(session), AsyncPlaylistRepository(session), AsyncSongRepository(session))
+                await service.add_user('async listener')
+                user = (await service.get_all_users())[0]
+                await service.add_playlist(user.id, 'Big Mix')
+                playlist = (await service.get_all_playlists_by_user_id(user.id))[0]
+                for i in range(20):
+                    await service.add_song_to_playlist(playlist.id, f'Song {i}', 'Loop')
+
+                # Пошук плейлиста, вставка пісні і вставка зв'язку
+                with assert_max_queries(engine.sync_engine, 3):
+                    await service.add_song_to_playlist(playlist.id, 'Last', 'Loop')
+                assert len(await service.get_all_songs_by_playlist_id(playlist.id)) == 21
+        finally:
+            await engine.dispose()
+
+    run(action())
+
+
+def test_async_transaction_rolls_back(database_url):
+    async def action(service):
+        with pytest.raises(RuntimeError):
+            async with service.transaction():
+                await service.add_user('first')
+                await service.add_user('second')
+                raise RuntimeError('abort')
+        assert await service.get_all_users() == []
+
+        async with service.transaction():
+            await service.add_user('kept')
+        page = await service.get_users_page(limit=1)
+        assert [user.username for user in page.items] == ['kept']
+        assert page.next_cursor is None
+
+    run(with_service(database_url, action))
+
+
+async def asgi_get(path, query=b''):
+    scope = {'type': 'http', 'http_version': '1.1', 'method': 'GET', 'path': path, 'query_string': query, 'headers': [], 'server': ('localhost', 80)}
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    await asgi.application(scope, receive, send)
+    return messages[0]['status'], b''.join(message.get('body', b'') for message in messages[1:]).decode()
+
+
+@pytest.fixture
+def playlist_id():
+    app_module.Session.remove()
+    Base.metadata.drop_all(app_module.engine)
+    Base.metadata.create_all(app_module.engine)
+    session = app_module.Session()
+    user = User(username='async page')
+    playlist = Playlist(name='Async Page Mix', user=user, user_id=user.id)
+    playlist.songs = [Song(title=f'Song {i}', artist='Artist') for i in range(30)]
+    session.add_all([user, playlist])
+    session.commit()
+    playlist_id = playlist.id
+    app_module.Session.remove()
+    return playlist_id
+
+
+def test_asgi_songs_page_matches_flask(playlist_id):
+    with app_module.app.test_client() as client:
+        expected = client.get(f'/playlists/{playlist_id}/songs?limit=20').get_data(as_text=True)
+
+    async def load():
+        try:
+            return await asgi_get(f'/playlists/{playlist_id}/songs', b'limit=20')
+        finally:
+            # Пул з'єднань прив'язаний до циклу подій, а кожен тест запускає новий
+            await asgi.engine.dispose()
+
+    status, body = run(load())
+
+    assert status == 200
+    assert body == expected
+
+
+def test_asgi_serves_concurrent_requests(playlist_id):
+    async def load():
+        try:
+            return await asyncio.gather(*(asgi_get(f'/playlists/{playlist_id}/songs') for _ in range(50)))
+        finally:
+            await asgi.engine.dispose()
+
+    responses = run(load())
+
+    assert {status for status, _ in responses} == {200}
+    assert all(body.count('Редагувати') == 30 for _, body in responses)
+
+
+def test_asgi_falls_back_to_flask_for_forms(playlist_id):
+    async def load():
+        try:
+            return await asgi_get(f'/playlists/{playlist_id}/songs/add')
+        finally:
+            await asgi.engine.dispose()
+
+    status, body = run(load())
+
+    assert status == 200
+    assert 'name="title"' in body
@@ -4,9 +4,11 @@ import pytest
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from src.models import Base
-from src.dal import UserRepository, PlaylistRepository, SongRepository
+from src.dal import UserRepository, PlaylistRepository, SongRepository, BulkRepository
 from src.bll import SpotifyService
-from src.generator import generate_spotify_csv
+from src.generator import generate_spotify_csv, generate_spotify_rows
+from src.csv_shards import shard_ranges, has_multiline_records
+from src.compression import InputFile
 
 
 @pytest.fixture
@@ -20,12 +22,23 @@ def service():
     playlist_repo = PlaylistRepository(session)
     song_repo = SongRepository(session)
 
-    return SpotifyService(user_repo, playlist_repo, song_repo)
+    bulk_repo = BulkRepository(session)
+
+    return SpotifyService(user_repo, playlist_repo, song_repo, bulk_repo)
+
+
+def snapshot(service):
+    return {
+        (user.id, user.username, playlist.id, playlist.name, song.id, song.title, song.artist)
+        for user in service.get_all_users()
+        for playlist in user.playlists
+        for song in playlist.songs
+    }
 
 
 def test_import_single_user(service):
     csv_path = 'data/test_spotify_data.csv'
-    generate_spotify_csv(filename=csv_path, users=1, playlists=1, songs=20)
+    generate_spotify_csv(filename=csv_path, users=1, playlists=1, songs=20, seed=1)
 
     service.import_from_csv(csv_path)
     users = service.get_all_users()
@@ -43,7 +56,7 @@ def test_import_single_user(service):
 
 def test_import_multiple_users(service):
     csv_path = 'data/test_spotify_multi.csv'
-    generate_spotify_csv(filename=csv_path, users=5, playlists=20, songs=40)
+    generate_spotify_csv(filename=csv_path, users=5, playlists=20, songs=40, seed=1)
 
     service.import_from_csv(csv_path)
     users = service.get_all_users()
@@ -78,7 +91,7 @@ def test_import_invalid_file(service):
 
 def test_user_playlist_song_relationship(service):
     csv_path = 'data/test_relationship.csv'
-    generate_spotify_csv(filename=csv_path, users=1, playlists=1, songs=30)
+    generate_spotify_csv(filename=csv_path, users=1, playlists=1, songs=30, seed=1)
 
     service.import_from_csv(csv_path)
     users = service.get_all_users()
@@ -90,3 +103,211 @@ def test_user_playlist_song_relationship(service):
 
     os.remove(csv_path)
 
+
+def test_bulk_import_matches_serial_import(service):
+    csv_path = 'data/test_bulk.csv'
+    generate_spotify_csv(filename=csv_path, users=4, playlists=5, songs=10)
+
+    service.import_from_csv(csv_path)
+    expected = snapshot(service)
+
+    engine = create_engine('sqlite:///:memory:')
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    bulk_service = SpotifyService(UserRepository(session), PlaylistRepository(session), SongRepository(session), BulkRepository(session))
+    bulk_service.import_from_csv(csv_path, batch_size=7)
+
+    assert snapshot(bulk_service) == expected
+
+    os.remove(csv_path)
+
+
+def test_bulk_import_requires_bulk_repository(service):
+    service.bulk_repo = None
+    with pytest.raises(ValueError):
+        service.import_from_csv('data/non_existent_file.csv', batch_size=100)
+
+
+def test_parallel_import_matches_serial_import(service):
+    csv_path = 'data/test_parallel.csv'
+    generate_spotify_csv(filename=csv_path, users=3, playlists=4, songs=10)
+
+    service.import_from_csv(csv_path, batch_size=50)
+    expected = snapshot(service)
+
+    engine = create_engine('sqlite:///:memory:')
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    parallel_service = SpotifyService(UserRepository(session), PlaylistRepository(session), SongRepository(session), BulkRepository(session))
+    parallel_service.import_from_csv(csv_path, batch_size=5, workers=4)
+
+    assert snapshot(parallel_service) == expected
+
+    os.remove(csv_path)
+
+
+def test_shard_ranges_cover_file_on_record_boundaries():
+    csv_path = 'data/test_shards.csv'
+    generate_spotify_csv(filename=csv_path, users=3, playlists=3, songs=5)
+
+    with open(csv_path, 'rb') as file:
+        data = file.read()
+    ranges = shard_ranges(csv_path, workers=5, shard_bytes=64)
+
+    assert ranges[0][0] == data.index(b'\n') + 1
+    assert ranges[-1][1] == len(data)
+    for (_, end), (start, _) in zip(ranges, ranges[1:]):
+        assert end == start
+        assert data[end - 1:end] == b'\n'
+
+    os.remove(csv_path)
+
+
+def test_quoted_line_breaks_fall_back_to_serial_import(service):
+    csv_path = 'data/test_multiline.csv'
+    os.makedirs('data', exist_ok=True)
+    with open(csv_path, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(['UserId', 'Username', 'PlaylistId', 'PlaylistName', 'SongId', 'SongTitle', 'Artist'])
+        for i in range(30):
+            writer.writerow(['u1', 'alice', 'p1', 'rock_playlist', f's{i}', f'Song {i}\nline "two"', 'Artist A'])
+
+    assert has_multiline_records(csv_path)
+    service.import_from_csv(csv_path, batch_size=5, workers=4)
+
+    titles = {song.title for song in service.get_all_songs_by_playlist_id('p1')}
+    assert titles == {f'Song {i}\nline "two"' for i in range(30)}
+
+    os.remove(csv_path)
+
+
+def test_quoted_fields_on_one_line_keep_parallel_import(tmp_path):
+    csv_path = tmp_path / 'quoted.csv'
+    csv_path.write_bytes(b'a,b\n"x, ""y""",z\n"",w\n')
+
+    assert not has_multiline_records(str(csv_path))
+
+
+@pytest.mark.parametrize('suffix', ['.gz', '.bz2', '.xz', '.zst'])
+def test_compressed_csv_round_trip(service, suffix):
+    if suffix == '.zst':
+        pytest.importorskip('zstandard')  # Необов'язкова залежність, у shell.nix її немає
+    csv_path = 'data/test_compressed.csv'
+    generate_spotify_csv(filename=csv_path, users=3, playlists=3, songs=5, seed=1, workers=2)
+    generate_spotify_csv(filename=csv_path + suffix, users=3, playlists=3, songs=5, seed=1, workers=2)
+
+    # Заголовок і шматки записані окремими стисненими потоками, але читаються як один файл
+    with open(csv_path, 'rb') as file, InputFile(csv_path + suffix) as compressed:
+        assert compressed.file.read() == file.read()
+
+    service.import_from_csv(csv_path, batch_size=10)
+    expected = snapshot(service)
+
+    engine = create_engine('sqlite:///:memory:')
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    compressed_service = SpotifyService(UserRepository(session), PlaylistRepository(session), SongRepository(session), BulkRepository(session))
+    compressed_service.import_from_csv(csv_path + suffix, batch_size=10, workers=2)
+
+    assert snapshot(compressed_service) == expected
+
+    os.remove(csv_path)
+    os.remove(csv_path + suffix)
+
+
+class CrashingBulkRepository(BulkRepository):
+    def __init__(self, session, commits_before_crash):
+        super().__init__(session)
+        self.commits_left = commits_before_crash
+
+    def commit(self):
+        if self.commits_left == 0:
+            self.session.rollback()
+            raise RuntimeError('import crashed')
+        self.commits_left -= 1
+        super().commit()
+
+
+def test_resume_continues_from_checkpoint(service):
+    csv_path = 'data/test_resume.csv'
+    generate_spotify_csv(filename=csv_path, users=4, playlists=4, songs=10)
+
+    service.import_from_csv(csv_path, batch_size=5)
+    expected = snapshot(service)
+
+    engine = create_engine('sqlite:///:memory:')
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    repos = (UserRepository(session), PlaylistRepository(session), SongRepository(session))
+
+    crashing_service = SpotifyService(*repos, CrashingBulkRepository(session, commits_before_crash=2))
+    with pytest.raises(RuntimeError):
+        crashing_service.import_from_csv(csv_path, batch_size=5)
+
+    checkpoint = BulkRepository(session).get_checkpoint(os.path.abspath(csv_path))
+    assert checkpoint.offset > 0
+    assert len(snapshot(crashing_service)) == 10
+
+    resumed_service = SpotifyService(*repos, BulkRepository(session))
+    resumed_service.import_from_csv(csv_path, batch_size=5, resume=True)
+
+    assert snapshot(resumed_service) == expected
+    assert BulkRepository(session).get_checkpoint(os.path.abspath(csv_path)).offset == os.path.getsize(csv_path)
+
+    os.remove(csv_path)
+
+
+def test_resume_rejects_changed_file(service):
+    csv_path = 'data/test_resume_changed.csv'
+    generate_spotify_csv(filename=csv_path, users=2, playlists=2, songs=3)
+    service.import_from_csv(csv_path, batch_size=5)
+
+    generate_spotify_csv(filename=csv_path, users=3, playlists=2, songs=3)
+    with pytest.raises(ValueError):
+        service.import_from_csv(csv_path, batch_size=5, resume=True)
+
+    os.remove(csv_path)
+
+
+def test_upsert_import_merges_delta(service):
+    header = ['UserId', 'Username', 'PlaylistId', 'PlaylistName', 'SongId', 'SongTitle', 'Artist']
+    base_path = 'data/test_upsert_base.csv'
+    delta_path = 'data/test_upsert_delta.csv'
+    os.makedirs('data', exist_ok=True)
+
+    with open(base_path, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(header)
+        writer.writerow(['u1', 'alice', 'p1', 'rock_playlist', 's1', 'Song one', 'Artist A'])
+        writer.writerow(['u1', 'alice', 'p1', 'rock_playlist', 's2', 'Song two', 'Artist B'])
+
+    with open(delta_path, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(header)
+        writer.writerow(['u1', 'alice_renamed', 'p1', 'rock_playlist', 's1', 'Song one', 'Artist A'])
+        writer.writerow(['u1', 'alice_renamed', 'p1', 'rock_playlist', 's2', 'Song two (live)', 'Artist B'])
+        writer.writerow(['u1', 'alice_renamed', 'p1', 'rock_playlist', 's3', 'Song three', 'Artist C'])
+        writer.writerow(['u2', 'bob', 'p2', 'jazz_playlist', 's1', 'Song one', 'Artist A'])
+
+    service.import_from_csv(base_path, batch_size=10)
+    service.import_from_csv(delta_path, batch_size=2, upsert=True)
+
+    assert snapshot(service) == {
+        ('u1', 'alice_renamed', 'p1', 'rock_playlist', 's1', 'Song one', 'Artist A'),
+        ('u1', 'alice_renamed', 'p1', 'rock_playlist', 's2', 'Song two (live)', 'Artist B'),
+        ('u1', 'alice_renamed', 'p1', 'rock_playlist', 's3', 'Song three', 'Artist C'),
+        ('u2', 'bob', 'p2', 'jazz_playlist', 's1', 'Song one', 'Artist A'),
+    }
+    assert len(service.song_repo.get_all_songs()) == 3
+
+    os.remove(base_path)
+    os.remove(delta_path)
+
+
+def test_import_generated_rows_without_csv(service):
+    rows = list(generate_spotify_rows(users=3, playlists=3, songs=4))
+
+    imported = service.import_rows(iter(rows), batch_size=4)
+
+    assert imported == len(rows)
+    assert snapshot(service) == {tuple(row) for row in rows}
@@ -0,0 +1,137 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.models import Base
+from src.dal import UserRepository, PlaylistRepository, SongRepository
+from src.bll import SpotifyService
+from src.cache import InProcessCache, SharedCache, LocalSharedClient, MISS, user_key
+from src.database import serving_engine
+from src.write_queue import WriteQueue
+from tests.query_counter import assert_max_queries
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine('sqlite:///:memory:')
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+def make_service(session, cache):
+    return SpotifyService(UserRepository(session), PlaylistRepository(session), SongRepository(session), cache=cache)
+
+
+@pytest.mark.parametrize('make_cache', [
+    lambda **kw: InProcessCache(**kw),
+    lambda **kw: SharedCache(LocalSharedClient(), **kw),
+])
+def test_cache_counts_hits_misses_and_negative_hits(make_cache):
+    cache = make_cache(ttl=60, negative_ttl=60)
+
+    assert cache.get('user:1') is MISS
+    cache.set('user:1', 'listener')
+    cache.set('user:2', None)
+    assert cache.get('user:1') == 'listener'
+    assert cache.get('user:2') is None
+    cache.delete('user:1')
+    assert cache.get('user:1') is MISS
+
+    stats = cache.stats()
+    assert (stats['hits'], stats['negative_hits'], stats['misses'], stats['invalidations']) == (2, 1, 2, 1)
+
+
+def test_in_process_cache_evicts_least_recently_used():
+    cache = InProcessCache(max_size=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+
+    assert cache.get('b') is MISS
+    assert cache.get('a') == 1 and cache.get('c') == 3
+    assert cache.stats()['evictions'] == 1
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('src.cache.time.monotonic', lambda: now[0])
+    cache = InProcessCache(ttl=10, negative_ttl=1)
+    cache.set('found', 'value')
+    cache.set('missing', None)
+
+    now[0] += 2
+    assert cache.get('found') == 'value'
+    assert cache.get('missing') is MISS
+
+    now[0] += 10
+    assert cache.get('found') is MISS
+
+
+def test_set_is_skipped_after_concurrent_invalidation():
+    cache = InProcessCache()
+    generation = cache.generation
+    cache.delete('user:1')
+    cache.set('user:1', 'stale', generation)
+
+    assert cache.get('user:1') is MISS
+
+
+def test_service_reads_through_cache_and_invalidates_on_write(engine):
+    session = sessionmaker(bind=engine)()
+    cache = InProcessCache()
+    service = make_service(session, cache)
+    service.add_user('listener')
+    user_id = service.get_all_users()[0].id
+
+    assert service.get_user_record(user_id).username == 'listener'
+    with assert_max_queries(engine, 0):
+        assert service.get_user_record(user_id).username == 'listener'
+
+    service.update_user(user_id, 'renamed')
+    assert service.get_user_record(user_id).username == 'renamed'
+
+    service.add_playlist(user_id, 'Mix')
+    playlist_id = service.get_all_playlists_by_user_id(user_id)[0].id
+    assert service.get_playlist_record(playlist_id).user.username == 'renamed'
+
+    service.delete_user(user_id)
+    assert service.get_user_record(user_id) is None
+    assert service.get_playlist_record(playlist_id) is None
+    session.close()
+
+
+def test_missing_entities_are_negatively_cached(engine):
+    session = sessionmaker(bind=engine)()
+    cache = InProcessCache()
+    service = make_service(session, cache)
+
+    assert service.get_playlist_record('missing') is None
+    with assert_max_queries(engine, 0):
+        assert service.get_playlist_record('missing') is None
+    assert cache.stats()['negative_hits'] == 1
+    session.close()
+
+
+def test_write_queue_invalidates_before_returning(tmp_path):
+    engine = serving_engine(f"sqlite:///{tmp_path / 'cache.db'}")
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    cache = InProcessCache()
+    write_queue = WriteQueue(Session, cache=cache)
+
+    write_queue.execute(lambda service: service.add_user('listener'))
+    reader = Session()
+    service = make_service(reader, cache)
+    user_id = service.get_all_users()[0].id
+    assert service.get_user_record(user_id).username == 'listener'
+    reader.rollback()
+
+    write_queue.execute(lambda service: service.update_user(user_id, 'renamed'))
+    assert cache.get(user_key(user_id)) is MISS
+    assert service.get_user_record(user_id).username == 'renamed'
+
+    write_queue.close()
+    reader.close()
+    engine.dispose()
@@ -1,9 +1,11 @@
 import pytest
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import sessionmaker
 
-from src.models import Base, User, Playlist, Song
-from src.dal import UserRepository, PlaylistRepository, SongRepository
+from src.models import Base, User, Playlist, Song, playlist_song
+from src.dal import UserRepository, PlaylistRepository, SongRepository, transaction
+from tests.query_counter import assert_max_queries
 
 @pytest.fixture(scope='function')
 def session():
@@ -125,3 +127,121 @@ def test_add_song_to_playlist(session):
     assert len(songs_in_playlist) == 1
     assert songs_in_playlist[0].title == 'Relaxing Tune'
 
+
+def test_keyset_pages_cover_all_rows_in_order(session):
+    user_repo = UserRepository(session)
+    for i in range(7):
+        user_repo.add_user(User(username=f'user{i}'))
+    expected = sorted(user.id for user in user_repo.get_all_users())
+
+    seen = []
+    page = user_repo.get_users_page(limit=3)
+    seen.extend(user.id for user in page.items)
+    while page.next_cursor:
+        page = user_repo.get_users_page(after=page.next_cursor, limit=3)
+        seen.extend(user.id for user in page.items)
+
+    assert seen == expected
+    assert len(page.items) == 1
+
+def test_songs_page_by_playlist_id(session):
+    user = User(username='pager')
+    playlist = Playlist(name='Paged', user=user, user_id=user.id)
+    playlist.songs = [Song(title=f'Song {i}', artist='Artist') for i in range(5)]
+    session.add_all([user, playlist])
+    session.commit()
+
+    song_repo = SongRepository(session)
+    first = song_repo.get_songs_page_by_playlist_id(playlist.id, limit=3)
+    second = song_repo.get_songs_page_by_playlist_id(playlist.id, after=first.next_cursor, limit=3)
+
+    assert [song.id for song in first.items + second.items] == sorted(song.id for song in playlist.songs)
+    assert second.next_cursor is None
+
+def count_commits(session):
+    commits = []
+    event.listen(session, 'after_commit', lambda session: commits.append(session))
+    return commits
+
+def test_transaction_commits_once(session):
+    user_repo = UserRepository(session)
+    playlist_repo = PlaylistRepository(session)
+    song_repo = SongRepository(session)
+    commits = count_commits(session)
+
+    with transaction(session):
+        user = User(username='unit')
+        user_repo.add_user(user)
+        playlist = Playlist(name='Work', user=user, user_id=user.id)
+        playlist_repo.add_playlist(playlist, user.id)
+        song_repo.add_song(Song(title='One', artist='Artist', playlists=[playlist]))
+        user_repo.update_user(user.id, 'unit2')
+        assert commits == []
+
+    assert len(commits) == 1
+    assert user_repo.get_user_by_id(user.id).username == 'unit2'
+    assert len(playlist_repo.get_playlist_by_id(playlist.id).songs) == 1
+
+def test_transaction_rolls_back_on_error(session):
+    user_repo = UserRepository(session)
+
+    with pytest.raises(RuntimeError):
+        with transaction(session):
+            user_repo.add_user(User(username='lost'))
+            with transaction(session):
+                user_repo.add_user(User(username='lost too'))
+            raise RuntimeError('abort')
+
+    assert user_repo.get_all_users() == []
+
+    # Поза блоком репозиторії знову комітять кожну зміну
+    commits = count_commits(session)
+    user_repo.add_user(User(username='kept'))
+    assert len(commits) == 1
+
+
+def test_delete_user_is_one_statement_and_cascades(session):
+    user = User(username='power user')
+    songs = [Song(title=f'Song {i}', artist='Artist') for i in range(5)]
+    for i in range(50):
+        playlist = Playlist(name=f'Mix {i}', user=user, user_id=user.id)
+        playlist.songs = songs
+    session.add(user)
+    session.commit()
+    user_id = user.id
+    session.expunge_all()
+
+    with assert_max_queries(session.get_bind(), 1):
+        assert UserRepository(session).delete_user(user_id) is True
+
+    assert session.query(Playlist).count() == 0
+    assert session.execute(playlist_song.select()).all() == []
+    assert session.query(Song).count() == 5
+    assert UserRepository(session).delete_user(user_id) is False
+
+
+def test_update_and_delete_report_whether_row_matched(session):
+    user = User(username='unit')
+    playlist = Playlist(name='Mix', user=user, user_id=user.id)
+    song = Song(title='Song', artist='Artist', playlists=[playlist])
+    session.add_all([user, playlist, song])
+    session.commit()
+    user_id, playlist_id, song_id = user.id, playlist.id, song.id
+    playlist_repo = PlaylistRepository(session)
+    song_repo = SongRepository(session)
+
+    with assert_max_queries(session.get_bind(), 1):
+        assert song_repo.update_song(song_id, 'Renamed', 'Other') is True
+    assert song_repo.get_song_by_id(song_id).title == 'Renamed'
+    assert song_repo.update_song('missing', 'x', 'y') is False
+    assert playlist_repo.update_playlist('missing', 'x') is False
+
+    assert song_repo.delete_song(song_id) is True
+    assert playlist_repo.get_all_playlists_by_user_id(user_id)[0].songs == []
+    assert playlist_repo.delete_playlist(playlist_id) is True
+    assert playlist_repo.delete_playlist(playlist_id) is False
+
+
+def test_foreign_keys_are_enforced(session):
+    with pytest.raises(IntegrityError):
+        session.execute(Playlist.__table__.insert().values(id='p1', name='Orphan', user_id='missing'))
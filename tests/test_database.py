@@ -0,0 +1,84 @@
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.orm import scoped_session, sessionmaker
+
+from src.models import Base
+from src.dal import UserRepository, PlaylistRepository, SongRepository, BulkRepository
+from src.bll import SpotifyService
+from src.database import import_profile, secondary_indexes, serving_engine
+from src.generator import generate_spotify_csv
+
+
+def test_import_profile_restores_serving_settings(tmp_path):
+    csv_path = str(tmp_path / 'profile.csv')
+    engine = create_engine(f"sqlite:///{tmp_path / 'profile.db'}")
+    Base.metadata.create_all(engine)
+    generate_spotify_csv(filename=csv_path, users=2, playlists=2, songs=3)
+
+    with import_profile(engine):
+        with engine.connect() as connection:
+            assert connection.exec_driver_sql('PRAGMA journal_mode').scalar() == 'wal'
+            assert connection.exec_driver_sql('PRAGMA synchronous').scalar() == 1
+
+        session = sessionmaker(bind=engine)()
+        service = SpotifyService(UserRepository(session), PlaylistRepository(session), SongRepository(session), BulkRepository(session))
+        service.import_from_csv(csv_path, batch_size=100)
+        session.close()
+
+    with engine.connect() as connection:
+        assert connection.exec_driver_sql('PRAGMA journal_mode').scalar() == 'wal'
+        assert connection.exec_driver_sql('SELECT count(*) FROM sqlite_stat1').scalar() > 0
+        assert connection.exec_driver_sql('SELECT count(*) FROM users').scalar() == 2
+
+    assert {index.name for index in secondary_indexes()} <= index_names(engine)
+
+
+def index_names(engine):
+    return {index['name'] for table in Base.metadata.tables for index in inspect(engine).get_indexes(table)}
+
+
+def test_import_into_filled_database_keeps_indexes(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'delta.db'}")
+    Base.metadata.create_all(engine)
+    UserRepository(sessionmaker(bind=engine)()).add_user('existing')
+
+    with import_profile(engine):
+        with engine.connect() as connection:
+            assert connection.exec_driver_sql('PRAGMA synchronous').scalar() == 1
+        assert {index.name for index in secondary_indexes()} <= index_names(engine)
+
+    with engine.connect() as connection:
+        assert connection.exec_driver_sql("SELECT count(*) FROM sqlite_master WHERE name = 'sqlite_stat1'").scalar() == 0
+    engine.dispose()
+
+
+def test_serving_engine_reads_concurrently_during_write(tmp_path):
+    engine = serving_engine(f"sqlite:///{tmp_path / 'serving.db'}", pool_size=4)
+    Base.metadata.create_all(engine)
+    Session = scoped_session(sessionmaker(bind=engine))
+    UserRepository(Session()).add_user('reader')
+    Session.remove()
+
+    writer = engine.raw_connection()
+    try:
+        cursor = writer.cursor()
+        assert cursor.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+        # Ексклюзивна транзакція запису блокувала б читачів у режимі DELETE, але не у WAL
+        cursor.execute('BEGIN EXCLUSIVE')
+        cursor.execute("INSERT INTO users (id, username) VALUES ('pending', 'writer')")
+
+        def read(_):
+            try:
+                return len(UserRepository(Session()).get_all_users())
+            finally:
+                Session.remove()
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(read, range(4)))
+
+        cursor.execute('ROLLBACK')
+    finally:
+        writer.close()
+
+    assert results == [1, 1, 1, 1]
+    engine.dispose()
@@ -1,7 +1,9 @@
 import os
 import csv
+import uuid
 import pytest
-from src.generator import generate_spotify_csv
+from src.generator import generate_spotify_csv, Popularity
+from src.file_size import lines_in_csv, parse_size
 
 @pytest.fixture
 def test_file_path():
@@ -69,3 +71,85 @@ def test_csv_file_is_overwritten(test_file_path):
 
     os.remove(test_file_path)
 
+
+def test_lines_in_csv_matches_rows_written(test_file_path):
+    rows_written = generate_spotify_csv(filename=test_file_path, users=3, playlists=3, songs=3, verbose=False)
+
+    assert lines_in_csv(test_file_path) == rows_written
+    assert lines_in_csv(test_file_path, block_size=7) == rows_written
+
+    os.remove(test_file_path)
+
+def test_parallel_generation_writes_single_header(test_file_path):
+    rows_written = generate_spotify_csv(filename=test_file_path, users=7, playlists=3, songs=3, verbose=False, workers=3)
+
+    with open(test_file_path, newline='') as file:
+        lines = list(csv.reader(file))
+
+    assert len(lines) == rows_written
+    assert lines[0] == ['UserId', 'Username', 'PlaylistId', 'PlaylistName', 'SongId', 'SongTitle', 'Artist']
+    assert 'UserId' not in {line[0] for line in lines[1:]}
+    assert len({line[0] for line in lines[1:]}) == 7
+    assert not [name for name in os.listdir(os.path.dirname(test_file_path)) if '.part' in name]
+
+    os.remove(test_file_path)
+
+def test_fast_engine_keeps_csv_schema(test_file_path):
+    rows_written = generate_spotify_csv(filename=test_file_path, users=25, playlists=4, songs=5, verbose=False, engine='fast')
+
+    with open(test_file_path, newline='') as file:
+        lines = list(csv.reader(file))
+
+    assert len(lines) == rows_written
+    assert lines[0] == ['UserId', 'Username', 'PlaylistId', 'PlaylistName', 'SongId', 'SongTitle', 'Artist']
+    assert len({line[0] for line in lines[1:]}) == 25
+    assert len({line[4] for line in lines[1:]}) == rows_written - 1
+    assert all(str(uuid.UUID(line[4])) == line[4] and uuid.UUID(line[4]).version == 4 for line in lines[1:])
+    assert all(line[3].endswith('_playlist') and line[5] and line[6] for line in lines[1:])
+
+    os.remove(test_file_path)
+
+def test_seed_gives_identical_output_and_exact_rows(test_file_path):
+    other_path = test_file_path + '.other'
+
+    rows_written = generate_spotify_csv(filename=test_file_path, playlists=3, songs=4, seed=42, rows=57)
+    generate_spotify_csv(filename=other_path, playlists=3, songs=4, seed=42, rows=57)
+
+    with open(test_file_path, 'rb') as first, open(other_path, 'rb') as second:
+        assert first.read() == second.read()
+    assert rows_written == 58
+    assert lines_in_csv(test_file_path) == 58
+
+    os.remove(test_file_path)
+    os.remove(other_path)
+
+def test_target_size_is_approximate(test_file_path):
+    generate_spotify_csv(filename=test_file_path, playlists=3, songs=4, seed=1, engine='fast', target_size=parse_size('200KB'))
+
+    size = os.path.getsize(test_file_path)
+    assert 200 * 1024 <= size < 400 * 1024
+
+    os.remove(test_file_path)
+
+def test_zipf_engine_shares_popular_songs(test_file_path):
+    popularity = Popularity(catalog=500, song_skew=1.2, count_skew=1.2)
+    generate_spotify_csv(filename=test_file_path, playlists=10, songs=30, engine='zipf', seed=1, rows=3000, workers=2, popularity=popularity)
+
+    with open(test_file_path, newline='') as file:
+        rows = list(csv.reader(file))[1:]
+
+    songs = {}
+    playlists_by_song = {}
+    for row in rows:
+        # Одна пісня каталогу має однакові назву і виконавця в усіх шматках
+        assert songs.setdefault(row[4], (row[5], row[6])) == (row[5], row[6])
+        playlists_by_song.setdefault(row[4], set()).add(row[2])
+
+    assert len(rows) == 3000
+    assert len({(row[2], row[4]) for row in rows}) == len(rows), "Пісня повторюється в одному плейлисті."
+    assert len(songs) <= 500
+    # Найпопулярніша пісня є в помітній частці плейлистів
+    playlists = {row[2] for row in rows}
+    assert max(len(owners) for owners in playlists_by_song.values()) > len(playlists) * 0.2
+
+    os.remove(test_file_path)
@@ -0,0 +1,109 @@
+import time
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.models import Base, User, Playlist, Song
+from src.dal import UserRepository, PlaylistRepository, SearchRepository
+from src.orphans import collect_orphan_songs, OrphanCollector, missing_triggers, _window_end, _delete_orphans
+from src.search import drop_search_triggers
+from src.query_plans import full_scans
+from tests.test_stats import assert_counters_match
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'gc.db'}")
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+def add_library(engine):
+    """
+    Два користувачі; пісня 'Shared' є в плейлистах обох.
+    """
+    session = sessionmaker(bind=engine)()
+    shared = Song(title='Shared', artist='Both')
+    first, second = User(username='first'), User(username='second')
+    mix = Playlist(name='Mix', user=first, user_id=first.id)
+    mix.songs = [shared] + [Song(title=f'Mix {i}', artist='Gone') for i in range(7)]
+    jazz = Playlist(name='Jazz', user=second, user_id=second.id)
+    jazz.songs = [shared, Song(title='Jazz', artist='Kept')]
+    session.add_all([first, second, mix, jazz])
+    session.commit()
+    ids = first.id, mix.id
+    session.close()
+    return ids
+
+
+def song_titles(engine):
+    with engine.connect() as connection:
+        return sorted(connection.exec_driver_sql("SELECT title FROM songs").scalars())
+
+
+def test_collects_only_unreferenced_songs(engine):
+    user_id, _ = add_library(engine)
+    session = sessionmaker(bind=engine)()
+    UserRepository(session).delete_user(user_id)
+    session.close()
+
+    collected = collect_orphan_songs(engine, batch_size=3, pause=0)
+
+    assert collected.rows == 7
+    assert collected.bytes > 7 * len('Mix 0Gone')
+    assert collected.batches == 3 and collected.next_cursor is None
+    assert song_titles(engine) == ['Jazz', 'Shared']
+    assert_counters_match(engine)
+    session = sessionmaker(bind=engine)()
+    assert SearchRepository(session).search('songs', 'mix').items == []
+    session.close()
+
+    assert collect_orphan_songs(engine, pause=0).rows == 0
+
+
+def test_max_batches_resumes_from_cursor(engine):
+    _, playlist_id = add_library(engine)
+    session = sessionmaker(bind=engine)()
+    PlaylistRepository(session).delete_playlist(playlist_id)
+    session.close()
+
+    collector = OrphanCollector(engine, batch_size=2, max_batches=2, pause=0)
+    first = collector.run_once()
+    assert first.batches == 2 and first.next_cursor is not None
+    while collector.cursor is not None:
+        collector.run_once()
+
+    assert collector.total.rows == 7
+    assert song_titles(engine) == ['Jazz', 'Shared']
+
+
+def test_background_errors_are_logged(engine, caplog):
+    collector = OrphanCollector(engine, interval=0.01)
+    collector.run_once = lambda: 1 / 0
+    collector.start()
+    time.sleep(0.1)
+    collector.close()
+    assert any(record.levelname == 'ERROR' and 'ZeroDivisionError' in record.exc_text for record in caplog.records)
+
+
+def test_background_thread_stops(engine):
+    collector = OrphanCollector(engine, interval=60)
+    collector.start()
+    collector.close()
+    assert collector.thread is None
+
+
+def test_gc_queries_use_indexes(engine):
+    with engine.connect() as connection:
+        for statement in (_window_end('a', 10), _delete_orphans('a', 'b')):
+            compiled = statement.compile(engine)
+            plan = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {compiled}', tuple(compiled.params.values())).fetchall()
+            assert full_scans(plan) == []
+
+
+def test_missing_triggers_are_reported(engine):
+    assert missing_triggers(engine) == []
+    with engine.begin() as connection:
+        drop_search_triggers(connection)
+    assert 'songs_fts_ad' in missing_triggers(engine)
@@ -0,0 +1,27 @@
+from sqlalchemy import create_engine
+
+from src.models import Base
+from src.database import secondary_indexes
+from src.query_plans import check_query_plans
+
+
+def test_repository_queries_use_indexes():
+    results = check_query_plans()
+
+    assert results
+    assert [(name, scans) for name, _, _, scans in results if scans] == []
+
+
+def test_missing_index_is_reported(tmp_path):
+    db_path = tmp_path / 'plans.db'
+    engine = create_engine(f'sqlite:///{db_path}')
+    Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        for index in secondary_indexes():
+            index.drop(connection)
+    engine.dispose()
+
+    failed = {name for name, _, _, scans in check_query_plans(f'sqlite:///{db_path}') if scans}
+
+    assert 'PlaylistRepository.get_all_playlists_by_user_id' in failed
+    assert 'SongRepository.get_song_with_playlists' in failed
@@ -0,0 +1,47 @@
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.models import Base
+from src.dal import UserRepository, SearchRepository
+from src.schema import upgrade_schema
+
+
+def create_old_database(engine):
+    # Схема до каскадних зовнішніх ключів
+    with engine.begin() as connection:
+        connection.exec_driver_sql("CREATE TABLE users (id VARCHAR PRIMARY KEY, username VARCHAR NOT NULL)")
+        connection.exec_driver_sql("CREATE TABLE playlists (id VARCHAR PRIMARY KEY, name VARCHAR NOT NULL, user_id VARCHAR REFERENCES users (id))")
+        connection.exec_driver_sql("CREATE TABLE songs (id VARCHAR PRIMARY KEY, title VARCHAR NOT NULL, artist VARCHAR NOT NULL)")
+        connection.exec_driver_sql(
+            "CREATE TABLE playlist_song (playlist_id VARCHAR REFERENCES playlists (id), song_id VARCHAR REFERENCES songs (id), "
+            "PRIMARY KEY (playlist_id, song_id))")
+        connection.exec_driver_sql("INSERT INTO users VALUES ('u1', 'old listener')")
+        connection.exec_driver_sql("INSERT INTO playlists VALUES ('p0', 'Gone', 'u1')")
+        connection.exec_driver_sql("DELETE FROM playlists WHERE id = 'p0'")
+        connection.exec_driver_sql("INSERT INTO playlists VALUES ('p1', 'Old mix', 'u1')")
+        connection.exec_driver_sql("INSERT INTO songs VALUES ('s1', 'Old song', 'Old artist')")
+        connection.exec_driver_sql("INSERT INTO playlist_song VALUES ('p1', 's1')")
+
+
+def test_upgrade_adds_cascades_and_keeps_rows(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    create_old_database(engine)
+    with engine.connect() as connection:
+        rowid = connection.exec_driver_sql("SELECT rowid FROM playlists WHERE id = 'p1'").scalar()
+
+    assert upgrade_schema(engine) == ['playlists', 'playlist_song']
+    Base.metadata.create_all(engine)
+    assert upgrade_schema(engine) == []
+
+    with engine.connect() as connection:
+        assert connection.exec_driver_sql("SELECT rowid FROM playlists WHERE id = 'p1'").scalar() == rowid
+        assert connection.exec_driver_sql("SELECT song_count FROM playlists").scalar() == 1
+
+    session = sessionmaker(bind=engine)()
+    assert [item.id for item in SearchRepository(session).search('playlists', 'old mix').items] == ['p1']
+    assert UserRepository(session).delete_user('u1') is True
+    with engine.connect() as connection:
+        assert connection.exec_driver_sql("SELECT count(*) FROM playlists").scalar() == 0
+        assert connection.exec_driver_sql("SELECT count(*) FROM playlist_song").scalar() == 0
+    session.close()
+    engine.dispose()
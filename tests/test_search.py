@@ -0,0 +1,163 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.models import Base, User, Playlist, Song
+from src.dal import UserRepository, PlaylistRepository, SongRepository, BulkRepository, SearchRepository
+from src.bll import SpotifyService
+from src.database import import_profile
+from src.generator import generate_spotify_csv
+from src.search import match_query, drop_search_triggers
+
+
+@pytest.fixture
+def session():
+    engine = create_engine('sqlite:///:memory:')
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+def titles(page):
+    return [item.title for item in page.items]
+
+
+def test_match_query_quotes_words_as_prefixes():
+    assert match_query('Червона  ру') == '"Червона"* "ру"*'
+    assert match_query('AND "OR" (xy*') == '"AND"* "OR"* "xy"*'
+    assert match_query('a ba') == '"a" "ba"*'
+    assert match_query(' -- ') is None
+
+
+def test_index_follows_repository_writes(session):
+    user = User(username='Listener')
+    playlist = Playlist(name='Літній мікс', user=user, user_id=user.id)
+    ruta, cafe = Song(title='Червона рута', artist='Софія Ротару'), Song(title='Café del Mar', artist='Energy 52')
+    playlist.songs = [ruta, cafe]
+    session.add_all([user, playlist])
+    session.commit()
+    search = SearchRepository(session)
+    songs = SongRepository(session)
+
+    assert titles(search.search('songs', 'cafe')) == ['Café del Mar']
+    assert titles(search.search('songs', 'ротару червон')) == ['Червона рута']
+    assert [item.name for item in search.search('playlists', 'літ').items] == ['Літній мікс']
+    assert [item.username for item in search.search('users', 'listen').items] == ['Listener']
+
+    songs.update_song(ruta.id, 'Водограй', 'Софія Ротару')
+    assert titles(search.search('songs', 'червона')) == []
+    assert titles(search.search('songs', 'водограй')) == ['Водограй']
+
+    songs.delete_song(cafe.id)
+    assert titles(search.search('songs', 'cafe')) == []
+
+
+def test_results_are_ranked_and_paged(session):
+    session.add_all([Song(title=f'Love song {i}', artist='Various') for i in range(5)])
+    session.add(Song(title='Love love love', artist='Love'))
+    session.commit()
+    search = SearchRepository(session)
+
+    first = search.search('songs', 'love', limit=4)
+    assert first.items[0].title == 'Love love love'
+    assert first.next_cursor is not None
+
+    second = search.search('songs', 'love', after=first.next_cursor, limit=4)
+    assert second.next_cursor is None
+    seen = titles(first) + titles(second)
+    assert sorted(seen) == sorted(['Love love love'] + [f'Love song {i}' for i in range(5)])
+
+
+def test_paging_while_rows_are_written_skips_nothing(session):
+    session.add_all([Song(title=f'Love song {i:02}', artist='Various') for i in range(30)])
+    session.commit()
+    search = SearchRepository(session)
+    songs = SongRepository(session)
+
+    seen, cursor = [], None
+    while True:
+        page = search.search('songs', 'love', after=cursor, limit=7)
+        seen += titles(page)
+        # Між сторінками з'являються менш релевантні збіги й інші пісні, що змінюють статистику bm25
+        for i in range(3):
+            songs.add_song(Song(title=f'Love song new {len(seen)}-{i}', artist='Various'))
+            songs.add_song(Song(title=f'Other {len(seen)}-{i}', artist='Various'))
+        cursor = page.next_cursor
+        if cursor is None:
+            break
+
+    assert sorted(title for title in seen if 'new' not in title) == [f'Love song {i:02}' for i in range(30)]
+
+
+def test_older_better_match_ranks_first_and_depth_is_capped(session, monkeypatch):
+    monkeypatch.setattr('src.dal.MAX_SEARCH_RESULTS', 10)
+    session.add(Song(title='Love love love', artist='Love'))
+    session.commit()
+    session.add_all([Song(title=f'Love song {i:02}', artist='Various') for i in range(30)])
+    session.commit()
+    search = SearchRepository(session)
+
+    first = search.search('songs', 'love', limit=6)
+    second = search.search('songs', 'love', after=first.next_cursor, limit=6)
+    assert titles(first)[0] == 'Love love love'
+    assert len(titles(second)) == 4 and second.next_cursor is None
+
+
+def test_bulk_import_rebuilds_index_once(tmp_path):
+    csv_path = str(tmp_path / 'search.csv')
+    engine = create_engine(f"sqlite:///{tmp_path / 'search.db'}")
+    Base.metadata.create_all(engine)
+    generate_spotify_csv(filename=csv_path, users=3, playlists=2, songs=5, seed=7)
+
+    with import_profile(engine):
+        with engine.connect() as connection:
+            assert connection.exec_driver_sql("SELECT count(*) FROM sqlite_master WHERE type = 'trigger'").scalar() == 0
+        session = sessionmaker(bind=engine)()
+        service = SpotifyService(UserRepository(session), PlaylistRepository(session), SongRepository(session), BulkRepository(session))
+        service.import_from_csv(csv_path, batch_size=7)
+        session.close()
+
+    session = sessionmaker(bind=engine)()
+    service = SpotifyService(UserRepository(session), PlaylistRepository(session), SongRepository(session), search_repo=SearchRepository(session))
+    song = service.song_repo.get_all_songs()[0]
+    assert song.id in [item.id for item in service.search('songs', f'{song.title} {song.artist}', limit=500).items]
+    with engine.connect() as connection:
+        assert connection.exec_driver_sql("INSERT INTO songs_fts(songs_fts, rank) VALUES ('integrity-check', 1)").rowcount
+    session.close()
+
+
+def test_missing_triggers_are_restored_with_rebuild(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'heal.db'}")
+    Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        drop_search_triggers(connection)
+        connection.exec_driver_sql("INSERT INTO users (id, username) VALUES ('u1', 'offline')")
+
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    assert [item.id for item in SearchRepository(session).search('users', 'offline').items] == ['u1']
+    session.close()
+
+
+def test_delta_import_keeps_triggers_without_rebuild(tmp_path):
+    csv_path = str(tmp_path / 'delta.csv')
+    engine = create_engine(f"sqlite:///{tmp_path / 'delta.db'}")
+    Base.metadata.create_all(engine)
+    UserRepository(sessionmaker(bind=engine)()).add_user('existing')
+    generate_spotify_csv(filename=csv_path, users=2, playlists=2, songs=3, seed=5)
+
+    with import_profile(engine):
+        with engine.connect() as connection:
+            assert connection.exec_driver_sql("SELECT count(*) FROM sqlite_master WHERE name = 'songs_fts_ai'").scalar() == 1
+        session = sessionmaker(bind=engine)()
+        service = SpotifyService(UserRepository(session), PlaylistRepository(session), SongRepository(session), BulkRepository(session))
+        service.import_from_csv(csv_path, batch_size=7, upsert=True)
+        session.close()
+
+    session = sessionmaker(bind=engine)()
+    song = SongRepository(session).get_all_songs()[0]
+    assert song.id in [item.id for item in SearchRepository(session).search('songs', f'{song.title} {song.artist}', limit=500).items]
+    assert [item.username for item in SearchRepository(session).search('users', 'existing').items] == ['existing']
+    session.close()
+    engine.dispose()
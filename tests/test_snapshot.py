@@ -0,0 +1,68 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.models import Base, User
+from src.dal import UserRepository, PlaylistRepository, SongRepository, BulkRepository
+from src.bll import SpotifyService
+from src.generator import generate_spotify_rows
+from src.snapshot import Snapshot, write_snapshot
+
+
+def make_service():
+    engine = create_engine('sqlite:///:memory:')
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    return SpotifyService(UserRepository(session), PlaylistRepository(session), SongRepository(session), BulkRepository(session))
+
+
+def table_rows(service):
+    connection = service.bulk_repo.session.connection()
+    return [sorted(connection.exec_driver_sql(f'SELECT * FROM {table}').fetchall())
+            for table in ('users', 'playlists', 'songs', 'playlist_song')]
+
+
+def test_snapshot_round_trip(tmp_path):
+    path = str(tmp_path / 'data.snap')
+    source = make_service()
+    source.import_rows(generate_spotify_rows(users=3, playlists=3, songs=4), batch_size=5)
+
+    counts = write_snapshot(source.bulk_repo.session.connection(), path)
+
+    target = make_service()
+    with Snapshot(path) as snapshot:
+        assert (snapshot.users_count, snapshot.playlists_count, snapshot.songs_count, snapshot.links_count) == counts
+        target.import_snapshot(snapshot, batch_size=4)
+
+    assert table_rows(target) == table_rows(source)
+
+
+def test_snapshot_requires_uuid_ids(tmp_path):
+    service = make_service()
+    service.add_user(User(username='no_uuid', id='user-1'))
+
+    with pytest.raises(ValueError):
+        write_snapshot(service.bulk_repo.session.connection(), str(tmp_path / 'bad.snap'))
+
+
+def test_snapshot_rejects_other_files(tmp_path):
+    path = tmp_path / 'not_a_snapshot.csv'
+    path.write_text('UserId,Username\n' * 10)
+
+    with pytest.raises(ValueError):
+        Snapshot(str(path))
+
+
+def test_error_inside_with_is_not_replaced_by_open_section_views(tmp_path):
+    path = str(tmp_path / 'data.snap')
+    source = make_service()
+    source.import_rows(generate_spotify_rows(users=3, playlists=3, songs=4), batch_size=5)
+    write_snapshot(source.bulk_repo.session.connection(), path)
+
+    with pytest.raises(RuntimeError, match='import failed'):
+        with Snapshot(path) as snapshot:
+            links, playlists, songs = snapshot.links(), snapshot.playlists(), snapshot.songs()
+            next(links), next(playlists), next(songs)
+            raise RuntimeError('import failed')
+
+    assert snapshot.mm.closed and snapshot.views == {}
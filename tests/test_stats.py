@@ -0,0 +1,232 @@
+import pytest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.models import Base, User, Playlist, Song
+from src.dal import UserRepository, PlaylistRepository, SongRepository, BulkRepository, StatsRepository
+from src.bll import SpotifyService
+from src.database import import_profile, secondary_indexes
+from src.command import create_database
+from src.search import drop_search_triggers
+from src.stats import drop_stats_triggers
+from src.generator import generate_spotify_csv
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine('sqlite:///:memory:')
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+def make_service(session):
+    return SpotifyService(UserRepository(session), PlaylistRepository(session), SongRepository(session), BulkRepository(session),
+                          stats_repo=StatsRepository(session))
+
+
+def counters(connection):
+    return (
+        dict(connection.exec_driver_sql("SELECT name, count FROM table_counts").fetchall()),
+        dict(connection.exec_driver_sql("SELECT id, playlist_count FROM users").fetchall()),
+        dict(connection.exec_driver_sql("SELECT id, song_count FROM playlists").fetchall()),
+        {artist: (songs, links) for artist, songs, links in
+         connection.exec_driver_sql("SELECT artist, song_count, link_count FROM artist_stats").fetchall()},
+    )
+
+
+def recounted(connection):
+    """
+    Ті самі лічильники, пораховані агрегацією по даних.
+    """
+    return (
+        {table: connection.exec_driver_sql(f"SELECT count(*) FROM {table}").scalar()
+         for table in ('users', 'playlists', 'songs', 'playlist_song')},
+        dict(connection.exec_driver_sql(
+            "SELECT users.id, count(playlists.id) FROM users LEFT JOIN playlists ON playlists.user_id = users.id GROUP BY users.id").fetchall()),
+        dict(connection.exec_driver_sql(
+            "SELECT playlists.id, count(playlist_song.song_id) FROM playlists "
+            "LEFT JOIN playlist_song ON playlist_song.playlist_id = playlists.id GROUP BY playlists.id").fetchall()),
+        {artist: (songs, links) for artist, songs, links in connection.exec_driver_sql(
+            "SELECT artist, count(*), sum((SELECT count(*) FROM playlist_song WHERE song_id = songs.id)) FROM songs GROUP BY artist").fetchall()},
+    )
+
+
+def assert_counters_match(engine):
+    with engine.connect() as connection:
+        assert counters(connection) == recounted(connection)
+
+
+def test_counters_follow_service_writes(engine):
+    session = sessionmaker(bind=engine)()
+    service = make_service(session)
+
+    service.add_user('first')
+    service.add_user('second')
+    first, second = sorted(service.get_all_users(), key=lambda user: user.username)
+    service.add_playlist(first.id, 'Mix')
+    service.add_playlist(first.id, 'Rock')
+    service.add_playlist(second.id, 'Jazz')
+    mix, rock = sorted(service.get_all_playlists_by_user_id(first.id), key=lambda playlist: playlist.name)
+
+    song = service.add_song_to_playlist(mix.id, 'Song', 'Artist A')
+    service.add_song_to_playlist(mix.id, 'Other', 'Artist A')
+    service.add_song_to_playlist(rock.id, 'Third', 'Artist B')
+    rock.songs.append(song)
+    session.commit()
+    assert_counters_match(engine)
+
+    service.update_song(song.id, 'Song', 'Artist C')
+    assert_counters_match(engine)
+
+    service.delete_song(song.id)
+    assert_counters_match(engine)
+
+    service.delete_playlist(rock.id)
+    assert_counters_match(engine)
+
+    service.delete_user(first.id)
+    assert_counters_match(engine)
+
+    # Пісні видалених плейлистів залишаються в songs
+    assert service.get_table_counts() == {'users': 1, 'playlists': 1, 'songs': 2, 'playlist_song': 0}
+    assert [artist.artist for artist in service.get_top_artists()] == ['Artist A', 'Artist B']
+    session.close()
+
+
+def test_top_artists_are_ordered_by_playlist_appearances(engine):
+    session = sessionmaker(bind=engine)()
+    user = User(username='listener')
+    playlists = [Playlist(name=f'Mix {i}', user=user, user_id=user.id) for i in range(3)]
+    popular, rare = Song(title='Hit', artist='Popular'), Song(title='B-side', artist='Rare')
+    for playlist in playlists:
+        playlist.songs.append(popular)
+    playlists[0].songs.append(rare)
+    session.add_all([user, *playlists])
+    session.commit()
+
+    top = make_service(session).get_top_artists(2)
+    assert [(artist.artist, artist.link_count, artist.song_count) for artist in top] == [('Popular', 3, 1), ('Rare', 1, 1)]
+    session.close()
+
+
+def test_bulk_import_recounts_once(tmp_path):
+    csv_path = str(tmp_path / 'stats.csv')
+    engine = create_engine(f"sqlite:///{tmp_path / 'stats.db'}")
+    Base.metadata.create_all(engine)
+    generate_spotify_csv(filename=csv_path, users=4, playlists=3, songs=6, seed=3)
+
+    with import_profile(engine):
+        session = sessionmaker(bind=engine)()
+        make_service(session).import_from_csv(csv_path, batch_size=10)
+        session.close()
+
+    assert_counters_match(engine)
+    with engine.connect() as connection:
+        assert counters(connection)[0]['users'] == 4
+    engine.dispose()
+
+
+def test_old_database_gets_count_columns(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as connection:
+        connection.exec_driver_sql("CREATE TABLE users (id VARCHAR PRIMARY KEY, username VARCHAR NOT NULL)")
+        connection.exec_driver_sql("CREATE TABLE playlists (id VARCHAR PRIMARY KEY, name VARCHAR NOT NULL, user_id VARCHAR REFERENCES users (id))")
+        connection.exec_driver_sql("INSERT INTO users VALUES ('u1', 'old')")
+        connection.exec_driver_sql("INSERT INTO playlists VALUES ('p1', 'Mix', 'u1')")
+
+    Base.metadata.create_all(engine)
+
+    assert_counters_match(engine)
+    with engine.connect() as connection:
+        assert connection.exec_driver_sql("SELECT playlist_count FROM users").scalar() == 1
+    engine.dispose()
+
+
+def test_delta_import_updates_counters_through_triggers(tmp_path):
+    csv_path = str(tmp_path / 'delta.csv')
+    engine = create_engine(f"sqlite:///{tmp_path / 'delta.db'}")
+    Base.metadata.create_all(engine)
+    UserRepository(sessionmaker(bind=engine)()).add_user('existing')
+    generate_spotify_csv(filename=csv_path, users=3, playlists=2, songs=4, seed=9)
+
+    with import_profile(engine):
+        with engine.connect() as connection:
+            assert connection.exec_driver_sql("SELECT count(*) FROM sqlite_master WHERE name = 'stats_users_ai'").scalar() == 1
+        session = sessionmaker(bind=engine)()
+        make_service(session).import_from_csv(csv_path, batch_size=10, upsert=True)
+        session.close()
+
+    assert_counters_match(engine)
+    with engine.connect() as connection:
+        assert counters(connection)[0]['users'] == 4
+    engine.dispose()
+
+
+def test_service_without_stats_repository_returns_empty():
+    service = SpotifyService(None, None, None)
+    assert service.get_table_counts() == {}
+    assert service.get_top_artists() == []
+
+
+class KilledBulkRepository(BulkRepository):
+    """
+    Імпорт, убитий після кількох пачок: виняток замість коміту.
+    """
+    def __init__(self, session, commits_before_kill):
+        super().__init__(session)
+        self.commits_left = commits_before_kill
+
+    def commit(self):
+        if self.commits_left == 0:
+            raise RuntimeError('import killed')
+        self.commits_left -= 1
+        super().commit()
+
+
+def test_resume_after_killed_bulk_import_builds_indexes_before_recount(tmp_path):
+    csv_path = str(tmp_path / 'killed.csv')
+    db_path = str(tmp_path / 'killed.db')
+    generate_spotify_csv(filename=csv_path, users=6, playlists=3, songs=5, seed=11)
+
+    engine = create_database(db_path)
+    # Стан після входу в import_profile; вихід з нього вбитий процес не виконує
+    with engine.begin() as connection:
+        for index in secondary_indexes():
+            index.drop(connection)
+        drop_search_triggers(connection)
+        drop_stats_triggers(connection)
+    session = sessionmaker(bind=engine)()
+    killed = SpotifyService(UserRepository(session), PlaylistRepository(session), SongRepository(session),
+                            KilledBulkRepository(session, commits_before_kill=2))
+    with pytest.raises(RuntimeError):
+        killed.import_from_csv(csv_path, batch_size=10)
+    session.close()
+    engine.dispose()
+
+    # Перезапуск: create_all знаходить базу без індексів і тригерів лічильників
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(Engine, 'before_cursor_execute', record)
+    try:
+        engine = create_database(db_path, reset=False)
+    finally:
+        event.remove(Engine, 'before_cursor_execute', record)
+    recount = next(i for i, statement in enumerate(statements) if statement.startswith('UPDATE playlists SET song_count'))
+    created = {index.name for index in secondary_indexes() if any(f'INDEX {index.name} ' in statement for statement in statements[:recount])}
+    assert created == {index.name for index in secondary_indexes()}
+
+    with import_profile(engine):
+        session = sessionmaker(bind=engine)()
+        make_service(session).import_from_csv(csv_path, batch_size=10, resume=True)
+        session.close()
+
+    assert_counters_match(engine)
+    with engine.connect() as connection:
+        assert counters(connection)[0]['users'] == 6
+    engine.dispose()
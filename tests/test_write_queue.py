@@ -0,0 +1,81 @@
+import pytest
+from sqlalchemy import event
+from sqlalchemy.orm import sessionmaker
+
+from src.models import Base
+from src.dal import UserRepository, PlaylistRepository
+from src.database import serving_engine
+from src.write_queue import WriteQueue
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = serving_engine(f"sqlite:///{tmp_path / 'queue.db'}")
+    Base.metadata.create_all(engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+def usernames(session_factory):
+    session = session_factory()
+    try:
+        return sorted(user.username for user in UserRepository(session).get_all_users())
+    finally:
+        session.close()
+
+
+def test_writes_are_group_committed(session_factory):
+    commits = []
+    event.listen(session_factory.kw['bind'], 'commit', lambda connection: commits.append(connection))
+    write_queue = WriteQueue(session_factory, max_delay=0.05)
+
+    futures = [write_queue.submit(lambda service, i=i: service.add_user(f'user{i:02}')) for i in range(50)]
+    for future in futures:
+        future.result(timeout=10)
+    write_queue.close()
+
+    assert usernames(session_factory) == [f'user{i:02}' for i in range(50)]
+    assert len(commits) < 10
+
+
+def test_failed_write_rolls_back_only_itself(session_factory):
+    write_queue = WriteQueue(session_factory, max_delay=0.05)
+
+    def failing(service):
+        service.add_user('half done')
+        raise ValueError('rejected')
+
+    first = write_queue.submit(lambda service: service.add_user('first'))
+    failed = write_queue.submit(failing)
+    last = write_queue.submit(lambda service: service.add_user('last'))
+
+    first.result(timeout=10)
+    last.result(timeout=10)
+    with pytest.raises(ValueError):
+        failed.result(timeout=10)
+    write_queue.close()
+
+    assert usernames(session_factory) == ['first', 'last']
+
+
+def test_orm_results_are_returned_as_ids(session_factory):
+    session = session_factory()
+    UserRepository(session).add_user('plain')
+    user_id = UserRepository(session).get_all_users()[0].id
+    session.close()
+    write_queue = WriteQueue(session_factory)
+    try:
+        write_queue.execute(lambda service: service.add_playlist(user_id, 'Mix'))
+        users = write_queue.execute(lambda service: (service.get_user_by_id(user_id), 'plain'))
+        playlist_id = write_queue.execute(lambda service: service.get_all_playlists_by_user_id(user_id)[0])
+        song_id = write_queue.execute(lambda service: service.add_song_to_playlist(playlist_id, 'Song', 'Artist'))
+        assert write_queue.execute(lambda service: service.update_user(user_id, 'renamed')) is True
+    finally:
+        write_queue.close()
+
+    assert users == (user_id, 'plain')
+    assert isinstance(playlist_id, str) and isinstance(song_id, str)
+    session = session_factory()
+    playlist = PlaylistRepository(session).get_playlist_with_songs(playlist_id)
+    assert [song.id for song in playlist.songs] == [song_id]
+    session.close()